@@ -0,0 +1,151 @@
+"""Semantic cache of generated answers keyed on the question embedding."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+ANSWER_CACHE_FILENAME = "answer_cache.json"
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    embedding: List[float]
+    chunk_ids: List[str]
+    result: Dict
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """LRU/TTL cache that serves answers for questions close to a cached one.
+
+    A cached answer is reused when the cosine similarity between the question
+    embeddings reaches ``threshold`` *and* retrieval for the new question
+    returned exactly the chunk IDs the answer was generated from, so a hit never
+    cites context that the new question would not have seen.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        max_entries: int,
+        ttl_seconds: float,
+        persist_path: Optional[Path] = None,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def lookup(self, embedding: Sequence[float], chunk_ids: Sequence[str]) -> Optional[Dict]:
+        """Return a cached result for a similar question with identical retrieval, if any."""
+        query = _normalize(embedding)
+        with self._lock:
+            self._expire()
+            matrix = self._similarity_matrix()
+            if matrix is not None:
+                similarities = matrix @ query
+                for position in np.argsort(-similarities):
+                    if similarities[position] < self.threshold:
+                        break
+                    key = self._keys[position]
+                    entry = self._entries[key]
+                    if entry.chunk_ids == list(chunk_ids):
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return entry.result
+            self.misses += 1
+            return None
+
+    def store(self, question: str, embedding: Sequence[float], chunk_ids: Sequence[str], result: Dict) -> None:
+        entry = CacheEntry(
+            question=question,
+            embedding=_normalize(embedding).tolist(),
+            chunk_ids=list(chunk_ids),
+            result=result,
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._entries[question] = entry
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def invalidate(self) -> None:
+        """Drop every entry, e.g. after ingest changed the underlying documents."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+        self.save()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+    def save(self) -> None:
+        if not self.persist_path:
+            return
+        with self._lock:
+            payload = {"entries": [asdict(entry) for entry in self._entries.values()]}
+        temp_path = self.persist_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, self.persist_path)
+
+    def _load(self) -> None:
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        payload = json.loads(self.persist_path.read_text(encoding="utf-8"))
+        for item in payload.get("entries", []):
+            entry = CacheEntry(**item)
+            self._entries[entry.question] = entry
+        self._expire()
+
+    def _expire(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [key for key, entry in self._entries.items() if entry.created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _similarity_matrix(self) -> Optional[np.ndarray]:
+        if not self._entries:
+            return None
+        if self._matrix is None:
+            self._keys = list(self._entries.keys())
+            self._matrix = np.asarray([self._entries[key].embedding for key in self._keys], dtype=np.float32)
+        return self._matrix
+
+
+def _normalize(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,204 @@
+"""Streaming, structure-aware chunking sized in tokens."""
+
+from __future__ import annotations
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterable, Iterator, List, Tuple
+
+from .tokens import TokenCounter
+
+_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_FENCE = re.compile(r"^[ \t]*(```|~~~)")
+_SENTENCE_END = re.compile(r"[。！？!?]+[」』）)\]\"']*|\.(?=\s)")
+# A line without any break is cut into pieces of this many characters.
+_MAX_LINE_CHARS = 64 * 1024
+
+
+@dataclass
+class Segment:
+    """A sentence, heading or forced piece of text with its character span."""
+
+    text: str
+    start: int
+    headings: Tuple[str, ...]
+    section_start: bool = False
+    paragraph_start: bool = False
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int
+    end: int
+    headings: Tuple[str, ...]
+
+
+def iter_segments(blocks: Iterable[str]) -> Iterator[Segment]:
+    """Split streamed text into sentences, tracking Markdown headings and paragraphs.
+
+    ``blocks`` may cut the text anywhere; only the current line and the
+    unfinished sentence are buffered. Segment texts keep their original
+    whitespace and line breaks.
+    """
+    headings: List[str] = []
+    sentence = ""
+    sentence_start = 0
+    paragraph_start = True
+    in_fence = False
+    pending = ""
+    offset = 0  # character offset of ``pending`` in the document
+
+    def flush_sentence() -> Iterator[Segment]:
+        nonlocal sentence, paragraph_start
+        if sentence.strip():
+            yield Segment(sentence, sentence_start, tuple(headings), paragraph_start=paragraph_start)
+            paragraph_start = False
+        sentence = ""
+
+    def handle_line(line: str, line_start: int) -> Iterator[Segment]:
+        nonlocal sentence, sentence_start, paragraph_start, in_fence
+        stripped = line.strip()
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING.match(stripped)
+        if heading:
+            yield from flush_sentence()
+            level = len(heading.group(1))
+            del headings[level - 1 :]
+            headings.append(heading.group(2).strip())
+            yield Segment(line, line_start, tuple(headings), section_start=True, paragraph_start=True)
+            paragraph_start = True
+            return
+        if not stripped and not in_fence:
+            # Blank lines stay attached to the text so paragraphs survive in chunks.
+            if not sentence:
+                sentence_start = line_start
+            sentence += line
+            if sentence.strip():
+                yield from flush_sentence()
+            paragraph_start = True
+            return
+        if not sentence:
+            sentence_start = line_start
+        position = 0
+        for match in _SENTENCE_END.finditer(line):
+            sentence += line[position : match.end()]
+            position = match.end()
+            yield from flush_sentence()
+            sentence_start = line_start + position
+        sentence += line[position:]
+        if len(sentence) > _MAX_LINE_CHARS:
+            yield from flush_sentence()
+            sentence_start = line_start + len(line)
+
+    for block in blocks:
+        pending += block
+        position = 0
+        while True:
+            newline = pending.find("\n", position)
+            if newline == -1:
+                break
+            yield from handle_line(pending[position : newline + 1], offset + position)
+            position = newline + 1
+        if len(pending) - position > _MAX_LINE_CHARS:
+            yield from handle_line(pending[position:], offset + position)
+            position = len(pending)
+        offset += position
+        pending = pending[position:]
+    if pending:
+        yield from handle_line(pending, offset)
+    yield from flush_sentence()
+
+
+class TokenChunker:
+    """Packs segments into chunks of at most ``chunk_size`` tokens.
+
+    A chunk never spans a Markdown heading. When a chunk fills up it ends at
+    the last paragraph break in its second half if there is one, otherwise at
+    a sentence end, and the next chunk repeats up to ``chunk_overlap`` tokens
+    of trailing sentences. Sentences longer than a chunk are cut by tokens.
+    """
+
+    def __init__(self, counter: TokenCounter, chunk_size: int, chunk_overlap: int) -> None:
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.counter = counter
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def chunks(self, blocks: Iterable[str]) -> Iterator[Chunk]:
+        window: Deque[Tuple[Segment, int]] = deque()
+        window_tokens = 0
+        for segment in iter_segments(blocks):
+            for piece in self._fit(segment):
+                tokens = self.counter.count(piece.text)
+                if window and piece.section_start:
+                    # A heading directly followed by a sub-heading stays with it.
+                    if not all(segment.section_start for segment, _ in window):
+                        yield self._emit(window)
+                        window.clear()
+                        window_tokens = 0
+                elif window and window_tokens + tokens > self.chunk_size:
+                    cut = self._paragraph_cut(window)
+                    if cut:
+                        yield self._emit(list(window)[:cut])
+                        for _ in range(cut):
+                            window_tokens -= window.popleft()[1]
+                    else:
+                        yield self._emit(window)
+                        window_tokens = self._keep_overlap(window, window_tokens)
+                    while window and window_tokens + tokens > self.chunk_size:
+                        window_tokens -= window.popleft()[1]
+                window.append((piece, tokens))
+                window_tokens += tokens
+        if window:
+            yield self._emit(window)
+
+    def _fit(self, segment: Segment) -> Iterator[Segment]:
+        """Cut a segment that alone exceeds ``chunk_size`` into token-sized pieces."""
+        start, first = segment.start, True
+        for text in self.counter.split(segment.text, self.chunk_size):
+            yield Segment(
+                text,
+                start,
+                segment.headings,
+                section_start=segment.section_start and first,
+                paragraph_start=segment.paragraph_start and first,
+            )
+            start, first = start + len(text), False
+
+    def _paragraph_cut(self, window: Deque[Tuple[Segment, int]]) -> int:
+        """Index of the last paragraph start in the second half of the window, or 0."""
+        tokens_before = 0
+        cut = 0
+        for index, (segment, tokens) in enumerate(window):
+            if index and segment.paragraph_start and tokens_before * 2 >= self.chunk_size:
+                cut = index
+            tokens_before += tokens
+        return cut
+
+    def _keep_overlap(self, window: Deque[Tuple[Segment, int]], window_tokens: int) -> int:
+        kept = 0
+        for _, tokens in reversed(window):
+            if kept + tokens > self.chunk_overlap:
+                break
+            kept += tokens
+        while window_tokens > kept:
+            window_tokens -= window.popleft()[1]
+        return window_tokens
+
+    @staticmethod
+    def _emit(window: Iterable[Tuple[Segment, int]]) -> Chunk:
+        segments = [segment for segment, _ in window]
+        return Chunk(
+            text="".join(segment.text for segment in segments),
+            start=segments[0].start,
+            end=segments[-1].end,
+            headings=segments[-1].headings,
+        )
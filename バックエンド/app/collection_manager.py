@@ -0,0 +1,364 @@
+"""Lazily opened knowledge bases (one per Chroma collection) with LRU eviction."""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import chromadb
+from chromadb.api import ClientAPI
+from chromadb.config import Settings as ChromaSettings
+
+from .answer_cache import ANSWER_CACHE_FILENAME, SemanticAnswerCache
+from .config import Settings
+from .coordination import INDEX_VERSION_FILENAME, IndexVersion
+from .document_index import DOCUMENT_INDEX_FILENAME, DocumentIndex
+from .document_loader import DocumentLoader
+from .embeddings import EmbeddingService
+from .ingest_pipeline import IngestPipeline
+from .lexical_index import LexicalIndex
+from .manifest import MANIFEST_FILENAME, IngestManifest
+from .mmap_store import MmapVectorStore
+from .vector_store import ChromaVectorStore, VectorStore
+
+# Chroma's rule for collection names, minus dots so names are also safe directory names.
+_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{1,61}[A-Za-z0-9]$")
+
+
+class CollectionNotFound(LookupError):
+    """Raised when a query targets a collection that was never ingested."""
+
+
+@dataclass
+class KnowledgeBase:
+    """Everything that belongs to one collection: its documents, indexes and caches."""
+
+    name: str
+    source_dir: Path
+    store_dir: Path
+    loader: DocumentLoader
+    vector_store: VectorStore
+    manifest: IngestManifest
+    pipeline: IngestPipeline
+    index_version: IndexVersion
+    answer_cache: Optional[SemanticAnswerCache] = None
+    users: int = 0
+    last_used: float = 0.0
+
+    def refresh(self) -> bool:
+        """In a reader worker, pick up an ingest the writer committed since the last check.
+
+        The mmap vector store remaps on its own; the BM25 and document indexes
+        are reloaded and answers cached from the old documents are dropped.
+        """
+        if not self.index_version.changed():
+            return False
+        if self.vector_store.lexical_index is not None:
+            self.vector_store.lexical_index.reload()
+        if self.vector_store.document_index is not None:
+            self.vector_store.document_index.reload()
+        if self.answer_cache:
+            self.answer_cache.invalidate()
+        return True
+
+    def close(self) -> None:
+        if self.answer_cache:
+            self.answer_cache.save()
+
+
+class CollectionManager:
+    """Opens knowledge bases on first use and keeps at most ``max_open_collections`` in memory.
+
+    All collections share one embedding service and one Chroma client. The
+    default collection keeps the original layout (``source_dir`` and
+    ``vector_store_dir``); any other collection ``name`` stores its documents
+    in ``collections_dir/name/source_documents`` and its lexical index,
+    manifest and caches in ``collections_dir/name/store``. With the Chroma
+    backend, vectors of every collection live in the shared Chroma database,
+    whose LRU segment cache unloads idle collections once
+    ``collection_memory_limit_mb`` is exceeded; the mmap backend keeps them in
+    ``store/mmap_vectors``.
+
+    Use :meth:`use` around every access (or :meth:`acquire` and
+    :meth:`release` from async code, which run them in a worker thread); a
+    knowledge base in use (for example by a running ingest job) is never
+    evicted. In a reader worker (``process_role=reader``) every access also
+    checks whether the writer process committed an ingest since (see
+    :meth:`KnowledgeBase.refresh`). Collections are opened outside the
+    manager's lock, so loading one never delays access to the others;
+    concurrent users of a collection being opened wait for that one build.
+    """
+
+    def __init__(self, settings: Settings, embedder: EmbeddingService) -> None:
+        self.settings = settings
+        self.embedder = embedder
+        self.default_name = settings.default_collection
+        self.evictions = 0
+        self._client: Optional[ClientAPI] = None
+        self._open: "OrderedDict[str, KnowledgeBase]" = OrderedDict()
+        self._building: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> ClientAPI:
+        """The shared Chroma client, opened on first use rather than at import time."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._open_client()
+        return self._client
+
+    def _open_client(self) -> ClientAPI:
+        settings = self.settings
+        chroma_settings = ChromaSettings(anonymized_telemetry=False)
+        if settings.collection_memory_limit_mb > 0:
+            chroma_settings = ChromaSettings(
+                anonymized_telemetry=False,
+                chroma_segment_cache_policy="LRU",
+                chroma_memory_limit_bytes=settings.collection_memory_limit_mb * 1024 * 1024,
+            )
+        return chromadb.PersistentClient(path=str(settings.vector_store_dir), settings=chroma_settings)
+
+    def resolve_name(self, name: Optional[str]) -> str:
+        """Return the collection name for a request, validating user-supplied names."""
+        if name is None or name == self.default_name:
+            return self.default_name
+        if not _COLLECTION_NAME.match(name):
+            raise ValueError(
+                f"invalid collection name: {name!r} (3-63 letters, digits, '-' or '_', "
+                "starting and ending with a letter or digit)"
+            )
+        return name
+
+    def source_dir(self, name: Optional[str], create: bool = False) -> Path:
+        name = self.resolve_name(name)
+        if name == self.default_name:
+            return self.settings.source_dir
+        path = self.settings.collections_dir / name / "source_documents"
+        if create:
+            path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def store_dir(self, name: str) -> Path:
+        if name == self.default_name:
+            return self.settings.vector_store_dir
+        return self.settings.collections_dir / name / "store"
+
+    def exists(self, name: Optional[str]) -> bool:
+        name = self.resolve_name(name)
+        return name == self.default_name or (self.settings.collections_dir / name).is_dir()
+
+    def names(self) -> List[str]:
+        names = {self.default_name}
+        if self.settings.collections_dir.exists():
+            names.update(
+                path.name
+                for path in self.settings.collections_dir.iterdir()
+                if path.is_dir() and _COLLECTION_NAME.match(path.name)
+            )
+        return sorted(names)
+
+    def open_collections(self) -> Dict[str, int]:
+        """Names of the collections loaded in memory and their current users."""
+        with self._lock:
+            return {name: kb.users for name, kb in self._open.items()}
+
+    def describe(self) -> List[Dict]:
+        open_names = self.open_collections()
+        return [
+            {
+                "name": name,
+                "default": name == self.default_name,
+                "loaded": name in open_names,
+                "active_users": open_names.get(name, 0),
+            }
+            for name in self.names()
+        ]
+
+    @contextmanager
+    def use(self, name: Optional[str] = None, create: bool = False) -> Iterator[KnowledgeBase]:
+        """Yield the knowledge base for ``name``, opening it if needed.
+
+        Raises :class:`CollectionNotFound` for an unknown collection unless
+        ``create`` is set (ingest and upload create collections).
+        """
+        kb = self.acquire(name, create)
+        try:
+            yield kb
+        finally:
+            self.release(kb)
+
+    def acquire(self, name: Optional[str] = None, create: bool = False) -> KnowledgeBase:
+        """Open (if needed) and mark the knowledge base in use; pair with :meth:`release`.
+
+        Blocks while the collection is loaded or refreshed, so async callers
+        run it in a worker thread.
+        """
+        kb = self._open_kb(self.resolve_name(name), create)
+        try:
+            if self.settings.process_role == "reader":
+                kb.refresh()
+        except BaseException:
+            self.release(kb)
+            raise
+        return kb
+
+    def release(self, kb: KnowledgeBase) -> None:
+        with self._lock:
+            kb.users -= 1
+            kb.last_used = time.monotonic()
+            evicted = self._evict_locked()
+        for item in evicted:
+            item.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            for kb in self._open.values():
+                kb.close()
+            self._open.clear()
+
+    def _open_kb(self, name: str, create: bool) -> KnowledgeBase:
+        while True:
+            with self._lock:
+                kb = self._open.get(name)
+                if kb is not None:
+                    self._open.move_to_end(name)
+                    kb.users += 1
+                    return kb
+                pending = self._building.get(name)
+                building = pending is None
+                if building:
+                    if not create and not self.exists(name):
+                        raise CollectionNotFound(f"Unknown collection: {name}")
+                    pending = self._building[name] = Future()
+            if not building:
+                # Another thread is opening it; retry once that build is done (or re-raise its error).
+                pending.result()
+                continue
+            try:
+                kb = self._build(name)
+            except BaseException as exc:
+                with self._lock:
+                    del self._building[name]
+                pending.set_exception(exc)
+                raise
+            with self._lock:
+                del self._building[name]
+                self._open[name] = kb
+                kb.users += 1
+            pending.set_result(kb)
+            return kb
+
+    def _evict_locked(self) -> List[KnowledgeBase]:
+        """Drop idle knowledge bases beyond the limit; the caller closes them outside the lock."""
+        limit = max(self.settings.max_open_collections, 1)
+        evicted: List[KnowledgeBase] = []
+        for name in list(self._open):
+            if len(self._open) <= limit:
+                break
+            kb = self._open[name]
+            if kb.users == 0:
+                del self._open[name]
+                evicted.append(kb)
+                self.evictions += 1
+        return evicted
+
+    def _vector_store(
+        self,
+        name: str,
+        store_dir: Path,
+        lexical_index: Optional[LexicalIndex],
+        document_index: Optional[DocumentIndex],
+    ) -> VectorStore:
+        settings = self.settings
+        if settings.vector_backend == "mmap":
+            return MmapVectorStore(
+                store_dir / "mmap_vectors",
+                collection_name=name,
+                embedder=self.embedder,
+                lexical_index=lexical_index,
+                rrf_k=settings.rrf_k,
+                dtype=settings.mmap_vector_dtype,
+                ivf_lists=settings.mmap_ivf_lists,
+                ivf_probes=settings.mmap_ivf_probes,
+                document_index=document_index,
+            )
+        return ChromaVectorStore(
+            persist_directory=settings.vector_store_dir,
+            collection_name=name,
+            embedder=self.embedder,
+            lexical_index=lexical_index,
+            rrf_k=settings.rrf_k,
+            client=self.client,
+            document_index=document_index,
+        )
+
+    def _signature(self, loader: DocumentLoader) -> str:
+        signature = f"{self.embedder.signature}|chunker={loader.signature}"
+        # Switching backends leaves the new store empty, so every file must be ingested again.
+        if self.settings.vector_backend != "chroma":
+            signature += f"|store={self.settings.vector_backend}"
+        return signature
+
+    def _build(self, name: str) -> KnowledgeBase:
+        source_dir = self.source_dir(name, create=True)
+        store_dir = self.store_dir(name)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        settings = self.settings
+        loader = DocumentLoader(
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            tokenizer_model=settings.openai_model,
+            tokenizer_cache_dir=settings.tiktoken_cache_dir,
+            pdf_cache_dir=store_dir / "pdf_page_cache" if settings.pdf_page_cache_enabled else None,
+            pdf_pages_per_task=settings.pdf_pages_per_task,
+            root_dir=source_dir,
+        )
+        reader = settings.process_role == "reader"
+        lexical_index: Optional[LexicalIndex] = None
+        if settings.lexical_index_enabled:
+            lexical_index = LexicalIndex(
+                store_dir / "lexical_index",
+                merge_factor=settings.lexical_merge_factor,
+                max_df_ratio=settings.lexical_max_df_ratio,
+                read_only=reader,
+            )
+        document_index: Optional[DocumentIndex] = None
+        if settings.document_index_enabled:
+            document_index = DocumentIndex(store_dir / DOCUMENT_INDEX_FILENAME, read_only=reader)
+        vector_store = self._vector_store(name, store_dir, lexical_index, document_index)
+        answer_cache: Optional[SemanticAnswerCache] = None
+        if settings.answer_cache_enabled:
+            answer_cache = SemanticAnswerCache(
+                threshold=settings.answer_cache_similarity,
+                max_entries=settings.answer_cache_max_entries,
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                # Readers would overwrite each other's file; their caches live in memory only.
+                persist_path=store_dir / ANSWER_CACHE_FILENAME if settings.answer_cache_persist and not reader else None,
+            )
+        return KnowledgeBase(
+            name=name,
+            source_dir=source_dir,
+            store_dir=store_dir,
+            loader=loader,
+            vector_store=vector_store,
+            manifest=IngestManifest(
+                store_dir / MANIFEST_FILENAME,
+                embedding_signature=self._signature(loader),
+            ),
+            pipeline=IngestPipeline(
+                loader=loader,
+                vector_store=vector_store,
+                workers=settings.ingest_workers,
+                write_batch_size=settings.write_batch_size,
+            ),
+            index_version=IndexVersion(store_dir / INDEX_VERSION_FILENAME, interval=settings.reader_refresh_seconds),
+            answer_cache=answer_cache,
+        )
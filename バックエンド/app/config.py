@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -24,10 +24,109 @@ class Settings(BaseSettings):
         default_factory=lambda: Path("data/vector_store"),
         description="Directory for persistent Chroma collections.",
     )
+    collections_dir: Path = Field(
+        default_factory=lambda: Path("data/collections"),
+        description="Directory holding the documents, indexes and caches of non-default collections.",
+    )
+    snapshot_dir: Path = Field(
+        default_factory=lambda: Path("data/snapshots"),
+        description="Directory receiving the online snapshots taken by /admin/snapshot.",
+    )
+    snapshot_retention: int = Field(
+        default=7,
+        description="Snapshots kept in snapshot_dir; older ones are removed after a new one succeeds (0 keeps all).",
+    )
+    export_dir: Path = Field(
+        default_factory=lambda: Path("data/exports"),
+        description="Directory for embedding bundles written by /admin/export and read by /admin/import.",
+    )
+    admin_lock_timeout_seconds: float = Field(
+        default=30.0,
+        description="How long a maintenance request waits for a running ingest job on the collection before 409.",
+    )
+    default_collection: str = Field(
+        default="documents",
+        description="Collection used by endpoints that do not name one.",
+    )
+    max_open_collections: int = Field(
+        default=16,
+        description="Collections kept open in memory; the least recently used idle ones are closed beyond it.",
+    )
+    collection_memory_limit_mb: int = Field(
+        default=0,
+        description="Memory budget for Chroma vector indexes across collections (0 disables the limit).",
+    )
+    process_role: Literal["standalone", "writer", "reader"] = Field(
+        default="standalone",
+        description=(
+            "standalone: one process does everything; writer: the only process that ingests; "
+            "reader: query-only worker that picks up the writer's updates (requires the mmap backend)."
+        ),
+    )
+    writer_url: Optional[str] = Field(
+        default=None,
+        description="Base URL of the writer process; readers forward ingest, upload and job requests to it.",
+    )
+    reader_refresh_seconds: float = Field(
+        default=1.0,
+        description="How often a reader checks whether the writer committed an ingest.",
+    )
+    vector_backend: Literal["chroma", "mmap"] = Field(
+        default="chroma",
+        description="Vector storage: Chroma (HNSW) or quantized memory-mapped files shared by worker processes.",
+    )
+    mmap_vector_dtype: Literal["int8", "float16"] = Field(
+        default="int8",
+        description="Quantization of new mmap stores; an existing store keeps the type it was created with.",
+    )
+    mmap_ivf_lists: int = Field(
+        default=0,
+        description="IVF coarse lists of the mmap backend (0 searches exactly; about sqrt(chunks) otherwise).",
+    )
+    mmap_ivf_probes: int = Field(
+        default=8,
+        description="IVF lists scanned per query; more probes trade latency for recall.",
+    )
     embedding_model: str = Field(
         default="intfloat/multilingual-e5-small",
         description="SentenceTransformers model used to embed text.",
     )
+    embedding_device: Optional[str] = Field(
+        default=None,
+        description="Torch device for the embedding model (e.g. 'cpu', 'cuda'); auto-detected when unset.",
+    )
+    embedding_threads: int = Field(
+        default=0,
+        description="Torch CPU threads used by the embedding model (0 keeps the library default).",
+    )
+    embedding_normalize: bool = Field(
+        default=True,
+        description="L2-normalize embeddings so distances are cosine distances.",
+    )
+    embedding_prefixes: Optional[bool] = Field(
+        default=None,
+        description="Add e5-style 'query: '/'passage: ' prefixes; auto-enabled for e5 models when unset.",
+    )
+    query_embedding_cache_size: int = Field(
+        default=2048,
+        description="Number of query embeddings kept in the LRU cache.",
+    )
+    embedding_batch_window_ms: float = Field(
+        default=5.0,
+        description="How long the micro-batcher waits to gather concurrent query embeddings.",
+    )
+    embedding_max_query_batch: int = Field(
+        default=32,
+        description="Maximum number of queries embedded in one micro-batch.",
+    )
+    embedding_server_url: Optional[str] = Field(
+        default=None,
+        description="URL of an embedding server (app.embedding_server); the model is then not loaded in this process.",
+    )
+    embedding_server_timeout_seconds: float = Field(
+        default=60.0,
+        description="Timeout of one request to the embedding server.",
+    )
     openai_api_key: Optional[str] = Field(
         default=None,
         description="API key for OpenAI. Required for answer generation.",
@@ -44,22 +143,212 @@ class Settings(BaseSettings):
         default=512,
         description="Maximum number of tokens to request from the LLM.",
     )
+    llm_max_connections: int = Field(
+        default=20,
+        description="Size of the pooled HTTP connection pool shared by all OpenAI requests.",
+    )
+    llm_timeout_seconds: float = Field(
+        default=60.0,
+        description="Timeout for a single OpenAI request.",
+    )
+    warmup_enabled: bool = Field(
+        default=True,
+        description="Load models and open the default collection in the background at startup; /ready waits for it.",
+    )
+    metrics_enabled: bool = Field(
+        default=True,
+        description="Record per-stage query and ingest metrics and serve them on /metrics in Prometheus format.",
+    )
+    response_timings: bool = Field(
+        default=True,
+        description="Include per-stage timings in query responses.",
+    )
+    query_workers: int = Field(
+        default=4,
+        description="Threads that run query embedding and vector search off the event loop.",
+    )
+    max_concurrent_queries: int = Field(
+        default=32,
+        description="Maximum number of questions processed concurrently; further requests wait.",
+    )
+    batch_max_questions: int = Field(
+        default=10000,
+        description="Maximum number of questions accepted by one /query/batch request.",
+    )
+    batch_retrieval_size: int = Field(
+        default=64,
+        description="Questions embedded and searched together in one batch retrieval step.",
+    )
+    batch_llm_concurrency: int = Field(
+        default=8,
+        description="Concurrent OpenAI calls shared by all /query/batch requests.",
+    )
+    llm_max_retries: int = Field(
+        default=5,
+        description="Retries for rate-limited or transient OpenAI errors in batch answering.",
+    )
+    llm_max_backoff_seconds: float = Field(
+        default=30.0,
+        description="Upper bound for a single retry wait, including Retry-After.",
+    )
     chunk_size: int = Field(
-        default=800,
-        description="Maximum number of characters per chunk.",
+        default=400,
+        description="Maximum number of tokens per chunk.",
     )
     chunk_overlap: int = Field(
-        default=200,
-        description="Overlap size between adjacent chunks.",
+        default=60,
+        description="Tokens of trailing sentences repeated at the start of the next chunk.",
+    )
+    pdf_page_cache_enabled: bool = Field(
+        default=True,
+        description="Cache the extracted text of every PDF page next to the vector store.",
+    )
+    pdf_pages_per_task: int = Field(
+        default=32,
+        description="PDF pages extracted per worker task; larger PDFs are split across the ingest pool.",
+    )
+    ingest_workers: int = Field(
+        default=4,
+        description="Worker processes used to parse and chunk files during ingest (1 disables the pool).",
+    )
+    embedding_batch_size: int = Field(
+        default=64,
+        description="Number of texts embedded per forward pass.",
+    )
+    write_batch_size: int = Field(
+        default=512,
+        description="Maximum number of chunks written to the vector store per call.",
+    )
+    ingest_job_workers: int = Field(
+        default=2,
+        description="Background threads running ingest jobs (jobs on one collection still run one at a time).",
+    )
+    ingest_job_history: int = Field(
+        default=100,
+        description="Number of ingest jobs kept in memory for status polling.",
+    )
+    ingest_job_max_queued: int = Field(
+        default=32,
+        description="Ingest jobs allowed to wait for a worker; further submissions get 503 (0 disables the limit).",
     )
     top_k: int = Field(
         default=5,
         description="Number of documents to retrieve during similarity search.",
     )
+    min_k: int = Field(
+        default=1,
+        description="Results always kept by the score_gap cutoff; top_k is then the most retrieved.",
+    )
+    max_distance: float = Field(
+        default=0.0,
+        description=(
+            "Vector distance (squared L2, 2 - 2*cosine for normalized embeddings) beyond which chunks are "
+            "dropped; with none left the question is answered without calling the LLM (0 disables)."
+        ),
+    )
+    score_gap: float = Field(
+        default=0.0,
+        description="Stop retrieving at the first distance this fraction larger than the previous one (0 disables).",
+    )
+    answer_cache_enabled: bool = Field(
+        default=True,
+        description="Serve answers for near-identical questions from the semantic answer cache.",
+    )
+    answer_cache_similarity: float = Field(
+        default=0.95,
+        description="Minimum cosine similarity between question embeddings for a cache hit.",
+    )
+    answer_cache_max_entries: int = Field(
+        default=1000,
+        description="Maximum number of cached answers; the least recently used are evicted.",
+    )
+    answer_cache_ttl_seconds: float = Field(
+        default=86400,
+        description="Lifetime of a cached answer in seconds (0 disables expiry).",
+    )
+    answer_cache_persist: bool = Field(
+        default=True,
+        description="Persist the answer cache next to the vector store across restarts.",
+    )
+    retrieval_mode: Literal["vector", "lexical", "hybrid", "two_tier"] = Field(
+        default="hybrid",
+        description=(
+            "Retrieval strategy: dense vectors, BM25 over the lexical index, both fused with RRF, "
+            "or two_tier (rank documents first, then search the chunks of the best ones)."
+        ),
+    )
+    context_max_tokens: int = Field(
+        default=3000,
+        description="Token budget for retrieved context in the prompt (0 disables the limit).",
+    )
+    context_dedup_threshold: float = Field(
+        default=0.85,
+        description="Share of a chunk's text already in the context above which the chunk is dropped.",
+    )
+    tiktoken_cache_dir: Optional[str] = Field(
+        default=None,
+        description="Directory holding tiktoken BPE files so token counting works offline.",
+    )
+    rerank_enabled: bool = Field(
+        default=False,
+        description="Rerank over-fetched candidates with a local cross-encoder before building the prompt.",
+    )
+    rerank_model: str = Field(
+        default="hotchpotch/japanese-reranker-cross-encoder-xsmall-v1",
+        description="sentence-transformers CrossEncoder model used for reranking.",
+    )
+    rerank_candidates: int = Field(
+        default=20,
+        description="Candidates fetched from search and rescored when reranking is enabled.",
+    )
+    rerank_batch_size: int = Field(
+        default=16,
+        description="Question/chunk pairs scored per cross-encoder forward pass.",
+    )
+    rerank_max_length: int = Field(
+        default=512,
+        description="Maximum tokens of a question/chunk pair fed to the cross-encoder.",
+    )
+    rerank_budget_ms: float = Field(
+        default=300.0,
+        description="Time budget for reranking; search order is kept when exceeded (0 disables the limit).",
+    )
+    lexical_index_enabled: bool = Field(
+        default=True,
+        description="Maintain the BM25 lexical index alongside the vector collection during ingest.",
+    )
+    hybrid_candidates: int = Field(
+        default=20,
+        description="Results taken from each of the vector and lexical rankings before fusion.",
+    )
+    document_index_enabled: bool = Field(
+        default=True,
+        description="Keep a mean-pooled embedding per document during ingest (needed by two_tier retrieval).",
+    )
+    two_tier_documents: int = Field(
+        default=10,
+        description="Documents whose chunks are searched in two_tier retrieval.",
+    )
+    rrf_k: int = Field(
+        default=60,
+        description="Reciprocal rank fusion constant; larger values flatten the rank weighting.",
+    )
+    lexical_merge_factor: int = Field(
+        default=4,
+        description="Number of similar-sized lexical index segments merged into one.",
+    )
+    lexical_max_df_ratio: float = Field(
+        default=0.2,
+        description="Query terms found in more than this share of chunks are skipped when rarer terms exist.",
+    )
     allow_upload_size_mb: int = Field(
         default=15,
         description="Maximum upload size for a single document through the API.",
     )
+    upload_max_files: int = Field(
+        default=20,
+        description="Maximum number of files accepted by one upload request.",
+    )
     environment_name: str = Field(
         default="development",
         description="Environment identifier for observability.",
@@ -76,6 +365,9 @@ class Settings(BaseSettings):
         """Ensure directories exist and convert relative paths to absolute ones."""
         self.source_dir = self._resolve_and_prepare(self.source_dir)
         self.vector_store_dir = self._resolve_and_prepare(self.vector_store_dir)
+        self.collections_dir = self._resolve_and_prepare(self.collections_dir)
+        self.snapshot_dir = self._resolve_and_prepare(self.snapshot_dir)
+        self.export_dir = self._resolve_and_prepare(self.export_dir)
 
     def _resolve_and_prepare(self, path_value: Path) -> Path:
         resolved = path_value
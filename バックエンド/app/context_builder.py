@@ -0,0 +1,147 @@
+"""Assemble the prompt context from retrieved chunks within a token budget."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from .tokens import TokenCounter
+
+_SHINGLE_SIZE = 5
+_MIN_OVERLAP_CHARS = 20
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class _Selected:
+    item: Dict
+    rank: int
+    path: str
+    index: Optional[int]
+    text: str
+    shingles: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class ContextResult:
+    context: str
+    documents: List[Dict]
+    tokens: int = 0
+
+
+class ContextBuilder:
+    """Turns ranked chunks into a compact, citable context block.
+
+    Chunks are taken in relevance order until ``max_tokens`` is reached:
+
+    * a chunk whose text is mostly contained in an already selected chunk
+      (``dedup_threshold`` of its character shingles) is dropped;
+    * a chunk adjacent to a selected chunk of the same file loses the text the
+      two share through chunk overlap, and is rendered right after it;
+    * every chunk keeps its own ``[source:chunk]`` label, so citations still
+      point at real chunks.
+    """
+
+    def __init__(self, counter: TokenCounter, max_tokens: int, dedup_threshold: float = 0.85) -> None:
+        self.counter = counter
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+
+    def build(self, retrieved: List[Dict]) -> ContextResult:
+        selected: List[_Selected] = []
+        used_tokens = 0
+        for rank, item in enumerate(retrieved):
+            metadata = item.get("metadata") or {}
+            candidate = _Selected(
+                item=item,
+                rank=rank,
+                path=str(metadata.get("path") or metadata.get("source") or ""),
+                index=_chunk_index(metadata),
+                text=item["content"],
+                shingles=_shingles(item["content"]),
+            )
+            if any(self._is_duplicate(candidate, other) for other in selected):
+                continue
+            candidate.text = self._trim_overlaps(candidate, selected)
+            cost = self.counter.count(f"[{_label(item)}] {candidate.text}\n")
+            if self.max_tokens > 0 and used_tokens + cost > self.max_tokens:
+                if selected:
+                    continue
+                # Always keep the best chunk, cut down to the budget.
+                label_cost = self.counter.count(f"[{_label(item)}] \n")
+                candidate.text = self.counter.truncate(candidate.text, self.max_tokens - label_cost)
+                cost = self.counter.count(f"[{_label(item)}] {candidate.text}\n")
+            selected.append(candidate)
+            used_tokens += cost
+        return ContextResult(
+            context=self._render(selected),
+            documents=[entry.item for entry in sorted(selected, key=lambda entry: entry.rank)],
+            tokens=used_tokens,
+        )
+
+    def _is_duplicate(self, candidate: _Selected, other: _Selected) -> bool:
+        if not candidate.shingles:
+            return candidate.text == other.text
+        shared = len(candidate.shingles & other.shingles)
+        return shared / len(candidate.shingles) >= self.dedup_threshold
+
+    def _trim_overlaps(self, candidate: _Selected, selected: List[_Selected]) -> str:
+        text = candidate.text
+        if candidate.index is None:
+            return text
+        for other in selected:
+            if other.path != candidate.path or other.index is None:
+                continue
+            if other.index == candidate.index - 1:
+                text = text[_overlap(other.text, text) :]
+            elif other.index == candidate.index + 1:
+                overlap = _overlap(text, other.text)
+                text = text[: len(text) - overlap] if overlap else text
+        return text
+
+    def _render(self, selected: List[_Selected]) -> str:
+        """Group chunks by file (best-ranked file first) and join adjacent ones into one paragraph."""
+        groups: Dict[str, List[_Selected]] = {}
+        for entry in sorted(selected, key=lambda entry: entry.rank):
+            groups.setdefault(entry.path, []).append(entry)
+        paragraphs: List[str] = []
+        for entries in groups.values():
+            entries.sort(key=lambda entry: (entry.index is None, entry.index or 0, entry.rank))
+            current: List[str] = []
+            previous: Optional[int] = None
+            for entry in entries:
+                part = f"[{_label(entry.item)}] {entry.text}"
+                if current and (entry.index is None or previous is None or entry.index != previous + 1):
+                    paragraphs.append(" ".join(current))
+                    current = []
+                current.append(part)
+                previous = entry.index
+            if current:
+                paragraphs.append(" ".join(current))
+        return "\n".join(paragraphs)
+
+
+def _label(item: Dict) -> str:
+    metadata = item.get("metadata") or {}
+    return f"{metadata.get('source')}:{metadata.get('chunk_index')}"
+
+
+def _chunk_index(metadata: Dict) -> Optional[int]:
+    try:
+        return int(metadata.get("chunk_index"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _shingles(text: str) -> Set[str]:
+    normalized = _WHITESPACE.sub(" ", text).strip()
+    return {normalized[index : index + _SHINGLE_SIZE] for index in range(len(normalized) - _SHINGLE_SIZE + 1)}
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is also a prefix of ``right``."""
+    for size in range(min(len(left), len(right)), _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
@@ -0,0 +1,103 @@
+"""Coordination between the writer process and the reader workers sharing one data directory."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+WRITER_LOCK_FILENAME = "writer.lock"
+INDEX_VERSION_FILENAME = "index_version"
+
+
+class WriterLockHeld(RuntimeError):
+    """Raised when another process already owns the data directory for writing."""
+
+
+class WriterLock:
+    """Exclusive advisory lock held for the life of the one process allowed to ingest.
+
+    The lock belongs to the open file, so the operating system releases it
+    when the process exits, even after a crash.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._handle = None
+
+    def acquire(self) -> None:
+        handle = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            handle.seek(0)
+            owner = handle.read().strip() or "unknown"
+            handle.close()
+            raise WriterLockHeld(
+                f"{self.path} is locked by another process (pid {owner}); "
+                "run additional workers with RAG_PROCESS_ROLE=reader"
+            ) from None
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._handle = handle
+
+    def release(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class IndexVersion:
+    """Counter file bumped by the writer after every ingest commit and polled by readers.
+
+    :meth:`changed` reads the file at most once per ``interval`` seconds and
+    reports each new version to exactly one caller.
+    """
+
+    def __init__(self, path: Path, interval: float = 1.0) -> None:
+        self.path = Path(path)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._seen = self.read()
+        self._checked = time.monotonic()
+
+    def read(self) -> int:
+        try:
+            return int(self.path.read_text(encoding="utf-8") or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump(self) -> int:
+        version = self.read() + 1
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(str(version), encoding="utf-8")
+        os.replace(temp_path, self.path)
+        self._seen = version
+        return version
+
+    def changed(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked < self.interval:
+            return False
+        with self._lock:
+            if now - self._checked < self.interval:
+                return False
+            self._checked = now
+            version = self.read()
+            if version == self._seen:
+                return False
+            self._seen = version
+            return True
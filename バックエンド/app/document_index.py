@@ -0,0 +1,143 @@
+"""Document-level embeddings used to narrow chunk search to the most relevant files."""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+DOCUMENT_INDEX_FILENAME = "document_index.npz"
+
+
+def add_to_sums(sums: Dict[str, np.ndarray], metadatas: Iterable[Mapping], embeddings: np.ndarray) -> None:
+    """Add each chunk embedding to the running sum of its document (its ``path`` metadata).
+
+    The normalized sum equals the normalized mean, so ``put(path, [sums[path]])``
+    records the same document embedding as indexing all chunks at once.
+    """
+    for metadata, vector in zip(metadatas, embeddings):
+        path = str(metadata.get("path") or "")
+        if path:
+            sums[path] = sums[path] + vector if path in sums else np.array(vector, dtype=np.float32)
+
+
+class DocumentIndex:
+    """One embedding per document: the normalized mean of its chunk embeddings.
+
+    Documents are keyed by their ``path`` metadata. The index is small (one
+    row per file rather than per chunk), so it is searched exactly with one
+    matrix product. Changes stay in memory until :meth:`save`, which replaces
+    the ``.npz`` file atomically; a ``read_only`` index (in a reader worker)
+    never writes and picks up the writer's saves with :meth:`reload`.
+    """
+
+    def __init__(self, path: Path, read_only: bool = False) -> None:
+        self.path = Path(path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, np.ndarray] = {}
+        # (paths, matrix) rebuilt lazily after a change.
+        self._matrix: Optional[Tuple[List[str], np.ndarray]] = None
+        self._dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def _load(self) -> None:
+        vectors: Dict[str, np.ndarray] = {}
+        if self.path.exists():
+            with np.load(self.path, allow_pickle=False) as payload:
+                matrix = payload["vectors"]
+                vectors = {str(path): matrix[row] for row, path in enumerate(payload["paths"])}
+        with self._lock:
+            self._vectors = vectors
+            self._matrix = None
+            self._dirty = False
+
+    def reload(self) -> None:
+        self._load()
+
+    def put(self, path: str, chunk_embeddings: Sequence[Sequence[float]]) -> None:
+        """Set the embedding of ``path`` from all of its chunk embeddings."""
+        if not len(chunk_embeddings):
+            self.remove([path])
+            return
+        vector = np.asarray(chunk_embeddings, dtype=np.float32).mean(axis=0)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        with self._lock:
+            existing = next(iter(self._vectors.values()), None)
+            if existing is not None and existing.shape != vector.shape:
+                # Another embedding model: every document is being re-ingested anyway.
+                self._vectors.clear()
+            self._vectors[path] = vector
+            self._matrix = None
+            self._dirty = True
+
+    def remove(self, paths: Iterable[str]) -> None:
+        with self._lock:
+            for path in paths:
+                if self._vectors.pop(path, None) is not None:
+                    self._matrix = None
+                    self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors.clear()
+            self._matrix = None
+            self._dirty = True
+
+    def search(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        top_n: int,
+        allowed: Optional[Set[str]] = None,
+    ) -> List[List[str]]:
+        """Paths of the ``top_n`` documents closest (by cosine) to each query, only among ``allowed`` if given."""
+        paths, matrix = self._current()
+        if allowed is not None:
+            keep = [position for position, path in enumerate(paths) if path in allowed]
+            paths, matrix = [paths[position] for position in keep], matrix[keep]
+        if not paths or top_n <= 0:
+            return [[] for _ in query_embeddings]
+        similarities = np.asarray(query_embeddings, dtype=np.float32) @ matrix.T
+        top_n = min(top_n, len(paths))
+        results = []
+        for row in similarities:
+            nearest = np.argpartition(-row, top_n - 1)[:top_n]
+            results.append([paths[index] for index in nearest[np.argsort(-row[nearest])]])
+        return results
+
+    def save(self) -> None:
+        if self.read_only:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            paths = list(self._vectors)
+            vectors = np.stack([self._vectors[path] for path in paths]) if paths else np.zeros((0, 0), np.float32)
+            self._dirty = False
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "wb") as handle:
+            np.savez(handle, paths=np.asarray(paths, dtype=np.str_), vectors=vectors)
+        os.replace(temp_path, self.path)
+
+    def snapshot(self, destination: Path) -> None:
+        """Write the saved state of the index to ``destination``."""
+        self.save()
+        if self.path.exists():
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(self.path.read_bytes())
+
+    def _current(self) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            if self._matrix is None:
+                paths = list(self._vectors)
+                matrix = np.stack([self._vectors[path] for path in paths]) if paths else np.zeros((0, 0), np.float32)
+                self._matrix = (paths, matrix)
+            return self._matrix
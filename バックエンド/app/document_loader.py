@@ -2,14 +2,25 @@
 
 from __future__ import annotations
 
+import bisect
+import codecs
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, Iterator, List, Optional
 
 from pypdf import PdfReader
 
+from .chunker import TokenChunker
+from .filters import MetadataValue, folder_metadata, normalize_extension, normalize_folder
+from .manifest import hash_file
+from .page_cache import PdfPageCache
+from .tokens import TokenCounter
+
 
 SUPPORTED_EXTENSIONS = {".pdf", ".txt", ".md", ".markdown"}
+# Bumped whenever chunk boundaries or metadata fields change, so files are re-ingested.
+CHUNKER_VERSION = "tokens-v2"
+_READ_BLOCK_BYTES = 256 * 1024
 
 
 @dataclass
@@ -17,63 +28,181 @@ class DocumentChunk:
     """Represents a document chunk with metadata."""
 
     content: str
-    metadata: Dict[str, str]
+    metadata: Dict[str, MetadataValue]
+    id: Optional[str] = None
 
 
-class DocumentLoader:
-    """Loads and chunks text documents from disk."""
+@dataclass
+class PdfPageTask:
+    """A range of PDF pages extracted in one worker task."""
 
-    def __init__(self, chunk_size: int, chunk_overlap: int) -> None:
-        if chunk_overlap >= chunk_size:
-            raise ValueError("chunk_overlap must be smaller than chunk_size")
+    path: Path
+    content_hash: str
+    start: int
+    stop: int
+
+
+class DocumentLoader:
+    """Loads and chunks text documents from disk.
+
+    ``chunk_size`` and ``chunk_overlap`` are measured in tokens of
+    ``tokenizer_model`` (see :class:`TokenCounter`). With ``pdf_cache_dir``
+    the text of every PDF page is cached on disk, and PDFs with more than
+    ``pdf_pages_per_task`` uncached pages can be split into
+    :class:`PdfPageTask` ranges for parallel extraction. Files under
+    ``root_dir`` get ``folder`` metadata relative to it (see
+    :func:`folder_metadata`) for folder filters.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        tokenizer_model: str = "gpt-4o-mini",
+        tokenizer_cache_dir: Optional[str] = None,
+        pdf_cache_dir: Optional[Path] = None,
+        pdf_pages_per_task: int = 32,
+        root_dir: Optional[Path] = None,
+    ) -> None:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.pdf_cache = PdfPageCache(pdf_cache_dir) if pdf_cache_dir else None
+        self.pdf_pages_per_task = max(pdf_pages_per_task, 1)
+        self.root_dir = Path(root_dir).resolve() if root_dir else None
+        self.chunker = TokenChunker(TokenCounter(tokenizer_model, tokenizer_cache_dir), chunk_size, chunk_overlap)
+
+    @property
+    def signature(self) -> str:
+        """Identifies the chunking; files chunked with another signature are re-ingested."""
+        return f"{CHUNKER_VERSION}:{self.chunk_size}/{self.chunk_overlap}"
 
     def load(self, target_paths: Iterable[Path]) -> List[DocumentChunk]:
         """Load documents from the provided paths."""
         chunks: List[DocumentChunk] = []
         for file_path in target_paths:
-            if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
-                continue
-            text = self._read_file(file_path)
-            if not text.strip():
-                continue
-            chunks.extend(self._chunk_document(text, file_path))
+            chunks.extend(self.load_file(file_path))
         return chunks
 
-    def _read_file(self, file_path: Path) -> str:
+    def load_file(self, file_path: Path, content_hash: Optional[str] = None) -> List[DocumentChunk]:
+        """Load and chunk a single document."""
+        return list(self.iter_chunks(file_path, content_hash))
+
+    def iter_chunks(self, file_path: Path, content_hash: Optional[str] = None) -> Iterator[DocumentChunk]:
+        """Yield the chunks of one document without reading it into memory at once.
+
+        ``content_hash`` is the file's :func:`hash_file` digest when the caller
+        already has it (e.g. from the ingest plan); it keys the PDF page cache.
+        """
+        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            return
+        file_metadata = self._file_metadata(file_path)
+        page_starts: List[int] = []
+        blocks = self._read_blocks(file_path, page_starts, content_hash)
+        for index, chunk in enumerate(self.chunker.chunks(blocks)):
+            content = chunk.text.strip()
+            if not content:
+                continue
+            start = chunk.start + len(chunk.text) - len(chunk.text.lstrip())
+            metadata = {
+                **file_metadata,
+                "chunk_index": str(index),
+                "char_start": str(start),
+                "char_end": str(start + len(content)),
+            }
+            if chunk.headings:
+                metadata["heading"] = " > ".join(chunk.headings)
+            if page_starts:
+                first_page = bisect.bisect_right(page_starts, start)
+                last_page = bisect.bisect_right(page_starts, start + len(content) - 1)
+                metadata["page"] = str(first_page)
+                if last_page != first_page:
+                    metadata["page_end"] = str(last_page)
+            yield DocumentChunk(content=content, metadata=metadata)
+
+    def _file_metadata(self, file_path: Path) -> Dict[str, str]:
+        metadata = {
+            "source": file_path.name,
+            "path": str(file_path),
+            "extension": normalize_extension(file_path.suffix),
+        }
+        if self.root_dir is not None:
+            try:
+                relative = file_path.resolve().parent.relative_to(self.root_dir)
+            except ValueError:
+                return metadata
+            metadata.update(folder_metadata(normalize_folder(relative.as_posix())))
+        return metadata
+
+    def pdf_page_tasks(self, file_path: Path, content_hash: Optional[str] = None) -> List[PdfPageTask]:
+        """Split the uncached pages of a large PDF into ranges for parallel extraction.
+
+        Returns an empty list when the PDF is small enough (or cached enough)
+        to be handled by a single :meth:`load_file` call. The file is only
+        hashed when ``content_hash`` is not given.
+        """
+        if self.pdf_cache is None or file_path.suffix.lower() != ".pdf":
+            return []
+        content_hash = content_hash or hash_file(file_path)
+        page_count = self._pdf_page_count(file_path, content_hash)
+        missing = self.pdf_cache.missing_pages(content_hash, page_count)
+        if len(missing) <= self.pdf_pages_per_task:
+            return []
+        return [
+            PdfPageTask(
+                path=file_path,
+                content_hash=content_hash,
+                start=missing[start],
+                stop=missing[min(start + self.pdf_pages_per_task, len(missing)) - 1] + 1,
+            )
+            for start in range(0, len(missing), self.pdf_pages_per_task)
+        ]
+
+    def extract_pdf_pages(self, task: PdfPageTask) -> int:
+        """Extract and cache the pages of ``task``; returns the number of pages."""
+        reader = PdfReader(str(task.path))
+        for number in range(task.start, task.stop):
+            self.pdf_cache.put(task.content_hash, number, reader.pages[number].extract_text() or "")
+        return task.stop - task.start
+
+    def _pdf_page_count(self, file_path: Path, content_hash: str) -> int:
+        page_count = self.pdf_cache.page_count(content_hash)
+        if page_count is None:
+            page_count = len(PdfReader(str(file_path)).pages)
+            self.pdf_cache.set_page_count(content_hash, page_count)
+        return page_count
+
+    def _read_blocks(
+        self, file_path: Path, page_starts: List[int], content_hash: Optional[str] = None
+    ) -> Iterator[str]:
         suffix = file_path.suffix.lower()
         if suffix == ".pdf":
-            return self._read_pdf(file_path)
-        return file_path.read_text(encoding="utf-8")
-
-    def _read_pdf(self, file_path: Path) -> str:
-        reader = PdfReader(str(file_path))
-        pages = []
-        for page in reader.pages:
-            pages.append(page.extract_text() or "")
-        return "\n".join(pages)
-
-    def _chunk_document(self, text: str, file_path: Path) -> List[DocumentChunk]:
-        normalized = " ".join(text.split())
-        chunks: List[DocumentChunk] = []
-        start = 0
-        index = 0
-        while start < len(normalized):
-            end = min(len(normalized), start + self.chunk_size)
-            chunk_text = normalized[start:end].strip()
-            if chunk_text:
-                metadata = {
-                    "source": file_path.name,
-                    "path": str(file_path),
-                    "chunk_index": str(index),
-                }
-                chunks.append(DocumentChunk(content=chunk_text, metadata=metadata))
-            index += 1
-            start += self.chunk_size - self.chunk_overlap
-            if self.chunk_size <= self.chunk_overlap:
-                break
-        return chunks
+            offset = 0
+            for text in self._read_pdf_pages(file_path, content_hash):
+                page_starts.append(offset)
+                offset += len(text)
+                yield text
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with file_path.open("rb") as handle:
+            for block in iter(lambda: handle.read(_READ_BLOCK_BYTES), b""):
+                yield decoder.decode(block)
+        yield decoder.decode(b"", final=True)
+
+    def _read_pdf_pages(self, file_path: Path, content_hash: Optional[str] = None) -> Iterator[str]:
+        if self.pdf_cache is None:
+            for page in PdfReader(str(file_path)).pages:
+                yield (page.extract_text() or "") + "\n"
+            return
+        content_hash = content_hash or hash_file(file_path)
+        reader: Optional[PdfReader] = None
+        for number in range(self._pdf_page_count(file_path, content_hash)):
+            text = self.pdf_cache.get(content_hash, number)
+            if text is None:
+                # Only opened when a page is missing, so a fully cached PDF is never parsed.
+                reader = reader or PdfReader(str(file_path))
+                text = reader.pages[number].extract_text() or ""
+                self.pdf_cache.put(content_hash, number, text)
+            yield text + "\n"
 
 
 def discover_documents(root_dir: Path) -> List[Path]:
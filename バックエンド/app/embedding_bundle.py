@@ -0,0 +1,154 @@
+"""Portable bundles of chunks and their embeddings, for loading a collection without the model.
+
+A bundle is a directory:
+
+* ``bundle.json``: format version, embedding model and signature, chunker
+  signature, dimension, row count and the ingest manifest records
+* ``chunks.jsonl``: one ``{"id", "document", "metadata"}`` object per chunk
+* ``embeddings.npy``: ``(count, dimension)`` float32 or float16 matrix, row
+  ``i`` belonging to line ``i`` of ``chunks.jsonl``
+
+Both data files are written and read in pages, so a bundle of any size is
+streamed rather than held in memory.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from .filters import MetadataValue
+
+BUNDLE_FORMAT = "rag-embedding-bundle"
+BUNDLE_VERSION = 1
+BUNDLE_INFO_FILENAME = "bundle.json"
+BUNDLE_DTYPES = ("float32", "float16")
+_CHUNKS_FILENAME = "chunks.jsonl"
+_EMBEDDINGS_FILENAME = "embeddings.npy"
+
+RecordPage = Tuple[List[str], List[str], List[Dict[str, MetadataValue]], np.ndarray]
+
+
+class BundleError(ValueError):
+    """The bundle is malformed or was made for another embedding space."""
+
+
+@dataclass
+class BundleInfo:
+    collection: str
+    created_at: str
+    embedding_model: str
+    embedding_signature: str
+    chunker_signature: str
+    count: int
+    dimension: int = 0
+    dtype: str = "float32"
+    files: List[Dict] = field(default_factory=list)
+
+
+def write_bundle(directory: Path, info: BundleInfo, pages: Iterable[RecordPage]) -> None:
+    """Write ``info.count`` chunks from ``pages`` into the new directory ``directory``.
+
+    Raises :class:`BundleError` if the pages do not add up to ``info.count``
+    rows (the store changed while it was exported).
+    """
+    if info.dtype not in BUNDLE_DTYPES:
+        raise BundleError(f"unsupported bundle dtype: {info.dtype} (expected one of {', '.join(BUNDLE_DTYPES)})")
+    directory.mkdir(parents=True)
+    embeddings = None
+    written = 0
+    with open(directory / _CHUNKS_FILENAME, "w", encoding="utf-8") as chunks_file:
+        for ids, documents, metadatas, vectors in pages:
+            if embeddings is None:
+                info.dimension = vectors.shape[1]
+                embeddings = np.lib.format.open_memmap(
+                    directory / _EMBEDDINGS_FILENAME, mode="w+", dtype=info.dtype, shape=(info.count, info.dimension)
+                )
+            if written + len(ids) > info.count:
+                raise BundleError("the collection changed while it was exported")
+            embeddings[written : written + len(ids)] = vectors
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                chunks_file.write(
+                    json.dumps({"id": chunk_id, "document": document, "metadata": metadata}, ensure_ascii=False) + "\n"
+                )
+            written += len(ids)
+    if written != info.count:
+        raise BundleError("the collection changed while it was exported")
+    if embeddings is not None:
+        embeddings.flush()
+        del embeddings
+    else:
+        np.save(directory / _EMBEDDINGS_FILENAME, np.zeros((0, 0), dtype=info.dtype))
+    payload = {"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION, **asdict(info)}
+    (directory / BUNDLE_INFO_FILENAME).write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+
+def read_bundle_info(directory: Path) -> BundleInfo:
+    """Load ``bundle.json`` and check that both data files hold ``count`` rows."""
+    info_path = directory / BUNDLE_INFO_FILENAME
+    if not info_path.is_file():
+        raise BundleError(f"{directory} is not an embedding bundle (no {BUNDLE_INFO_FILENAME})")
+    try:
+        payload = json.loads(info_path.read_text(encoding="utf-8"))
+    except ValueError as exc:
+        raise BundleError(f"unreadable {BUNDLE_INFO_FILENAME}: {exc}") from None
+    if payload.pop("format", None) != BUNDLE_FORMAT or payload.pop("version", None) != BUNDLE_VERSION:
+        raise BundleError(f"{directory} is not a version {BUNDLE_VERSION} embedding bundle")
+    try:
+        info = BundleInfo(**payload)
+    except TypeError as exc:
+        raise BundleError(f"invalid {BUNDLE_INFO_FILENAME}: {exc}") from None
+    try:
+        embeddings = np.load(directory / _EMBEDDINGS_FILENAME, mmap_mode="r")
+    except (OSError, ValueError) as exc:
+        raise BundleError(f"unreadable {_EMBEDDINGS_FILENAME}: {exc}") from None
+    if info.count and embeddings.shape != (info.count, info.dimension):
+        raise BundleError(
+            f"{_EMBEDDINGS_FILENAME} has shape {embeddings.shape}, expected {(info.count, info.dimension)}"
+        )
+    # Checked up front so an import never stops halfway through a truncated bundle.
+    try:
+        with open(directory / _CHUNKS_FILENAME, "rb") as chunks_file:
+            lines = sum(block.count(b"\n") for block in iter(lambda: chunks_file.read(1024 * 1024), b""))
+    except OSError as exc:
+        raise BundleError(f"unreadable {_CHUNKS_FILENAME}: {exc}") from None
+    if lines != info.count:
+        raise BundleError(f"{_CHUNKS_FILENAME} has {lines} chunks, expected {info.count}")
+    return info
+
+
+def iter_bundle(directory: Path, info: BundleInfo, page_size: int) -> Iterator[RecordPage]:
+    """Yield ``(ids, documents, metadatas, embeddings)`` pages of a bundle, embeddings as float32."""
+    if not info.count:
+        return
+    embeddings = np.load(directory / _EMBEDDINGS_FILENAME, mmap_mode="r")
+    page_size = max(page_size, 1)
+    with open(directory / _CHUNKS_FILENAME, encoding="utf-8") as chunks_file:
+        start = 0
+        lines: List[Dict] = []
+        for line in chunks_file:
+            lines.append(json.loads(line))
+            if len(lines) == page_size:
+                yield _page(lines, embeddings, start)
+                start += len(lines)
+                lines = []
+        if lines:
+            yield _page(lines, embeddings, start)
+            start += len(lines)
+    if start != info.count:
+        raise BundleError(f"{_CHUNKS_FILENAME} has {start} chunks, expected {info.count}")
+
+
+def _page(lines: Sequence[Dict], embeddings: np.ndarray, start: int) -> RecordPage:
+    if start + len(lines) > len(embeddings):
+        raise BundleError(f"{_CHUNKS_FILENAME} has more chunks than {_EMBEDDINGS_FILENAME} has rows")
+    return (
+        [line["id"] for line in lines],
+        [line["document"] for line in lines],
+        [line["metadata"] for line in lines],
+        np.asarray(embeddings[start : start + len(lines)], dtype=np.float32),
+    )
@@ -0,0 +1,76 @@
+"""Serve the embedding model from one process for every worker on the host.
+
+    uvicorn app.embedding_server:app --host 127.0.0.1 --port 8100
+
+Workers started with ``RAG_EMBEDDING_SERVER_URL`` use
+:class:`~app.embeddings.RemoteEmbeddingService`: they add the ``query:`` /
+``passage:`` prefixes themselves and send finished texts here. The model,
+batch size, threads and device come from the same ``RAG_EMBEDDING_*``
+settings as the API. Single-text requests (questions) from all workers go
+through one micro-batcher, so concurrent questions share a forward pass.
+"""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import List
+
+import numpy as np
+from fastapi import FastAPI, Response
+from pydantic import BaseModel, Field
+
+from .config import settings
+from .embeddings import EmbeddingService
+
+# Prefixes are applied by the clients; this service encodes texts as given.
+service = EmbeddingService(
+    model_name=settings.embedding_model,
+    batch_size=settings.embedding_batch_size,
+    num_threads=settings.embedding_threads,
+    normalize=settings.embedding_normalize,
+    use_prefixes=False,
+    query_cache_size=settings.query_embedding_cache_size,
+    batch_window_ms=settings.embedding_batch_window_ms,
+    max_query_batch=settings.embedding_max_query_batch,
+    device=settings.embedding_device,
+)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    service.model  # load before accepting requests
+    yield
+
+
+app = FastAPI(title="Embedding server", version="1.0.0", lifespan=lifespan)
+
+
+class EncodeRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1)
+
+
+@app.get("/info")
+def info() -> dict:
+    """Model identity; clients refuse to use a server whose vectors would not match their store."""
+    return {
+        "model": service.model_name,
+        "normalize": service.normalize,
+        "dim": service.model.get_sentence_embedding_dimension(),
+    }
+
+
+@app.post("/encode")
+def encode(payload: EncodeRequest) -> Response:
+    """Embed ``texts``; the response body is a little-endian float32 matrix, one row per text."""
+    if len(payload.texts) == 1:
+        vectors = [service.embed_query(payload.texts[0])]
+    else:
+        vectors = service.embed_queries(payload.texts)
+    matrix = np.asarray(vectors, dtype="<f4")
+    return Response(matrix.tobytes(), media_type="application/octet-stream")
+
+
+@app.get("/stats")
+def stats() -> dict:
+    """Throughput and cache counters, as ``/embeddings/stats`` of the API."""
+    return service.stats()
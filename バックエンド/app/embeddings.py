@@ -0,0 +1,226 @@
+"""Embedding service shared by ingest and query: batching, prefixes and caching."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+QUERY_PREFIX = "query: "
+PASSAGE_PREFIX = "passage: "
+
+
+class EmbeddingService:
+    """Owns the SentenceTransformer model and every call into it.
+
+    * Documents are encoded in ``batch_size`` batches with the ``passage:``
+      prefix, queries with ``query:``, as the e5 family expects.
+    * Query embeddings are kept in an LRU cache of ``query_cache_size`` entries.
+    * Concurrent query misses are gathered by a micro-batcher for up to
+      ``batch_window_ms`` and encoded in a single forward pass.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        num_threads: int = 0,
+        normalize: bool = True,
+        use_prefixes: Optional[bool] = None,
+        query_cache_size: int = 1024,
+        batch_window_ms: float = 5.0,
+        max_query_batch: int = 32,
+        device: Optional[str] = None,
+    ) -> None:
+        self.model_name = model_name
+        self.batch_size = max(batch_size, 1)
+        self.num_threads = num_threads
+        self.normalize = normalize
+        self.use_prefixes = "e5" in model_name.lower() if use_prefixes is None else use_prefixes
+        self.query_cache_size = query_cache_size
+        self.batch_window = batch_window_ms / 1000
+        self.max_query_batch = max(max_query_batch, 1)
+        self.device = device
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending: List[Tuple[str, Future]] = []
+        self._pending_ready = threading.Condition()
+        self._batcher: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.embedded_texts = 0
+        self.encode_seconds = 0.0
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
+        self.query_batches = 0
+
+    @property
+    def signature(self) -> str:
+        """Identifies the vector space; embeddings from different signatures are not comparable."""
+        return f"{self.model_name}|prefixes={self.use_prefixes}|normalize={self.normalize}"
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads > 0:
+            import torch
+
+            torch.set_num_threads(self.num_threads)
+        return SentenceTransformer(self.model_name, device=self.device)
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed passages for storage."""
+        prefix = PASSAGE_PREFIX if self.use_prefixes else ""
+        return self._encode([f"{prefix}{text}" for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query, served from the LRU cache when possible."""
+        with self._cache_lock:
+            cached = self._query_cache.get(text)
+            if cached is not None:
+                self._query_cache.move_to_end(text)
+                self.query_cache_hits += 1
+                return cached
+            self.query_cache_misses += 1
+        embedding = self._submit_query(text).result()
+        with self._cache_lock:
+            self._query_cache[text] = embedding
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return embedding
+
+    def embed_queries(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed many queries in one call, bypassing the micro-batcher."""
+        prefix = QUERY_PREFIX if self.use_prefixes else ""
+        return self._encode([f"{prefix}{text}" for text in texts])
+
+    def stats(self) -> Dict:
+        lookups = self.query_cache_hits + self.query_cache_misses
+        return {
+            "model": self.model_name,
+            "embedded_texts": self.embedded_texts,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "embeddings_per_second": round(self.embedded_texts / self.encode_seconds, 2)
+            if self.encode_seconds
+            else 0.0,
+            "query_cache_entries": len(self._query_cache),
+            "query_cache_hits": self.query_cache_hits,
+            "query_cache_misses": self.query_cache_misses,
+            "query_cache_hit_rate": round(self.query_cache_hits / lookups, 4) if lookups else 0.0,
+            "query_batches": self.query_batches,
+        }
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        started = time.perf_counter()
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.embedded_texts += len(texts)
+            self.encode_seconds += elapsed
+        return vectors.tolist()
+
+    def _submit_query(self, text: str) -> Future:
+        future: Future = Future()
+        with self._pending_ready:
+            if self._batcher is None:
+                self._batcher = threading.Thread(target=self._batch_loop, name="embed-batcher", daemon=True)
+                self._batcher.start()
+            self._pending.append((text, future))
+            self._pending_ready.notify()
+        return future
+
+    def _batch_loop(self) -> None:
+        while True:
+            with self._pending_ready:
+                while not self._pending:
+                    self._pending_ready.wait()
+                deadline = time.monotonic() + self.batch_window
+                while len(self._pending) < self.max_query_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._pending_ready.wait(remaining)
+                batch = self._pending[: self.max_query_batch]
+                del self._pending[: self.max_query_batch]
+            try:
+                vectors = self.embed_queries([text for text, _ in batch])
+            except Exception as exc:  # propagated to every waiting caller
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            with self._stats_lock:
+                self.query_batches += 1
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+class RemoteEmbeddingService(EmbeddingService):
+    """:class:`EmbeddingService` whose model runs in the embedding server (``app.embedding_server``).
+
+    Prefixes, the query cache and the micro-batcher stay in this process;
+    only the forward pass is sent to ``url``. Worker processes then share one
+    copy of the model instead of loading it each.
+    """
+
+    def __init__(self, url: str, model_name: str, timeout: float = 60.0, **kwargs) -> None:
+        super().__init__(model_name=model_name, **kwargs)
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _load_model(self):
+        return _RemoteModel(self.url, self.model_name, self.normalize, self.timeout)
+
+
+class _RemoteModel:
+    """The subset of ``SentenceTransformer.encode`` used above, answered by the embedding server."""
+
+    def __init__(self, url: str, model_name: str, normalize: bool, timeout: float) -> None:
+        self.client = httpx.Client(base_url=url, timeout=timeout)
+        response = self.client.get("/info")
+        response.raise_for_status()
+        info = response.json()
+        # Vectors from another model or normalization would not match the stored ones.
+        if info["model"] != model_name or info["normalize"] != normalize:
+            raise ValueError(
+                f"embedding server at {url} serves {info['model']} (normalize={info['normalize']}), "
+                f"expected {model_name} (normalize={normalize})"
+            )
+        self.dim = info["dim"]
+
+    def encode(self, texts: Sequence[str], **_) -> np.ndarray:
+        response = self.client.post("/encode", json={"texts": list(texts)})
+        response.raise_for_status()
+        return np.frombuffer(response.content, dtype="<f4").reshape(len(texts), self.dim)
+
+
+class ChromaEmbeddingFunction(EmbeddingFunction):
+    """Adapter so Chroma embeds documents through the shared service."""
+
+    def __init__(self, service: EmbeddingService) -> None:
+        self.service = service
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.service.embed_documents(list(input))
@@ -0,0 +1,154 @@
+"""Indexable chunk metadata and its translation into Chroma ``where`` filters."""
+
+from __future__ import annotations
+
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import PurePosixPath
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+MetadataValue = Union[str, int, float, bool]
+TAG_PREFIX = "tag_"
+FOLDER_PREFIX = "folder_"
+
+
+def normalize_extension(value: str) -> str:
+    """``".PDF"`` / ``"pdf"`` → ``"pdf"``."""
+    return value.strip().lstrip(".").lower()
+
+
+def normalize_tag(value: str) -> str:
+    return unicodedata.normalize("NFKC", value).strip().lower()
+
+
+def tag_key(tag: str) -> str:
+    """Metadata key carrying ``True`` on every chunk of a file with ``tag``."""
+    return f"{TAG_PREFIX}{normalize_tag(tag)}"
+
+
+def normalize_folder(value: str) -> str:
+    """Relative POSIX folder path without leading/trailing slashes, e.g. ``"hr/policies"``."""
+    parts = [part for part in PurePosixPath(value.replace("\\", "/")).parts if part not in ("", ".", "/")]
+    if ".." in parts:
+        raise ValueError(f"invalid folder: {value}")
+    return "/".join(parts)
+
+
+def folder_metadata(folder: str) -> Dict[str, str]:
+    """One exact-match key per folder level, so a folder prefix filter is a single equality.
+
+    ``"hr/policies/2024"`` → ``{"folder": "hr/policies/2024", "folder_1": "hr",
+    "folder_2": "hr/policies", "folder_3": "hr/policies/2024"}``.
+    """
+    metadata = {"folder": folder}
+    parts = folder.split("/") if folder else []
+    for depth in range(1, len(parts) + 1):
+        metadata[f"{FOLDER_PREFIX}{depth}"] = "/".join(parts[:depth])
+    return metadata
+
+
+@dataclass
+class SearchFilter:
+    """Restricts retrieval to chunks whose metadata matches every given condition.
+
+    List conditions match any of their values; ``tags`` require every tag.
+    """
+
+    sources: Optional[Sequence[str]] = None
+    path_prefixes: Optional[Sequence[str]] = None
+    extensions: Optional[Sequence[str]] = None
+    ingested_after: Optional[datetime] = None
+    ingested_before: Optional[datetime] = None
+    tags: Optional[Sequence[str]] = None
+
+    def to_where(self) -> Optional[Dict]:
+        """Build the Chroma ``where`` clause, or ``None`` when nothing is restricted.
+
+        Raises ``ValueError`` for values that cannot match, such as an empty
+        list or a folder containing ``..``.
+        """
+        conditions: List[Dict] = []
+        if self.sources is not None:
+            conditions.append(_any_of("source", [source.strip() for source in self.sources]))
+        if self.path_prefixes is not None:
+            folders = [normalize_folder(prefix) for prefix in self.path_prefixes]
+            if not folders:
+                raise ValueError("filter on path_prefixes needs at least one value")
+            # The source directory itself ("" or "/") matches everything.
+            if "" not in folders:
+                conditions.append(
+                    _or([{f"{FOLDER_PREFIX}{folder.count('/') + 1}": folder} for folder in _unique(folders)])
+                )
+        if self.extensions is not None:
+            conditions.append(_any_of("extension", [normalize_extension(value) for value in self.extensions]))
+        if self.ingested_after is not None:
+            conditions.append({"ingested_at": {"$gte": _epoch(self.ingested_after)}})
+        if self.ingested_before is not None:
+            conditions.append({"ingested_at": {"$lt": _epoch(self.ingested_before)}})
+        if self.tags is not None:
+            tags = _unique(tag for tag in map(normalize_tag, self.tags) if tag)
+            if not tags:
+                raise ValueError("filter on tags needs at least one value")
+            conditions.extend({f"{TAG_PREFIX}{tag}": True} for tag in tags)
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def matches(where: Mapping, metadata: Mapping[str, MetadataValue]) -> bool:
+    """Evaluate a Chroma ``where`` clause against one chunk's metadata in Python."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(clause, metadata) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(clause, metadata) for clause in condition):
+                return False
+        elif isinstance(condition, Mapping):
+            value = metadata.get(key)
+            if not all(_check(operator, value, operand) for operator, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _check(operator: str, value: Any, operand: Any) -> bool:
+    try:
+        return _OPERATORS[operator](value, operand)
+    except TypeError:  # e.g. a string compared with a number never matches
+        return False
+
+
+def _any_of(key: str, values: List[str]) -> Dict:
+    values = _unique(value for value in values if value)
+    if not values:
+        raise ValueError(f"filter on {key} needs at least one value")
+    return {key: values[0]} if len(values) == 1 else {key: {"$in": values}}
+
+
+def _or(conditions: List[Dict]) -> Dict:
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def _unique(values) -> List:
+    return list(dict.fromkeys(values))
+
+
+def _epoch(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
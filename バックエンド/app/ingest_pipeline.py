@@ -0,0 +1,300 @@
+"""Streaming ingestion pipeline: parallel parsing, batched embedding and bounded writes."""
+
+from __future__ import annotations
+
+import multiprocessing
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .document_loader import DocumentChunk, DocumentLoader
+from .vector_store import VectorStore
+
+PrepareCallback = Callable[[Path, List[DocumentChunk], int], None]
+FileDoneCallback = Callable[[Path, int], None]
+FileErrorCallback = Callable[[Path, Exception], None]
+ChunkPages = Iterator[List[DocumentChunk]]
+# Files above this size are chunked as a stream in the ingesting process
+# rather than returned whole from a worker process.
+STREAM_FILE_BYTES = 16 * 1024 * 1024
+
+
+class IngestCancelled(Exception):
+    """Raised from a progress hook to abort an ingest run."""
+
+
+class IngestProgress:
+    """Receives progress notifications from an ingest run. The default ignores them."""
+
+    def start(self, files: List[Path]) -> None:
+        """Called once with the files that will be parsed and embedded."""
+
+    def file_done(self, file_path: Path, chunk_count: int) -> None:
+        """Called after all chunks of a file have been written."""
+
+    def file_failed(self, file_path: Path, error: Exception) -> None:
+        """Called when a file could not be parsed; the run continues."""
+
+    def check_cancelled(self) -> None:
+        """Raise :class:`IngestCancelled` to stop the run at the next file boundary."""
+
+
+@dataclass
+class IngestStats:
+    """Counters and per-stage wall-clock timings collected during a pipeline run."""
+
+    files: int = 0
+    failed_files: int = 0
+    chunks: int = 0
+    stage_seconds: Dict[str, float] = field(
+        default_factory=lambda: {"parse": 0.0, "embed": 0.0, "write": 0.0}
+    )
+    elapsed_seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.chunks / self.elapsed_seconds
+
+    def as_dict(self) -> Dict:
+        return {
+            "failed_files": self.failed_files,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+            "stage_seconds": {name: round(value, 3) for name, value in self.stage_seconds.items()},
+        }
+
+
+class _ParseFailed(Exception):
+    """Wraps an error raised while parsing a file, so it is not mistaken for a callback's."""
+
+    def __init__(self, error: Exception) -> None:
+        super().__init__(str(error))
+        self.error = error
+
+
+@dataclass
+class _FileWrite:
+    """A file whose chunks are being buffered and written."""
+
+    path: Path
+    chunks: int = 0
+    parsed: bool = False
+    # IDs already written, deleted again if parsing fails further on.
+    written: List[str] = field(default_factory=list)
+    embedding_sum: Optional[np.ndarray] = None
+
+
+class IngestPipeline:
+    """Streams files through parse → embed → write without holding the corpus in memory.
+
+    Files are parsed and chunked in a process pool with a bounded number of
+    files in flight; the pages of a large PDF are extracted by several
+    workers at once. Files larger than :data:`STREAM_FILE_BYTES` (and every
+    file when ``workers`` is 1) are chunked in this process as a stream, so
+    a huge text export never has all of its chunks in memory. Chunks are
+    buffered until ``write_batch_size`` is reached, then embedded (the
+    embedding service batches the forward passes) and written to the vector
+    store; at most two write batches are resident, plus one whole file
+    returned from a worker. Once a file's chunks are written, the vector
+    store also records the file's document-level embedding (see
+    :meth:`VectorStore.index_document`) from the same chunk embeddings.
+    """
+
+    def __init__(
+        self,
+        loader: DocumentLoader,
+        vector_store: VectorStore,
+        workers: int,
+        write_batch_size: int,
+    ) -> None:
+        self.loader = loader
+        self.vector_store = vector_store
+        self.workers = max(workers, 1)
+        self.write_batch_size = max(write_batch_size, 1)
+
+    def run(
+        self,
+        files: Iterable[Path],
+        prepare: Optional[PrepareCallback] = None,
+        on_file_done: Optional[FileDoneCallback] = None,
+        on_file_error: Optional[FileErrorCallback] = None,
+        hashes: Optional[Dict[str, str]] = None,
+    ) -> IngestStats:
+        """Ingest ``files``.
+
+        ``prepare(path, chunks, first_index)`` runs on every page of parsed
+        chunks before they are buffered (e.g. to assign IDs; ``first_index``
+        is the position of the page's first chunk in the file), at least once
+        per file, and may raise to abort the run. ``on_file_done(path,
+        chunk_count)`` runs once all of a file's chunks have been written, so
+        callers can safely record progress. Files that fail to parse are
+        reported through ``on_file_error`` and skipped; chunks of theirs that
+        were already written are deleted. ``hashes`` maps file paths to
+        content hashes already computed by the caller, so files are not
+        hashed again.
+        """
+        stats = IngestStats()
+        started = time.perf_counter()
+        buffer: List[Tuple[_FileWrite, DocumentChunk]] = []
+        files_in_buffer: List[_FileWrite] = []
+        for file_path, pages in self._iter_parsed(files, stats, hashes or {}):
+            current = _FileWrite(file_path)
+            files_in_buffer.append(current)
+            try:
+                for page in pages:
+                    if prepare:
+                        prepare(file_path, page, current.chunks)
+                    current.chunks += len(page)
+                    buffer.extend((current, chunk) for chunk in page)
+                    if len(buffer) >= self.write_batch_size:
+                        self._flush(buffer, files_in_buffer, stats, on_file_done)
+                        buffer = []
+                if prepare and not current.chunks:
+                    prepare(file_path, [], 0)
+            except _ParseFailed as failure:
+                buffer = [item for item in buffer if item[0] is not current]
+                files_in_buffer.remove(current)
+                if current.written:
+                    self.vector_store.delete_ids(current.written)
+                stats.failed_files += 1
+                if on_file_error:
+                    on_file_error(file_path, failure.error)
+                continue
+            current.parsed = True
+        self._flush(buffer, files_in_buffer, stats, on_file_done)
+        stats.elapsed_seconds = time.perf_counter() - started
+        return stats
+
+    def _iter_parsed(
+        self, files: Iterable[Path], stats: IngestStats, hashes: Dict[str, str]
+    ) -> Iterator[Tuple[Path, ChunkPages]]:
+        """Yield each file with its chunk pages; the pages must be consumed before the next file."""
+        if self.workers == 1:
+            for file_path in files:
+                yield file_path, self._stream(file_path, hashes.get(str(file_path)), stats)
+            return
+        # "spawn" keeps the embedding model and Chroma client out of the workers.
+        context = multiprocessing.get_context("spawn")
+        max_in_flight = self.workers * 2
+        in_flight: Deque[Tuple[Path, Optional[Future], List[Future]]] = deque()
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        try:
+            file_iter = iter(files)
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    try:
+                        file_path = next(file_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    content_hash = hashes.get(str(file_path))
+                    try:
+                        page_tasks = self.loader.pdf_page_tasks(file_path, content_hash)
+                    except Exception:  # load_file reports the broken file
+                        page_tasks = []
+                    if page_tasks:
+                        # Large PDFs: pages are extracted across the pool into the
+                        # page cache, then chunked from the cache below.
+                        page_futures = [executor.submit(self.loader.extract_pdf_pages, task) for task in page_tasks]
+                        in_flight.append((file_path, None, page_futures))
+                    elif _file_size(file_path) > STREAM_FILE_BYTES:
+                        in_flight.append((file_path, None, []))
+                    else:
+                        future = executor.submit(self.loader.load_file, file_path, content_hash)
+                        in_flight.append((file_path, future, []))
+                if not in_flight:
+                    break
+                file_path, future, page_futures = in_flight.popleft()
+                if future is None:
+                    yield file_path, self._stream(file_path, hashes.get(str(file_path)), stats, page_futures)
+                else:
+                    yield file_path, self._result(future, stats)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _stream(
+        self,
+        file_path: Path,
+        content_hash: Optional[str],
+        stats: IngestStats,
+        page_futures: Sequence[Future] = (),
+    ) -> ChunkPages:
+        """Chunk ``file_path`` in this process, in pages of ``write_batch_size`` chunks."""
+        parse_started = time.perf_counter()
+        try:
+            for page_future in page_futures:
+                page_future.result()
+            chunks = self.loader.iter_chunks(file_path, content_hash)
+            while True:
+                page = list(islice(chunks, self.write_batch_size))
+                stats.stage_seconds["parse"] += time.perf_counter() - parse_started
+                if not page:
+                    return
+                yield page
+                parse_started = time.perf_counter()
+        except Exception as exc:  # reported to the caller per file
+            stats.stage_seconds["parse"] += time.perf_counter() - parse_started
+            raise _ParseFailed(exc) from exc
+
+    @staticmethod
+    def _result(future: Future, stats: IngestStats) -> ChunkPages:
+        wait_started = time.perf_counter()
+        try:
+            chunks = future.result()
+        except Exception as exc:  # reported to the caller per file
+            raise _ParseFailed(exc) from exc
+        finally:
+            stats.stage_seconds["parse"] += time.perf_counter() - wait_started
+        if chunks:
+            yield chunks
+
+    def _flush(
+        self,
+        buffer: List[Tuple[_FileWrite, DocumentChunk]],
+        files_in_buffer: List[_FileWrite],
+        stats: IngestStats,
+        on_file_done: Optional[FileDoneCallback],
+    ) -> None:
+        # A file's chunks are contiguous in the buffer but may span write batches and flushes.
+        for start in range(0, len(buffer), self.write_batch_size):
+            batch = buffer[start : start + self.write_batch_size]
+            chunks = [chunk for _, chunk in batch]
+            for chunk in chunks:
+                # IDs are needed to delete the chunks again should the rest of their file fail to parse.
+                chunk.id = chunk.id or str(uuid.uuid4())
+            embed_started = time.perf_counter()
+            embeddings = self.vector_store.embed([chunk.content for chunk in chunks])
+            stats.stage_seconds["embed"] += time.perf_counter() - embed_started
+            write_started = time.perf_counter()
+            stats.chunks += self.vector_store.add_chunks(chunks, embeddings=embeddings)
+            stats.stage_seconds["write"] += time.perf_counter() - write_started
+            for (owner, chunk), embedding in zip(batch, np.asarray(embeddings, dtype=np.float32)):
+                owner.written.append(chunk.id)
+                # The normalized sum is the normalized mean (see add_to_sums).
+                owner.embedding_sum = embedding if owner.embedding_sum is None else owner.embedding_sum + embedding
+        # Everything buffered is written now; only the file still being parsed stays open.
+        done = [item for item in files_in_buffer if item.parsed]
+        files_in_buffer[:] = [item for item in files_in_buffer if not item.parsed]
+        for item in done:
+            sums = [] if item.embedding_sum is None else [item.embedding_sum]
+            self.vector_store.index_document(str(item.path), sums)
+            stats.files += 1
+            if on_file_done:
+                on_file_done(item.path, item.chunks)
+
+
+def _file_size(file_path: Path) -> int:
+    try:
+        return file_path.stat().st_size
+    except OSError:  # load_file reports the missing file
+        return 0
@@ -0,0 +1,246 @@
+"""Background ingest jobs that run off the event loop and report progress."""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from .ingest_pipeline import IngestCancelled, IngestProgress
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when ``max_queued`` jobs are already waiting to start."""
+
+
+class CollectionBusy(RuntimeError):
+    """Raised when a collection stays locked by an ingest job past the wait timeout."""
+
+
+@dataclass
+class FileProgress:
+    path: str
+    status: str = "pending"
+    chunks: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestJob(IngestProgress):
+    """State of one ingest run, updated from the worker thread."""
+
+    id: str
+    collection: str
+    paths: Optional[List[str]]
+    status: JobStatus = JobStatus.QUEUED
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    files: Dict[str, FileProgress] = field(default_factory=dict)
+    processed_files: int = 0
+    failed_files: int = 0
+    chunks: int = 0
+    errors: List[str] = field(default_factory=list)
+    result: Optional[Dict] = None
+    _started_clock: float = 0.0
+    _cancel_event: threading.Event = field(default_factory=threading.Event)
+
+    def start(self, files: List[Path]) -> None:
+        self.files = {str(path): FileProgress(path=str(path)) for path in files}
+
+    def file_done(self, file_path: Path, chunk_count: int) -> None:
+        progress = self.files.setdefault(str(file_path), FileProgress(path=str(file_path)))
+        progress.status = "done"
+        progress.chunks = chunk_count
+        self.processed_files += 1
+        self.chunks += chunk_count
+
+    def file_failed(self, file_path: Path, error: Exception) -> None:
+        progress = self.files.setdefault(str(file_path), FileProgress(path=str(file_path)))
+        progress.status = "failed"
+        progress.error = str(error)
+        self.failed_files += 1
+        self.errors.append(f"{file_path}: {error}")
+
+    def check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise IngestCancelled(f"job {self.id} was cancelled")
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if not self.started_at:
+            return 0.0
+        if self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return time.perf_counter() - self._started_clock
+
+    @property
+    def chunks_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.chunks / elapsed if elapsed > 0 else 0.0
+
+
+class IngestJobManager:
+    """Runs ingest jobs on a thread pool, one writer per collection at a time.
+
+    Jobs wait in a per-collection queue that at most one pool thread drains
+    at a time, so two submissions never write to one collection concurrently
+    and a backlog on one collection never occupies the threads another
+    collection's jobs need. At most ``max_queued`` jobs wait to start (0
+    means no limit); further submissions raise :class:`JobQueueFull`.
+    Cancelling a queued job finishes it at once. Finished jobs are kept up to
+    ``history_size`` for polling.
+    """
+
+    def __init__(self, max_workers: int, history_size: int, max_queued: int = 0) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.history_size = history_size
+        self.max_queued = max_queued
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._collection_locks: Dict[str, threading.Lock] = {}
+        self._pending: Dict[str, Deque[Tuple[IngestJob, Callable[[IngestJob], Dict]]]] = {}
+        self._draining: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        collection: str,
+        paths: Optional[List[str]],
+        runner: Callable[[IngestJob], Dict],
+    ) -> IngestJob:
+        """Queue ``runner`` for ``collection`` and return the job immediately."""
+        job = IngestJob(id=uuid.uuid4().hex, collection=collection, paths=paths)
+        with self._lock:
+            if self.max_queued and self.queued() >= self.max_queued:
+                raise JobQueueFull(f"{self.queued()} ingest jobs are already waiting; try again later")
+            self._jobs[job.id] = job
+            self._trim_history()
+            self._pending.setdefault(collection, deque()).append((job, runner))
+            start = collection not in self._draining
+            self._draining.add(collection)
+        if start:
+            self.executor.submit(self._drain, collection)
+        return job
+
+    @contextmanager
+    def exclusive(self, collection: str, timeout: float) -> Iterator[None]:
+        """Hold ``collection`` like a running job does, for maintenance that must not overlap an ingest."""
+        with self._lock:
+            collection_lock = self._collection_locks.setdefault(collection, threading.Lock())
+        if not collection_lock.acquire(timeout=timeout):
+            raise CollectionBusy(f"an ingest job is still running on collection {collection}")
+        try:
+            yield
+        finally:
+            collection_lock.release()
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def queued(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status is JobStatus.QUEUED)
+
+    def list(self) -> List[IngestJob]:
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """Request cancellation. Queued jobs never start; running jobs stop between files."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job.status not in FINISHED_STATUSES:
+                job.cancel()
+                self._drop_pending_locked(job)
+        return job
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for job in list(self._jobs.values()):
+                if job.status not in FINISHED_STATUSES:
+                    job.cancel()
+                    self._drop_pending_locked(job)
+        self.executor.shutdown(wait=True)
+
+    def _drop_pending_locked(self, job: IngestJob) -> None:
+        """Finish a job that is still waiting in its collection queue; a dequeued one stops by itself."""
+        pending = self._pending.get(job.collection, ())
+        for entry in pending:
+            if entry[0] is job:
+                pending.remove(entry)
+                self._finish(job, JobStatus.CANCELLED)
+                return
+
+    def _drain(self, collection: str) -> None:
+        """Run the next queued job of ``collection``, then hand the queue back to the pool."""
+        with self._lock:
+            pending = self._pending.get(collection)
+            if not pending:
+                self._draining.discard(collection)
+                self._pending.pop(collection, None)
+                return
+            job, runner = pending.popleft()
+            collection_lock = self._collection_locks.setdefault(collection, threading.Lock())
+        try:
+            self._run(job, collection_lock, runner)
+        finally:
+            # Resubmitted rather than looped, so other collections' queues get a turn on this thread.
+            try:
+                self.executor.submit(self._drain, collection)
+            except RuntimeError:  # shutting down
+                with self._lock:
+                    self._draining.discard(collection)
+
+    def _run(self, job: IngestJob, collection_lock: threading.Lock, runner: Callable[[IngestJob], Dict]) -> None:
+        # Held by exclusive() maintenance too, so a job never overlaps it.
+        with collection_lock:
+            if job.cancel_requested:
+                self._finish(job, JobStatus.CANCELLED)
+                return
+            job.status = JobStatus.RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            job._started_clock = time.perf_counter()
+            try:
+                job.result = runner(job)
+            except IngestCancelled:
+                self._finish(job, JobStatus.CANCELLED)
+            except Exception as exc:  # surfaced through the job status
+                job.errors.append(str(exc))
+                self._finish(job, JobStatus.FAILED)
+            else:
+                self._finish(job, JobStatus.SUCCEEDED)
+
+    def _finish(self, job: IngestJob, status: JobStatus) -> None:
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        if job.started_at is None:
+            job.started_at = job.finished_at
+
+    def _trim_history(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+        while len(self._jobs) > self.history_size and finished:
+            self._jobs.pop(finished.pop(0), None)
@@ -0,0 +1,446 @@
+"""Persistent BM25 index over chunk text with Japanese-aware character n-gram tokens."""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_ASCII_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_CJK_RUN = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿]+")
+_SEPARATORS = re.compile(r"[-_./:]")
+_INDEX_FILE = "index.json"
+_MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms.
+
+    Text is NFKC-normalized and lower-cased. Latin letters and digits form
+    whole-word tokens, so product codes and error numbers such as ``E-1024``
+    match exactly (their separated parts are indexed too). Runs of kana and
+    kanji become overlapping character bigrams, which needs no dictionary and
+    still matches proper nouns of any length.
+    """
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    tokens: List[str] = []
+    for match in _ASCII_TOKEN.finditer(normalized):
+        token = match.group()
+        tokens.append(token)
+        if _SEPARATORS.search(token):
+            tokens.extend(part for part in _SEPARATORS.split(token) if part)
+    for match in _CJK_RUN.finditer(normalized):
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(run[index : index + 2] for index in range(len(run) - 1))
+    return tokens
+
+
+class _Segment:
+    """Immutable postings for a group of chunks, memory-mapped from disk.
+
+    Files in the segment directory:
+
+    * ``terms.bin`` / ``term_offsets.npy``: sorted UTF-8 terms, concatenated
+    * ``postings_offsets.npy``: start of each term's postings (len = terms + 1)
+    * ``postings_docs.npy`` (uint32) / ``postings_tf.npy`` (uint16)
+    * ``doc_lengths.npy`` (uint32) / ``doc_ids.json``
+
+    Deletions are kept as a boolean mask beside the segment, never in it.
+    """
+
+    def __init__(self, directory: Path, deleted: Sequence[int] = ()) -> None:
+        self.directory = directory
+        self.name = directory.name
+        terms_path = directory / "terms.bin"
+        # np.memmap refuses to map an empty file.
+        if terms_path.stat().st_size:
+            self.terms = np.memmap(terms_path, dtype=np.uint8, mode="r")
+        else:
+            self.terms = np.zeros(0, dtype=np.uint8)
+        self.term_offsets = np.load(directory / "term_offsets.npy", mmap_mode="r")
+        self.postings_offsets = np.load(directory / "postings_offsets.npy", mmap_mode="r")
+        self.postings_docs = np.load(directory / "postings_docs.npy", mmap_mode="r")
+        self.postings_tf = np.load(directory / "postings_tf.npy", mmap_mode="r")
+        self.doc_lengths = np.load(directory / "doc_lengths.npy", mmap_mode="r")
+        self.doc_ids: List[str] = json.loads((directory / "doc_ids.json").read_text(encoding="utf-8"))
+        self.positions = {doc_id: position for position, doc_id in enumerate(self.doc_ids)}
+        self.deleted = np.zeros(len(self.doc_ids), dtype=bool)
+        self.total_length = int(np.asarray(self.doc_lengths, dtype=np.int64).sum())
+        self.deleted_length = 0
+        for position in deleted:
+            self.delete(position)
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def live_count(self) -> int:
+        return self.size - int(self.deleted.sum())
+
+    @property
+    def live_length(self) -> int:
+        return self.total_length - self.deleted_length
+
+    @property
+    def term_count(self) -> int:
+        return len(self.term_offsets) - 1
+
+    def delete(self, position: int) -> None:
+        if not self.deleted[position]:
+            self.deleted[position] = True
+            self.deleted_length += int(self.doc_lengths[position])
+
+    def term_at(self, index: int) -> bytes:
+        return self.terms[self.term_offsets[index] : self.term_offsets[index + 1]].tobytes()
+
+    def vocabulary(self) -> List[bytes]:
+        data = self.terms.tobytes()
+        offsets = np.asarray(self.term_offsets).tolist()
+        return [data[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def find(self, term: bytes) -> Optional[int]:
+        """Binary search for an encoded term; returns its index or ``None``."""
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term_at(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.term_count and self.term_at(low) == term:
+            return low
+        return None
+
+    def postings(self, term_index: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.postings_offsets[term_index], self.postings_offsets[term_index + 1]
+        return self.postings_docs[start:end], self.postings_tf[start:end]
+
+
+class _SegmentBuilder:
+    """Accumulates documents and postings, then writes them as one sorted segment."""
+
+    def __init__(self) -> None:
+        self.doc_ids: List[str] = []
+        self.doc_lengths: List[np.ndarray] = []
+        self.parts: List[Tuple[List[bytes], np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]]) -> None:
+        vocabulary: Dict[bytes, int] = {}
+        term_list: List[int] = []
+        doc_list: List[int] = []
+        tf_list: List[int] = []
+        lengths: List[int] = []
+        for doc_id, text in documents:
+            position = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_list.append(vocabulary.setdefault(term.encode("utf-8"), len(vocabulary)))
+                doc_list.append(position)
+                tf_list.append(min(count, _MAX_TF))
+        self.doc_lengths.append(np.asarray(lengths, dtype=np.uint32))
+        self.parts.append(
+            (
+                list(vocabulary),
+                np.asarray(term_list, dtype=np.int64),
+                np.asarray(doc_list, dtype=np.int64),
+                np.asarray(tf_list, dtype=np.uint16),
+            )
+        )
+
+    def add_segment(self, segment: _Segment) -> None:
+        """Copy the live documents of ``segment``, renumbering them after existing ones."""
+        live = ~segment.deleted
+        new_positions = np.cumsum(live) - 1 + len(self.doc_ids)
+        self.doc_ids.extend(doc_id for doc_id, alive in zip(segment.doc_ids, live) if alive)
+        self.doc_lengths.append(np.asarray(segment.doc_lengths)[live])
+        counts = np.diff(np.asarray(segment.postings_offsets))
+        terms = np.repeat(np.arange(segment.term_count), counts)
+        docs = np.asarray(segment.postings_docs, dtype=np.int64)
+        keep = live[docs]
+        tfs = np.asarray(segment.postings_tf)[keep]
+        self.parts.append((segment.vocabulary(), terms[keep], new_positions[docs[keep]], tfs))
+
+    def write(self, directory: Path) -> None:
+        vocabulary = sorted({term for part in self.parts for term in part[0]})
+        term_index = {term: index for index, term in enumerate(vocabulary)}
+        all_terms, all_docs, all_tf = [], [], []
+        for part_vocabulary, terms, docs, tfs in self.parts:
+            remap = np.asarray([term_index[term] for term in part_vocabulary], dtype=np.int64)
+            all_terms.append(remap[terms] if len(terms) else terms)
+            all_docs.append(docs)
+            all_tf.append(tfs)
+        terms = np.concatenate(all_terms) if all_terms else np.zeros(0, dtype=np.int64)
+        docs = np.concatenate(all_docs) if all_docs else np.zeros(0, dtype=np.int64)
+        tfs = np.concatenate(all_tf) if all_tf else np.zeros(0, dtype=np.uint16)
+        order = np.lexsort((docs, terms))
+        postings_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=postings_offsets[1:])
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.asarray([len(term) for term in vocabulary], dtype=np.int64), out=term_offsets[1:])
+        lengths = np.concatenate(self.doc_lengths) if self.doc_lengths else np.zeros(0, dtype=np.uint32)
+
+        directory.mkdir(parents=True)
+        (directory / "terms.bin").write_bytes(b"".join(vocabulary))
+        np.save(directory / "term_offsets.npy", term_offsets)
+        np.save(directory / "postings_offsets.npy", postings_offsets)
+        np.save(directory / "postings_docs.npy", docs[order].astype(np.uint32))
+        np.save(directory / "postings_tf.npy", tfs[order])
+        np.save(directory / "doc_lengths.npy", lengths.astype(np.uint32))
+        (directory / "doc_ids.json").write_text(json.dumps(self.doc_ids), encoding="utf-8")
+
+
+class LexicalIndex:
+    """BM25 index maintained alongside the vector collection.
+
+    The index is log-structured: every :meth:`add` call writes its documents
+    as a new immutable segment, and deletions only flip bits in a per-segment
+    mask. Segments of similar size are merged once ``merge_factor`` of them
+    accumulate, which keeps the segment count logarithmic in the corpus size.
+    ``index.json`` lists the live segments with their deletions and is
+    replaced atomically, so a reader never sees a half-written index.
+
+    A ``read_only`` index (in a reader worker) never writes or removes files;
+    :meth:`reload` picks up what the writer process saved since.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        merge_factor: int = 4,
+        max_df_ratio: float = 0.2,
+        k1: float = 1.2,
+        b: float = 0.75,
+        read_only: bool = False,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.read_only = read_only
+        self.merge_factor = max(merge_factor, 2)
+        self.max_df_ratio = max_df_ratio
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._load()
+
+    def _load(self) -> None:
+        index_path = self.directory / _INDEX_FILE
+        segments: List[_Segment] = []
+        if index_path.exists():
+            payload = json.loads(index_path.read_text(encoding="utf-8"))
+            for entry in payload.get("segments", []):
+                segments.append(_Segment(self.directory / entry["name"], entry.get("deleted", [])))
+        self._segments = segments
+        if not self.read_only:
+            self._cleanup_unused_segments()
+
+    def reload(self, attempts: int = 3) -> None:
+        """Re-read ``index.json``; retried when the writer removes a segment while it is being opened."""
+        for attempt in range(attempts):
+            try:
+                with self._lock:
+                    self._load()
+                return
+            except (OSError, ValueError):
+                if attempt == attempts - 1:
+                    raise
+
+    @property
+    def doc_count(self) -> int:
+        return sum(segment.live_count for segment in self._segments)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    def add(self, documents: Iterable[Tuple[str, str]]) -> None:
+        """Index ``(chunk_id, text)`` pairs, replacing earlier versions of the same IDs."""
+        documents = list(documents)
+        if not documents:
+            return
+        builder = _SegmentBuilder()
+        builder.add_documents(documents)
+        directory = self._new_segment_dir()
+        builder.write(directory)
+        with self._lock:
+            self._delete_locked(doc_id for doc_id, _ in documents)
+            self._segments.append(_Segment(directory))
+            self._merge_if_needed()
+            self._save()
+
+    def delete(self, doc_ids: Iterable[str]) -> None:
+        """Hide documents from search; persisted by the next :meth:`add` or :meth:`commit`."""
+        with self._lock:
+            self._delete_locked(doc_ids)
+
+    def commit(self) -> None:
+        """Persist deletions and rewrite segments that are mostly deleted."""
+        with self._lock:
+            for segment in list(self._segments):
+                if segment.live_count < segment.size * 0.7:
+                    self._merge([segment])
+            self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._segments = []
+            self._save()
+
+    def compact(self) -> None:
+        """Merge every segment into one, dropping deleted documents for good."""
+        with self._lock:
+            if len(self._segments) > 1 or any(segment.live_count < segment.size for segment in self._segments):
+                self._merge(list(self._segments))
+            self._save()
+
+    def snapshot(self, destination: Path) -> None:
+        """Copy the live segments and an ``index.json`` matching them into ``destination``."""
+        with self._lock:
+            destination.mkdir(parents=True, exist_ok=True)
+            for segment in self._segments:
+                shutil.copytree(segment.directory, destination / segment.name)
+            (destination / _INDEX_FILE).write_text(json.dumps(self._payload()), encoding="utf-8")
+
+    def _delete_locked(self, doc_ids: Iterable[str]) -> None:
+        for doc_id in doc_ids:
+            for segment in self._segments:
+                position = segment.positions.get(doc_id)
+                if position is not None:
+                    segment.delete(position)
+
+    def _new_segment_dir(self) -> Path:
+        return self.directory / f"segment-{uuid.uuid4().hex}"
+
+    def _merge_if_needed(self) -> None:
+        while True:
+            tiers: Dict[int, List[_Segment]] = {}
+            for segment in self._segments:
+                tier = int(math.log(max(segment.live_count, 1), self.merge_factor))
+                tiers.setdefault(tier, []).append(segment)
+            full = [group for group in tiers.values() if len(group) >= self.merge_factor]
+            if not full:
+                return
+            self._merge(full[0])
+
+    def _merge(self, segments: List[_Segment]) -> None:
+        builder = _SegmentBuilder()
+        for segment in segments:
+            builder.add_segment(segment)
+        merged = {segment.name for segment in segments}
+        remaining = [segment for segment in self._segments if segment.name not in merged]
+        if builder.doc_ids:
+            directory = self._new_segment_dir()
+            builder.write(directory)
+            remaining.append(_Segment(directory))
+        self._segments = remaining
+
+    def _payload(self) -> Dict:
+        return {
+            "segments": [
+                {"name": segment.name, "deleted": np.flatnonzero(segment.deleted).tolist()}
+                for segment in self._segments
+            ]
+        }
+
+    def _save(self) -> None:
+        temp_path = self.directory / "index.tmp"
+        temp_path.write_text(json.dumps(self._payload()), encoding="utf-8")
+        os.replace(temp_path, self.directory / _INDEX_FILE)
+        self._cleanup_unused_segments()
+
+    def _cleanup_unused_segments(self) -> None:
+        active = {segment.name for segment in self._segments}
+        for path in self.directory.glob("segment-*"):
+            if path.is_dir() and path.name not in active:
+                # Windows refuses to delete files that are still mapped; the
+                # directory is retried on the next save.
+                shutil.rmtree(path, ignore_errors=True)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Return up to ``top_k`` ``(chunk_id, bm25_score)`` pairs, best first.
+
+        Terms found in more than ``max_df_ratio`` of the documents add little to
+        BM25 but dominate the cost, so they are skipped whenever the query also
+        contains a rarer term.
+        """
+        terms = {term.encode("utf-8") for term in tokenize(query)}
+        if not terms or top_k <= 0:
+            return []
+        with self._lock:
+            segments = list(self._segments)
+        doc_count = sum(segment.live_count for segment in segments)
+        if doc_count == 0:
+            return []
+        average_length = max(sum(segment.live_length for segment in segments) / doc_count, 1.0)
+        # df is global across segments so scores are comparable between them.
+        lookups: Dict[bytes, List[Tuple[_Segment, np.ndarray, np.ndarray]]] = {}
+        document_frequency: Dict[bytes, int] = {}
+        for term in terms:
+            for segment in segments:
+                term_index = segment.find(term)
+                if term_index is None:
+                    continue
+                docs, tfs = segment.postings(term_index)
+                lookups.setdefault(term, []).append((segment, docs, tfs))
+                # Deleted documents are left out of df as they are of doc_count, so idf stays positive.
+                live_df = int(np.count_nonzero(~segment.deleted[np.asarray(docs, dtype=np.int64)]))
+                document_frequency[term] = document_frequency.get(term, 0) + live_df
+        selective = [term for term, df in document_frequency.items() if df <= self.max_df_ratio * doc_count]
+        contributions: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        for term in selective or list(document_frequency):
+            df = document_frequency[term]
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for segment, docs, tfs in lookups[term]:
+                docs = np.asarray(docs, dtype=np.int64)
+                tf = np.asarray(tfs, dtype=np.float32)
+                lengths = np.asarray(segment.doc_lengths[docs], dtype=np.float32)
+                norm = self.k1 * (1 - self.b + self.b * lengths / average_length)
+                contributions.setdefault(segment.name, []).append((docs, idf * tf * (self.k1 + 1) / (tf + norm)))
+
+        results: List[Tuple[str, float]] = []
+        for segment in segments:
+            parts = contributions.get(segment.name)
+            if not parts:
+                continue
+            docs = np.concatenate([docs for docs, _ in parts])
+            weights = np.concatenate([weights for _, weights in parts])
+            if len(docs) * 8 < segment.size:
+                # Few postings: aggregate over the matched documents only.
+                candidates, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=weights)
+            else:
+                candidates = np.arange(segment.size)
+                scores = np.bincount(docs, weights=weights, minlength=segment.size)
+            live = ~segment.deleted[candidates]
+            candidates, scores = candidates[live], scores[live]
+            count = min(top_k, int(np.count_nonzero(scores)))
+            if count:
+                top = np.argpartition(-scores, count - 1)[:count]
+                results.extend((segment.doc_ids[candidates[position]], float(scores[position])) for position in top)
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: each list contributes ``1 / (k + rank)`` per ID."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
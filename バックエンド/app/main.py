@@ -2,24 +2,75 @@
 
 from __future__ import annotations
 
-from pathlib import Path
+import asyncio
+import json
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
+from .collection_manager import CollectionNotFound
 from .config import settings
+from .coordination import WRITER_LOCK_FILENAME, WriterLock
 from .document_loader import SUPPORTED_EXTENSIONS
+from .embedding_bundle import BundleError
+from .filters import SearchFilter
+from .jobs import CollectionBusy, IngestJob, IngestJobManager, JobQueueFull
 from .models import (
     AnswerResponse,
+    BatchQuestionRequest,
+    BundleResponse,
+    CacheStatsResponse,
+    CollectionInfo,
+    DedupRequest,
+    DeleteDocumentsRequest,
+    EmbeddingStatsResponse,
+    ExportRequest,
+    FileProgressModel,
     HealthResponse,
+    ImportRequest,
+    IngestJobResponse,
     IngestRequest,
     IngestResponse,
+    MaintenanceResponse,
+    MetadataFilter,
     QuestionRequest,
+    ReadinessResponse,
+    SnapshotRequest,
+    SnapshotResponse,
     SourceDocument,
+    UploadedFileModel,
+    UploadResponse,
 )
 from .rag_service import RAGService, RetrievedDocument
+from .uploads import UploadRejected, UploadTooLarge, receive_multipart
+from .vector_store import ScoreCutoff
 
-app = FastAPI(title="RAG問合せ応答システム", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Only one process may ingest into the data directory; a second one (for
+    # example an extra `uvicorn --workers` process) fails to start instead of
+    # racing it. Additional workers run with RAG_PROCESS_ROLE=reader.
+    if settings.process_role != "reader":
+        writer_lock.acquire()
+    # Warm up in the background so the server accepts connections (and /health) immediately.
+    if settings.warmup_enabled:
+        asyncio.get_running_loop().run_in_executor(rag_service.query_executor, rag_service.warm_up)
+    yield
+    job_manager.shutdown()
+    await rag_service.aclose()
+    if writer_client is not None:
+        await writer_client.aclose()
+    writer_lock.release()
+
+
+app = FastAPI(title="RAG問合せ応答システム", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,27 +81,193 @@ app.add_middleware(
 )
 
 rag_service = RAGService()
+job_manager = IngestJobManager(
+    max_workers=settings.ingest_job_workers,
+    history_size=settings.ingest_job_history,
+    max_queued=settings.ingest_job_max_queued,
+)
+writer_lock = WriterLock(settings.vector_store_dir / WRITER_LOCK_FILENAME)
+writer_client: Optional[httpx.AsyncClient] = None
+if settings.process_role == "reader" and settings.writer_url:
+    # Uploads and full ingests can take a while to be accepted; no read timeout.
+    writer_client = httpx.AsyncClient(base_url=settings.writer_url, timeout=httpx.Timeout(10.0, read=None))
+
+# Requests that change the stores or refer to ingest jobs, which only exist in the writer process.
+_WRITER_PATHS = re.compile(r"^(/collections/[^/]+)?/(ingest|documents/upload|admin)(/.*)?$")
+_HOP_BY_HOP_HEADERS = {"connection", "content-length", "content-encoding", "host", "keep-alive", "transfer-encoding"}
+
+
+@app.middleware("http")
+async def forward_writes_to_writer(request: Request, call_next):
+    """In a reader worker, send ingest, upload, job and maintenance requests to the writer process."""
+    if settings.process_role != "reader" or not _WRITER_PATHS.match(request.url.path):
+        return await call_next(request)
+    if writer_client is None:
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "This worker only answers questions; send ingest requests to the writer process."},
+        )
+    try:
+        forwarded = await writer_client.request(
+            request.method,
+            request.url.path,
+            params=request.query_params,
+            headers={key: value for key, value in request.headers.items() if key not in _HOP_BY_HOP_HEADERS},
+            content=request.stream(),
+        )
+    except httpx.HTTPError as exc:
+        return JSONResponse(status_code=502, content={"detail": f"Writer process unavailable: {exc}"})
+    return Response(
+        content=forwarded.content,
+        status_code=forwarded.status_code,
+        headers={key: value for key, value in forwarded.headers.items() if key not in _HOP_BY_HOP_HEADERS},
+    )
+
+
+def _ingest_response(stats: Dict) -> IngestResponse:
+    detail = (
+        f"{stats['ingested_chunks']} chunks stored from {stats['ingested_files']} files "
+        f"({stats['added_files']} added, {stats['updated_files']} updated, "
+        f"{stats['unchanged_files']} unchanged, {stats['deleted_files']} deleted) "
+        f"in {stats['elapsed_seconds']:.1f}s ({stats['chunks_per_second']:.1f} chunks/s)."
+    )
+    return IngestResponse(detail=detail, **stats)
+
+
+def _job_response(job: IngestJob) -> IngestJobResponse:
+    files = list(job.files.values())
+    return IngestJobResponse(
+        id=job.id,
+        collection=job.collection,
+        status=job.status.value,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        total_files=len(files),
+        processed_files=job.processed_files,
+        failed_files=job.failed_files,
+        ingested_chunks=job.chunks,
+        elapsed_seconds=round(job.elapsed_seconds, 3),
+        chunks_per_second=round(job.chunks_per_second, 2),
+        files=[FileProgressModel(**vars(item)) for item in files],
+        errors=job.errors,
+        result=_ingest_response(job.result) if job.result else None,
+    )
+
+
+def _submit_ingest(paths, tags: Optional[List[str]] = None, collection: Optional[str] = None) -> IngestJob:
+    name = _collection_name(collection)
+    try:
+        return job_manager.submit(
+            collection=name,
+            paths=paths,
+            runner=lambda job: rag_service.ingest(paths, progress=job, tags=tags, collection=name),
+        )
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"}) from exc
+
+
+def _collection_name(collection: Optional[str]) -> str:
+    try:
+        return rag_service.collections.resolve_name(collection)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _where(filters: Optional[MetadataFilter]) -> Optional[Dict]:
+    if filters is None:
+        return None
+    try:
+        return SearchFilter(**filters.model_dump()).to_where()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _cutoff(payload: Union[QuestionRequest, BatchQuestionRequest]) -> ScoreCutoff:
+    return rag_service.score_cutoff(payload.min_k, payload.max_distance, payload.score_gap)
 
 
 @app.get("/health", response_model=HealthResponse)
 async def health() -> HealthResponse:
-    """Simple health check endpoint."""
+    """Liveness check: the process is up, though models may still be loading (see ``/ready``)."""
     return HealthResponse(status="ok", environment=settings.environment_name)
 
 
-@app.post("/ingest", response_model=IngestResponse)
-async def ingest_documents(payload: IngestRequest) -> IngestResponse:
-    """Trigger ingestion for all supported documents or the provided subset."""
-    stats = rag_service.ingest(payload.paths)
-    detail = f"{stats['ingested_chunks']} chunks stored from {stats['ingested_files']} files."
-    return IngestResponse(detail=detail, **stats)
+@app.get("/ready", response_model=ReadinessResponse)
+async def ready(response: Response) -> ReadinessResponse:
+    """Readiness check: 200 once warm-up finished, 503 while loading or after a failure."""
+    readiness = rag_service.readiness
+    if not readiness.ready:
+        response.status_code = 503
+    return ReadinessResponse(
+        ready=readiness.ready,
+        status=readiness.status,
+        components=dict(readiness.components),
+        error=readiness.error,
+    )
+
+
+@app.post("/ingest", response_model=IngestJobResponse, status_code=202)
+async def ingest_documents(payload: IngestRequest) -> IngestJobResponse:
+    """Queue ingestion for all supported documents or the provided subset."""
+    return _job_response(_submit_ingest(payload.paths, payload.tags))
+
+
+@app.post("/collections/{collection}/ingest", response_model=IngestJobResponse, status_code=202)
+async def ingest_collection_documents(collection: str, payload: IngestRequest) -> IngestJobResponse:
+    """Queue ingestion for one collection, creating it on first use."""
+    return _job_response(_submit_ingest(payload.paths, payload.tags, collection))
+
+
+@app.get("/collections", response_model=List[CollectionInfo])
+async def list_collections() -> List[CollectionInfo]:
+    """List known collections and whether they are currently loaded in memory."""
+    return [CollectionInfo(**item) for item in await run_in_threadpool(rag_service.collections.describe)]
+
+
+@app.get("/ingest/jobs", response_model=List[IngestJobResponse])
+async def list_ingest_jobs() -> List[IngestJobResponse]:
+    """List recent ingest jobs, newest first."""
+    return [_job_response(job) for job in job_manager.list()]
+
+
+@app.get("/ingest/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str) -> IngestJobResponse:
+    """Report progress of an ingest job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job: {job_id}")
+    return _job_response(job)
+
+
+@app.post("/ingest/jobs/{job_id}/cancel", response_model=IngestJobResponse)
+async def cancel_ingest_job(job_id: str) -> IngestJobResponse:
+    """Cancel a queued or running ingest job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job: {job_id}")
+    return _job_response(job)
 
 
 @app.post("/query", response_model=AnswerResponse)
 async def ask_question(payload: QuestionRequest) -> AnswerResponse:
     """Answer a user question and return supporting citations."""
+    return await _answer(payload)
+
+
+@app.post("/collections/{collection}/query", response_model=AnswerResponse)
+async def ask_collection_question(collection: str, payload: QuestionRequest) -> AnswerResponse:
+    """Answer a question from one collection."""
+    return await _answer(payload, collection)
+
+
+async def _answer(payload: QuestionRequest, collection: Optional[str] = None) -> AnswerResponse:
     try:
-        result = rag_service.query(payload.question, payload.top_k)
+        result = await rag_service.query(
+            payload.question, payload.top_k, _where(payload.filters), collection, _cutoff(payload)
+        )
+    except CollectionNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except RuntimeError as exc:
@@ -61,6 +278,7 @@ async def ask_question(payload: QuestionRequest) -> AnswerResponse:
             content=doc.content,
             metadata=doc.metadata,
             score=doc.score,
+            rerank_score=doc.rerank_score,
         )
         for doc in result["sources"]
     ]
@@ -69,23 +287,323 @@ async def ask_question(payload: QuestionRequest) -> AnswerResponse:
         answer=result["answer"],
         prompt=result["prompt"],
         sources=sources,
+        cached=result["cached"],
+        timings=result["timings"] if settings.response_timings else {},
     )
 
 
-@app.post("/documents/upload", response_model=IngestResponse)
-async def upload_document(file: UploadFile = File(...)) -> IngestResponse:
-    """Upload a new document and ingest it immediately."""
-    extension = Path(file.filename).suffix.lower()
-    if extension not in SUPPORTED_EXTENSIONS:
+def _without_timings(data: Dict) -> Dict:
+    """Drop per-stage timings from a streamed event unless ``response_timings`` is enabled."""
+    if not settings.response_timings:
+        data.pop("timings", None)
+    return data
+
+
+@app.get("/cache/stats", response_model=CacheStatsResponse)
+async def answer_cache_stats(collection: Optional[str] = None) -> CacheStatsResponse:
+    """Report semantic answer cache hit and miss counters of a collection (default when omitted)."""
+
+    def stats() -> CacheStatsResponse:
+        with rag_service.collections.use(_collection_name(collection)) as kb:
+            if not kb.answer_cache:
+                return CacheStatsResponse(enabled=False)
+            return CacheStatsResponse(enabled=True, **kb.answer_cache.stats())
+
+    try:
+        return await run_in_threadpool(stats)
+    except CollectionNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Query and ingest metrics in the Prometheus text exposition format."""
+    if not rag_service.metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (RAG_METRICS_ENABLED=false).")
+    return PlainTextResponse(rag_service.metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/embeddings/stats", response_model=EmbeddingStatsResponse)
+async def embedding_stats() -> EmbeddingStatsResponse:
+    """Report embedding throughput and query-embedding cache counters."""
+    return EmbeddingStatsResponse(**rag_service.embedder.stats())
+
+
+@app.post("/query/stream")
+async def ask_question_stream(payload: QuestionRequest) -> StreamingResponse:
+    """Answer a question as Server-Sent Events: sources, answer tokens, then timings."""
+    return await _answer_stream(payload)
+
+
+@app.post("/collections/{collection}/query/stream")
+async def ask_collection_question_stream(collection: str, payload: QuestionRequest) -> StreamingResponse:
+    """``/query/stream`` on one collection."""
+    return await _answer_stream(payload, collection)
+
+
+async def _answer_stream(payload: QuestionRequest, collection: Optional[str] = None) -> StreamingResponse:
+    events = rag_service.stream_query(
+        payload.question, payload.top_k, _where(payload.filters), collection, _cutoff(payload)
+    )
+    try:
+        first_event = await events.__anext__()
+    except CollectionNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+    async def event_stream(first: Tuple[str, Dict], rest: AsyncIterator[Tuple[str, Dict]]):
+        yield _sse(*first)
+        try:
+            async for event, data in rest:
+                yield _sse(event, _without_timings(data))
+        except Exception as exc:  # headers are already sent; report in-band
+            yield _sse("error", {"detail": str(exc)})
+
+    return StreamingResponse(
+        event_stream(first_event, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/batch")
+async def ask_questions_batch(payload: BatchQuestionRequest) -> StreamingResponse:
+    """Answer many questions, streaming one JSON object per line as each answer completes."""
+    return await _answer_batch(payload)
+
+
+@app.post("/collections/{collection}/query/batch")
+async def ask_collection_questions_batch(collection: str, payload: BatchQuestionRequest) -> StreamingResponse:
+    """``/query/batch`` on one collection."""
+    return await _answer_batch(payload, collection)
+
+
+async def _answer_batch(payload: BatchQuestionRequest, collection: Optional[str] = None) -> StreamingResponse:
+    if len(payload.questions) > settings.batch_max_questions:
         raise HTTPException(
-            status_code=400, detail=f"Unsupported file type: {extension}. Allowed: {', '.join(SUPPORTED_EXTENSIONS)}"
+            status_code=400, detail=f"Too many questions (max {settings.batch_max_questions})."
         )
-    contents = await file.read()
-    size_limit = settings.allow_upload_size_mb * 1024 * 1024
-    if len(contents) > size_limit:
-        raise HTTPException(status_code=400, detail="File is too large.")
-    destination = settings.source_dir / Path(file.filename).name
-    destination.write_bytes(contents)
-    stats = rag_service.ingest([str(destination)])
-    detail = f"Uploaded {file.filename} and stored {stats['ingested_chunks']} chunks."
-    return IngestResponse(detail=detail, **stats)
+    results = rag_service.query_batch(
+        payload.questions, payload.top_k, _where(payload.filters), collection, _cutoff(payload)
+    )
+    try:
+        first_result = await results.__anext__()
+    except CollectionNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+    async def ndjson_stream(first: Dict, rest: AsyncIterator[Dict]):
+        yield _ndjson(_without_timings(first))
+        try:
+            async for result in rest:
+                yield _ndjson(_without_timings(result))
+        except Exception as exc:  # headers are already sent; report in-band
+            yield _ndjson({"error": str(exc)})
+
+    return StreamingResponse(ndjson_stream(first_result, results), media_type="application/x-ndjson")
+
+
+def _ndjson(data: Dict) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+# The form is parsed by hand (see app.uploads), so document it for /docs explicitly.
+_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                        "file": {"type": "string", "format": "binary"},
+                        "tags": {"type": "string", "description": "Comma-separated tags for every file."},
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+@app.post("/documents/upload", response_model=UploadResponse, status_code=202, openapi_extra=_UPLOAD_OPENAPI)
+async def upload_documents(request: Request) -> UploadResponse:
+    """Upload one or more documents and queue them for ingestion, optionally with comma-separated tags."""
+    return await _upload(request)
+
+
+@app.post(
+    "/collections/{collection}/documents/upload",
+    response_model=UploadResponse,
+    status_code=202,
+    openapi_extra=_UPLOAD_OPENAPI,
+)
+async def upload_collection_documents(collection: str, request: Request) -> UploadResponse:
+    """Upload documents into one collection, creating it on first use."""
+    return await _upload(request, collection)
+
+
+async def _upload(request: Request, collection: Optional[str] = None) -> UploadResponse:
+    """Stream the files to disk, skip content the collection already has and queue one job for the rest."""
+    name = _collection_name(collection)
+    try:
+        form = await receive_multipart(
+            request.headers.get("content-type", ""),
+            request.stream(),
+            directory=rag_service.collections.source_dir(name, create=True),
+            max_file_bytes=settings.allow_upload_size_mb * 1024 * 1024,
+            max_files=settings.upload_max_files,
+            allowed_extensions=SUPPORTED_EXTENSIONS,
+        )
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except UploadRejected as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if not form.files:
+        raise HTTPException(status_code=400, detail="No file was uploaded.")
+    uploads = await run_in_threadpool(rag_service.store_uploads, form.files, name)
+    queued = [upload.path for upload in uploads if upload.path]
+    job = None
+    if queued:
+        tags = form.fields.get("tags")
+        tag_list = [tag for tag in tags.split(",") if tag.strip()] if tags is not None else None
+        job = _job_response(_submit_ingest(queued, tag_list, name))
+    return UploadResponse(
+        files=[
+            UploadedFileModel(
+                filename=upload.filename,
+                size_bytes=upload.size,
+                sha256=upload.sha256,
+                status="queued" if upload.path else "duplicate",
+                path=upload.path,
+                duplicate_of=upload.duplicate_of,
+            )
+            for upload in uploads
+        ],
+        job=job,
+    )
+
+
+@app.post("/admin/documents/delete", response_model=MaintenanceResponse)
+async def delete_documents(payload: DeleteDocumentsRequest) -> MaintenanceResponse:
+    """Delete documents' chunks, manifest records and (by default) source files."""
+    return await _delete_documents(payload)
+
+
+@app.post("/collections/{collection}/admin/documents/delete", response_model=MaintenanceResponse)
+async def delete_collection_documents(collection: str, payload: DeleteDocumentsRequest) -> MaintenanceResponse:
+    """Delete documents of one collection."""
+    return await _delete_documents(payload, collection)
+
+
+async def _delete_documents(payload: DeleteDocumentsRequest, collection: Optional[str] = None) -> MaintenanceResponse:
+    if not payload.sources and not payload.paths:
+        raise HTTPException(status_code=400, detail="Give at least one of sources or paths.")
+    return await _maintenance(
+        collection,
+        lambda name: rag_service.delete_documents(name, payload.sources, payload.paths, payload.remove_files),
+    )
+
+
+@app.post("/admin/dedup", response_model=MaintenanceResponse)
+async def remove_duplicates(payload: DedupRequest) -> MaintenanceResponse:
+    """Delete chunks whose text exactly repeats another chunk, keeping one copy."""
+    return await _maintenance(None, lambda name: rag_service.remove_duplicates(name, payload.dry_run))
+
+
+@app.post("/collections/{collection}/admin/dedup", response_model=MaintenanceResponse)
+async def remove_collection_duplicates(collection: str, payload: DedupRequest) -> MaintenanceResponse:
+    """Delete duplicate chunks of one collection."""
+    return await _maintenance(collection, lambda name: rag_service.remove_duplicates(name, payload.dry_run))
+
+
+@app.post("/admin/compact", response_model=MaintenanceResponse)
+async def compact() -> MaintenanceResponse:
+    """Rewrite the vector, SQLite and lexical index files without deleted chunks."""
+    return await _maintenance(None, rag_service.compact)
+
+
+@app.post("/collections/{collection}/admin/compact", response_model=MaintenanceResponse)
+async def compact_collection(collection: str) -> MaintenanceResponse:
+    """Compact the files of one collection."""
+    return await _maintenance(collection, rag_service.compact)
+
+
+@app.post("/admin/export", response_model=BundleResponse)
+async def export_embeddings(payload: Optional[ExportRequest] = None) -> BundleResponse:
+    """Write chunks, metadata and embeddings to a bundle under RAG_EXPORT_DIR."""
+    dtype = payload.dtype if payload else "float32"
+    return BundleResponse(**await _exclusive(None, lambda name: rag_service.export_embeddings(name, dtype)))
+
+
+@app.post("/collections/{collection}/admin/export", response_model=BundleResponse)
+async def export_collection_embeddings(collection: str, payload: Optional[ExportRequest] = None) -> BundleResponse:
+    """Export one collection."""
+    dtype = payload.dtype if payload else "float32"
+    return BundleResponse(**await _exclusive(collection, lambda name: rag_service.export_embeddings(name, dtype)))
+
+
+@app.post("/admin/import", response_model=BundleResponse)
+async def import_embeddings(payload: ImportRequest) -> BundleResponse:
+    """Load an exported bundle without running the embedding model."""
+    return BundleResponse(**await _exclusive(None, lambda name: rag_service.import_embeddings(payload.bundle, name)))
+
+
+@app.post("/collections/{collection}/admin/import", response_model=BundleResponse)
+async def import_collection_embeddings(collection: str, payload: ImportRequest) -> BundleResponse:
+    """Import a bundle into one collection (created if needed)."""
+    return BundleResponse(
+        **await _exclusive(collection, lambda name: rag_service.import_embeddings(payload.bundle, name))
+    )
+
+
+async def _maintenance(collection: Optional[str], operation: Callable[[str], Dict]) -> MaintenanceResponse:
+    return MaintenanceResponse(**await _exclusive(collection, operation))
+
+
+async def _exclusive(collection: Optional[str], operation: Callable[[str], Dict]) -> Dict:
+    """Run ``operation`` off the event loop while no ingest job writes to the collection."""
+    name = _collection_name(collection)
+
+    def run() -> Dict:
+        with job_manager.exclusive(name, timeout=settings.admin_lock_timeout_seconds):
+            return operation(name)
+
+    try:
+        return await run_in_threadpool(run)
+    except CollectionNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except CollectionBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except BundleError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.post("/admin/snapshot", response_model=SnapshotResponse)
+async def snapshot(payload: Optional[SnapshotRequest] = None) -> SnapshotResponse:
+    """Copy the stores into a new directory under RAG_SNAPSHOT_DIR while queries continue."""
+    collections = payload.collections if payload else None
+    if collections:
+        collections = [_collection_name(name) for name in collections]
+    try:
+        result = await run_in_threadpool(
+            rag_service.snapshot,
+            lambda name: job_manager.exclusive(name, timeout=settings.admin_lock_timeout_seconds),
+            collections,
+        )
+    except CollectionNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except CollectionBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return SnapshotResponse(**result)
@@ -0,0 +1,156 @@
+"""Persistent manifest of ingested source files used for incremental re-ingestion."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FileRecord:
+    """State of a single source file at the time it was last ingested."""
+
+    path: str
+    size: int
+    mtime: float
+    content_hash: str
+    chunk_count: int = 0
+    embedding_signature: str = ""
+    tags: List[str] = field(default_factory=list)
+
+    @property
+    def document_key(self) -> str:
+        return document_key(self.path, self.content_hash)
+
+    def chunk_ids(self) -> List[str]:
+        return [chunk_id(self.document_key, index) for index in range(self.chunk_count)]
+
+
+@dataclass
+class IngestPlan:
+    """Classification of target files against the manifest."""
+
+    added: List[Path] = field(default_factory=list)
+    updated: List[Path] = field(default_factory=list)
+    unchanged: List[Path] = field(default_factory=list)
+    removed: List[FileRecord] = field(default_factory=list)
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+
+def hash_file(file_path: Path) -> str:
+    """Return the SHA-256 digest of the file contents, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with file_path.open("rb") as handle:
+        for block in iter(lambda: handle.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_key(path: str, content_hash: str) -> str:
+    """Stable key for one version of one file.
+
+    The path is mixed into the content hash so identical files stored under two
+    names do not overwrite each other's chunks.
+    """
+    return hashlib.sha256(f"{path}\0{content_hash}".encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_id(key: str, index: int) -> str:
+    """Deterministic chunk identifier built from the document key and chunk index."""
+    return f"{key}:{index}"
+
+
+class IngestManifest:
+    """JSON manifest stored next to the vector store that records ingested files."""
+
+    def __init__(self, manifest_path: Path, embedding_signature: str = "") -> None:
+        self.manifest_path = Path(manifest_path)
+        self.embedding_signature = embedding_signature
+        self.records: Dict[str, FileRecord] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.manifest_path.exists():
+            return
+        payload = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        for item in payload.get("files", []):
+            record = FileRecord(**item)
+            self.records[record.path] = record
+
+    def save(self) -> None:
+        """Write the manifest atomically so a crash never leaves a truncated file."""
+        payload = {"files": [asdict(record) for record in self.records.values()]}
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, self.manifest_path)
+
+    def get(self, path: Path) -> Optional[FileRecord]:
+        return self.records.get(str(path))
+
+    def plan(self, targets: Iterable[Path], full_scan: bool, tags: Optional[List[str]] = None) -> IngestPlan:
+        """Compare the targets with the manifest and decide what needs embedding.
+
+        Size and mtime are checked first; the content hash is only computed when
+        either differs, so an unchanged corpus is classified without reading it.
+        Files embedded with a different signature (model, prefixes, chunking)
+        count as updated, as do files whose recorded tags differ from ``tags``
+        (when given). ``full_scan`` marks files missing from ``targets`` as
+        removed.
+        """
+        plan = IngestPlan()
+        seen = set()
+        for file_path in targets:
+            key = str(file_path)
+            seen.add(key)
+            stat = file_path.stat()
+            record = self.records.get(key)
+            retag = tags is not None and record is not None and sorted(record.tags) != sorted(tags)
+            if record and (retag or record.embedding_signature != self.embedding_signature):
+                plan.hashes[key] = hash_file(file_path)
+                plan.updated.append(file_path)
+                continue
+            if record and record.size == stat.st_size and record.mtime == stat.st_mtime:
+                plan.unchanged.append(file_path)
+                continue
+            content_hash = hash_file(file_path)
+            plan.hashes[key] = content_hash
+            if record is None:
+                plan.added.append(file_path)
+            elif record.content_hash == content_hash:
+                record.mtime = stat.st_mtime
+                plan.unchanged.append(file_path)
+            else:
+                plan.updated.append(file_path)
+        if full_scan:
+            plan.removed = [record for path, record in self.records.items() if path not in seen]
+        return plan
+
+    def record(
+        self,
+        file_path: Path,
+        content_hash: str,
+        chunk_count: int,
+        tags: Optional[List[str]] = None,
+    ) -> FileRecord:
+        stat = file_path.stat()
+        record = FileRecord(
+            path=str(file_path),
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            content_hash=content_hash,
+            chunk_count=chunk_count,
+            embedding_signature=self.embedding_signature,
+            tags=list(tags or []),
+        )
+        self.records[record.path] = record
+        return record
+
+    def forget(self, path: str) -> Optional[FileRecord]:
+        return self.records.pop(path, None)
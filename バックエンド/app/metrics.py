@@ -0,0 +1,243 @@
+"""In-process counters and histograms rendered in the Prometheus text exposition format.
+
+A small subset of the Prometheus client model, enough for ``/metrics``:
+counters and cumulative histograms with labels, plus gauges and counters
+read from a callback at scrape time. A disabled :class:`MetricsRegistry` turns every
+``inc``/``observe`` into an attribute check and an early return.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; covers a cached answer (a few ms) up to a slow LLM call.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds; a whole ingest run or one of its stages.
+INGEST_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labels: Sequence[str]) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, values: LabelValues, le: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values)]
+        if le:
+            pairs.append(f'le="{le}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic total per label set."""
+
+    kind = "counter"
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative ``le`` buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(*args)
+        self.buckets = tuple(sorted(buckets))
+        # label set -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            counts[slot] += 1
+            counts[-1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in values:
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {_number(cumulative)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Current values read from ``callback`` at scrape time, as ``{label values: value}``."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Callable[[], Dict[LabelValues, float]]) -> None:
+        super().__init__(*args)
+        self.callback = callback
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(value)}" for key, value in sorted(self.callback().items())]
+
+
+class CallbackCounter(Gauge):
+    """Monotonic totals kept by another object, read from ``callback`` at scrape time."""
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    """Creates metrics and renders all of them for ``/metrics``."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, tuple(labels)))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Iterable[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(self, name, help_text, tuple(labels), buckets=buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        labels: Iterable[str] = (),
+    ) -> Gauge:
+        return self._register(Gauge(self, name, help_text, tuple(labels), callback=callback))
+
+    def callback_counter(
+        self,
+        name: str,
+        help_text: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        labels: Iterable[str] = (),
+    ) -> CallbackCounter:
+        return self._register(CallbackCounter(self, name, help_text, tuple(labels), callback=callback))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class RAGMetrics:
+    """The metrics recorded by :class:`~app.rag_service.RAGService`."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.registry = MetricsRegistry(enabled)
+        registry = self.registry
+        self.query_stage_seconds = registry.histogram(
+            "rag_query_stage_seconds",
+            "Time spent in each query stage (embed, search, rerank, prompt, generation, first_token).",
+            ["stage"],
+        )
+        self.query_seconds = registry.histogram(
+            "rag_query_seconds", "End-to-end question answering time.", ["kind"]
+        )
+        self.queries = registry.counter(
+            "rag_queries_total",
+            "Answered questions by outcome (answered, cached, no_documents, error).",
+            ["kind", "collection", "outcome"],
+        )
+        self.answer_cache_lookups = registry.counter(
+            "rag_answer_cache_lookups_total", "Semantic answer cache lookups by result.", ["collection", "result"]
+        )
+        self.retrieved_chunks = registry.counter(
+            "rag_retrieved_chunks_total", "Chunks returned by retrieval (after reranking).", ["collection"]
+        )
+        self.context_chunks = registry.counter(
+            "rag_context_chunks_total", "Chunks that fit into prompt contexts.", ["collection"]
+        )
+        self.context_tokens = registry.counter(
+            "rag_context_tokens_total", "Tokens of prompt contexts sent to the LLM.", ["collection"]
+        )
+        self.answer_tokens = registry.counter(
+            "rag_answer_tokens_total", "Tokens of answers generated by the LLM.", ["collection"]
+        )
+        self.ingest_stage_seconds = registry.histogram(
+            "rag_ingest_stage_seconds",
+            "Time spent in each ingest stage (parse, embed, write) per ingest run.",
+            ["stage"],
+            buckets=INGEST_BUCKETS,
+        )
+        self.ingest_seconds = registry.histogram(
+            "rag_ingest_seconds", "Duration of ingest runs.", buckets=INGEST_BUCKETS
+        )
+        self.ingest_runs = registry.counter(
+            "rag_ingest_runs_total", "Ingest runs by outcome (completed, cancelled, error).", ["collection", "outcome"]
+        )
+        self.ingested_files = registry.counter("rag_ingested_files_total", "Files ingested.", ["collection"])
+        self.failed_files = registry.counter("rag_ingest_failed_files_total", "Files that failed to ingest.", ["collection"])
+        self.ingested_chunks = registry.counter("rag_ingested_chunks_total", "Chunks written.", ["collection"])
+        self.deleted_chunks = registry.counter("rag_deleted_chunks_total", "Chunks deleted.", ["collection"])
+
+    @property
+    def enabled(self) -> bool:
+        return self.registry.enabled
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -0,0 +1,729 @@
+"""Vector store backend keeping quantized embeddings in memory-mapped files."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, TypeVar
+
+import numpy as np
+from chromadb.api.types import Embeddings
+
+from .document_index import DocumentIndex
+from .embeddings import EmbeddingService
+from .filters import MetadataValue
+from .lexical_index import LexicalIndex
+from .vector_store import VectorStore
+
+VECTOR_DTYPES = ("int8", "float16")
+_ROWS_DB = "rows.sqlite3"
+# Small enough for the dequantized block to stay in CPU cache.
+_SCAN_BLOCK_ROWS = 4096
+# SQLite limits the number of bound parameters per statement.
+_SQL_BATCH = 500
+_FILTER_CACHE_SIZE = 64
+# commit() rewrites the vector file once this share of its rows is dead.
+_COMPACT_DEAD_RATIO = 0.25
+# An IVF list needs enough rows for its centroid to mean something.
+_IVF_MIN_ROWS_PER_LIST = 40
+_IVF_TRAIN_ROWS_PER_LIST = 64
+_IVF_ITERATIONS = 10
+# commit() retrains the IVF index once rows added since training exceed this share.
+_IVF_RETRAIN_RATIO = 0.2
+
+# Indexed expression; the query must spell it identically for SQLite to use the index.
+_PATH_EXPRESSION = "json_extract(metadata, '$.path')"
+
+_SQL_OPERATORS = {"$eq": "=", "$ne": "IS NOT", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+T = TypeVar("T")
+
+
+class _RowsRenumbered(Exception):
+    """A compaction renumbered the rows while a search was using the previous numbering."""
+
+
+@dataclass
+class _Ivf:
+    centroids: np.ndarray  # (lists, dim) float32
+    centroid_norms: np.ndarray
+    order: np.ndarray  # rows grouped by list
+    offsets: np.ndarray  # list i owns order[offsets[i]:offsets[i + 1]]
+    rows: int  # rows that existed when the index was trained
+
+
+@dataclass
+class _MappedState:
+    """One consistent view of the store, replaced whenever the generation changes."""
+
+    generation: int
+    rows: int
+    dim: int
+    vectors: Optional[np.ndarray]  # (rows, dim) memmap
+    stats: Optional[np.ndarray]  # (rows, 2) memmap: dequantization scale, squared norm
+    live: np.ndarray  # (rows,) bool
+    ivf: Optional[_Ivf] = None
+    file: str = ""  # vectors file; row numbers only change when a compaction replaces it
+
+    @property
+    def live_count(self) -> int:
+        return int(self.live.sum())
+
+
+class MmapVectorStore(VectorStore):
+    """Keeps embeddings quantized in one flat memory-mapped file and searches them with NumPy.
+
+    Files in ``directory`` (vector files carry a version so a compaction never
+    changes a file another process has mapped):
+
+    * ``vectors-N.bin``: one row per chunk, ``int8`` with a per-row scale or ``float16``
+    * ``vectors-N.stats``: float32 ``(scale, squared norm)`` per row
+    * ``ivf-N.*.npy``: optional coarse index (``ivf_lists`` > 0)
+    * ``rows.sqlite3``: chunk ID, text and metadata per row, plus the store's own metadata
+
+    Rows are only appended: an upsert or delete leaves a dead row, and
+    :meth:`commit` compacts the file once a quarter of it is dead
+    (:meth:`compact` does so whatever the share). The
+    vector files are mapped read-only, so all worker processes on a host
+    share one copy through the OS page cache; each process remaps them when
+    a write (from any process) bumps the generation stored in SQLite. A
+    compaction renumbers rows, so a search that started on the previous vector
+    file is run again rather than resolving its rows against the new numbering.
+
+    Search is exact (blocked matrix products and ``argpartition``) unless an
+    IVF index has been trained, which limits the scan to the ``ivf_probes``
+    lists nearest the query plus rows added since training. Metadata filters
+    are evaluated by SQLite and restrict the scan to matching rows.
+    Scores are squared L2 distances, like Chroma's.
+    """
+
+    def __init__(
+        self,
+        directory,
+        collection_name: str,
+        embedder: EmbeddingService,
+        lexical_index: Optional[LexicalIndex] = None,
+        rrf_k: int = 60,
+        dtype: str = "int8",
+        ivf_lists: int = 0,
+        ivf_probes: int = 8,
+        document_index: Optional[DocumentIndex] = None,
+    ) -> None:
+        super().__init__(collection_name, embedder, lexical_index, rrf_k, document_index)
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"unsupported vector dtype: {dtype} (expected one of {', '.join(VECTOR_DTYPES)})")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ivf_lists = max(ivf_lists, 0)
+        self.ivf_probes = max(ivf_probes, 1)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._state: Optional[_MappedState] = None
+        self._filter_rows: "OrderedDict[Tuple[str, int], np.ndarray]" = OrderedDict()
+        self._filter_paths: "OrderedDict[Tuple[str, int], Set[str]]" = OrderedDict()
+        connection = self._db()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            # Two-tier search looks up the chunks of a few documents by path.
+            connection.execute(f"CREATE INDEX IF NOT EXISTS chunks_path ON chunks ({_PATH_EXPRESSION})")
+            # An existing store keeps the dtype it was created with.
+            defaults = {
+                "dtype": dtype,
+                "dim": "0",
+                "rows": "0",
+                "generation": "0",
+                "file": "vectors-0",
+                "ivf": "",
+                "ivf_rows": "0",
+            }
+            connection.executemany("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", list(defaults.items()))
+        self.dtype = np.dtype(self._meta()["dtype"])
+
+    # SQLite access.
+
+    def _db(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.directory / _ROWS_DB, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """A read transaction: every query in it sees the same committed state."""
+        connection = self._db()
+        connection.execute("BEGIN")
+        try:
+            yield connection
+        finally:
+            connection.execute("COMMIT")
+
+    def _meta(self, connection: Optional[sqlite3.Connection] = None) -> Dict[str, str]:
+        return dict((connection or self._db()).execute("SELECT key, value FROM meta").fetchall())
+
+    @staticmethod
+    def _set_meta(connection: sqlite3.Connection, **values) -> None:
+        connection.executemany(
+            "UPDATE meta SET value = ? WHERE key = ?", [(str(value), key) for key, value in values.items()]
+        )
+
+    @staticmethod
+    def _bump_generation(connection: sqlite3.Connection) -> None:
+        connection.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+    # Mapped state.
+
+    def _stored_generation(self) -> int:
+        return int(self._db().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0])
+
+    def _current_state(self) -> _MappedState:
+        generation = self._stored_generation()
+        state = self._state
+        if state is None or state.generation != generation:
+            with self._state_lock:
+                state = self._state
+                if state is None or state.generation != generation:
+                    state = self._state = self._load_state()
+        return state
+
+    def _load_state(self) -> _MappedState:
+        # One read transaction, so the metadata and the live rows describe the same generation.
+        with self._read() as connection:
+            meta = self._meta(connection)
+            live_rows = np.fromiter(
+                (row for (row,) in connection.execute("SELECT row FROM chunks")), dtype=np.int64
+            )
+        rows, dim = int(meta["rows"]), int(meta["dim"])
+        live = np.zeros(rows, dtype=bool)
+        live[live_rows] = True
+        vectors = stats = None
+        if rows:
+            vectors = np.memmap(self.directory / f"{meta['file']}.bin", dtype=self.dtype, mode="r", shape=(rows, dim))
+            stats = np.memmap(self.directory / f"{meta['file']}.stats", dtype=np.float32, mode="r", shape=(rows, 2))
+        state = _MappedState(int(meta["generation"]), rows, dim, vectors, stats, live, file=meta["file"])
+        if meta["ivf"] and self.ivf_lists:
+            prefix = self.directory / meta["ivf"]
+            centroids = np.load(f"{prefix}.centroids.npy")
+            state.ivf = _Ivf(
+                centroids=centroids,
+                centroid_norms=(centroids**2).sum(axis=1),
+                order=np.load(f"{prefix}.order.npy", mmap_mode="r"),
+                offsets=np.load(f"{prefix}.offsets.npy"),
+                rows=int(meta["ivf_rows"]),
+            )
+        return state
+
+    def _dequantize(self, state: _MappedState, rows) -> np.ndarray:
+        vectors = np.asarray(state.vectors[rows], dtype=np.float32)
+        if self.dtype == np.int8:
+            vectors *= state.stats[rows, 0:1]
+        return vectors
+
+    # Backend primitives.
+
+    def count(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _upsert(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, MetadataValue]],
+        embeddings: Optional[Embeddings],
+    ) -> None:
+        if embeddings is None:
+            embeddings = self.embed(documents)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        with self._write_lock:
+            connection = self._db()
+            meta = self._meta(connection)
+            dim, rows = int(meta["dim"]), int(meta["rows"])
+            if dim and matrix.shape[1] != dim:
+                raise ValueError(f"embedding dimension {matrix.shape[1]} does not match the store ({dim})")
+            quantized, stats = self._quantize(matrix)
+            # Vectors first: a row only becomes visible once its vector is on disk.
+            _write_rows(self.directory / f"{meta['file']}.bin", quantized, rows)
+            _write_rows(self.directory / f"{meta['file']}.stats", stats, rows)
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (rows + position, chunk_id, document, json.dumps(metadata, ensure_ascii=False))
+                        for position, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                    ],
+                )
+                self._set_meta(connection, rows=rows + len(ids), dim=matrix.shape[1])
+                self._bump_generation(connection)
+
+    def _quantize(self, matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        stats = np.empty((len(matrix), 2), dtype=np.float32)
+        stats[:, 1] = (matrix**2).sum(axis=1)
+        if self.dtype == np.float16:
+            stats[:, 0] = 1.0
+            return matrix.astype(np.float16), stats
+        # Symmetric per-row int8: row ≈ quantized * scale.
+        scale = np.abs(matrix).max(axis=1) / 127
+        scale[scale == 0] = 1.0
+        stats[:, 0] = scale
+        return np.clip(np.rint(matrix / scale[:, None]), -127, 127).astype(np.int8), stats
+
+    def _delete(self, ids: List[str]) -> int:
+        deleted = 0
+        with self._write_lock:
+            connection = self._db()
+            with connection:
+                for start in range(0, len(ids), _SQL_BATCH):
+                    batch = ids[start : start + _SQL_BATCH]
+                    deleted += connection.execute(
+                        f"DELETE FROM chunks WHERE id IN ({_placeholders(batch)})", batch
+                    ).rowcount
+                self._bump_generation(connection)
+        return deleted
+
+    def _matching_ids(self, where: Dict, ids: Optional[Sequence[str]] = None) -> List[str]:
+        condition, params = _where_sql(where)
+        connection = self._db()
+        if ids is None:
+            return [chunk_id for (chunk_id,) in connection.execute(f"SELECT id FROM chunks WHERE {condition}", params)]
+        ids = list(ids)
+        matched: List[str] = []
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start : start + _SQL_BATCH]
+            matched.extend(
+                chunk_id
+                for (chunk_id,) in connection.execute(
+                    f"SELECT id FROM chunks WHERE id IN ({_placeholders(batch)}) AND {condition}", [*batch, *params]
+                )
+            )
+        return matched
+
+    def _matching_paths(self, where: Dict) -> Set[str]:
+        """Cached per generation like :meth:`_rows_matching`, so repeated two_tier filters skip the scan."""
+        where_key = json.dumps(where, sort_keys=True)
+        key = (where_key, self._stored_generation())
+        with self._state_lock:
+            cached = self._filter_paths.get(key)
+            if cached is not None:
+                self._filter_paths.move_to_end(key)
+                return cached
+        condition, params = _where_sql(where)
+        with self._read() as connection:
+            generation = int(self._meta(connection)["generation"])
+            paths = {
+                str(path)
+                for (path,) in connection.execute(
+                    f"SELECT DISTINCT {_PATH_EXPRESSION} FROM chunks "
+                    f"WHERE ({condition}) AND {_PATH_EXPRESSION} IS NOT NULL",
+                    params,
+                )
+            }
+        with self._state_lock:
+            self._filter_paths[(where_key, generation)] = paths
+            while len(self._filter_paths) > _FILTER_CACHE_SIZE:
+                self._filter_paths.popitem(last=False)
+        return paths
+
+    def _document_pages(self, page_size: int) -> Iterator[Tuple[List[str], List[str]]]:
+        last_row = -1
+        while True:
+            page = self._db().execute(
+                "SELECT row, id, document FROM chunks WHERE row > ? ORDER BY row LIMIT ?", (last_row, page_size)
+            ).fetchall()
+            if not page:
+                return
+            last_row = page[-1][0]
+            yield [chunk_id for _, chunk_id, _ in page], [document for _, _, document in page]
+
+    def _record_pages(
+        self, page_size: int
+    ) -> Iterator[Tuple[List[str], List[str], List[Dict[str, MetadataValue]], Sequence[Sequence[float]]]]:
+        state = self._current_state()
+        last_row = -1
+        while True:
+            page = self._db().execute(
+                "SELECT row, id, document, metadata FROM chunks WHERE row > ? AND row < ? ORDER BY row LIMIT ?",
+                (last_row, state.rows, page_size),
+            ).fetchall()
+            if not page:
+                return
+            last_row = page[-1][0]
+            rows = np.asarray([row for row, _, _, _ in page], dtype=np.int64)
+            yield (
+                [chunk_id for _, chunk_id, _, _ in page],
+                [document for _, _, document, _ in page],
+                [json.loads(metadata) for _, _, _, metadata in page],
+                self._dequantize(state, rows),
+            )
+
+    def _fetch(self, ids: Sequence[str]) -> List[Dict]:
+        ids = list(ids)
+        found: Dict[str, Dict] = {}
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start : start + _SQL_BATCH]
+            for chunk_id, document, metadata in self._db().execute(
+                f"SELECT id, document, metadata FROM chunks WHERE id IN ({_placeholders(batch)})", batch
+            ):
+                found[chunk_id] = {"id": chunk_id, "content": document, "metadata": json.loads(metadata), "score": None}
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+    def _query(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict] = None,
+    ) -> List[List[Dict]]:
+        return self._on_current_rows(lambda state: self._query_state(state, query_embeddings, top_k, where))
+
+    def _query_state(
+        self,
+        state: _MappedState,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict],
+    ) -> List[List[Dict]]:
+        if not state.rows or top_k <= 0:
+            return [[] for _ in query_embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        allowed = self._rows_matching(where, state) if where is not None else None
+        if allowed is not None and not len(allowed):
+            return [[] for _ in query_embeddings]
+        if state.ivf is None or (allowed is not None and len(allowed) <= self._ivf_scan_size(state)):
+            # Exact scan; a selective filter is cheaper to scan in full than through the index.
+            distances, rows = self._scan(state, queries, top_k, allowed)
+        else:
+            distances = np.full((len(queries), top_k), np.inf, dtype=np.float32)
+            rows = np.full((len(queries), top_k), -1, dtype=np.int64)
+            for position, query in enumerate(queries):
+                candidates = self._ivf_candidates(state, query)
+                if allowed is not None:
+                    candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+                if len(candidates) < top_k:
+                    candidates = allowed
+                found_distances, found_rows = self._scan(state, query[None, :], top_k, candidates)
+                distances[position, : found_rows.shape[1]] = found_distances[0]
+                rows[position, : found_rows.shape[1]] = found_rows[0]
+        return self._results(state, distances, rows)
+
+    # Search.
+
+    def _search_documents(
+        self,
+        embedding: List[float],
+        top_k: int,
+        paths: List[str],
+        where: Optional[Dict],
+    ) -> List[Dict]:
+        return self._on_current_rows(lambda state: self._search_documents_state(state, embedding, top_k, paths, where))
+
+    def _search_documents_state(
+        self,
+        state: _MappedState,
+        embedding: List[float],
+        top_k: int,
+        paths: List[str],
+        where: Optional[Dict],
+    ) -> List[Dict]:
+        if not state.rows or top_k <= 0:
+            return []
+        rows = np.fromiter(
+            (
+                row
+                for (row,) in self._db().execute(
+                    f"SELECT row FROM chunks WHERE {_PATH_EXPRESSION} IN ({_placeholders(paths)}) ORDER BY row", paths
+                )
+            ),
+            dtype=np.int64,
+        )
+        rows = rows[rows < state.rows]
+        if where is not None:
+            rows = np.intersect1d(rows, self._rows_matching(where, state), assume_unique=True)
+        if not len(rows):
+            return []
+        distances, found = self._scan(state, np.asarray([embedding], dtype=np.float32), top_k, rows)
+        return self._results(state, distances, found)[0]
+
+    def _on_current_rows(self, search: Callable[[_MappedState], T]) -> T:
+        """Run ``search`` on the mapped state, again if a compaction renumbered the rows meanwhile."""
+        while True:
+            try:
+                return search(self._current_state())
+            except _RowsRenumbered:
+                continue
+
+    def _rows_matching(self, where: Dict, state: _MappedState) -> np.ndarray:
+        """Sorted live rows whose metadata matches ``where``, cached per generation."""
+        key = (json.dumps(where, sort_keys=True), state.generation)
+        with self._state_lock:
+            cached = self._filter_rows.get(key)
+            if cached is not None:
+                self._filter_rows.move_to_end(key)
+                return cached
+        condition, params = _where_sql(where)
+        with self._read() as connection:
+            file = self._meta(connection)["file"]
+            rows = np.fromiter(
+                (row for (row,) in connection.execute(f"SELECT row FROM chunks WHERE {condition} ORDER BY row", params)),
+                dtype=np.int64,
+            )
+        if file != state.file:
+            raise _RowsRenumbered
+        rows = rows[rows < state.rows]
+        with self._state_lock:
+            self._filter_rows[key] = rows
+            while len(self._filter_rows) > _FILTER_CACHE_SIZE:
+                self._filter_rows.popitem(last=False)
+        return rows
+
+    def _ivf_scan_size(self, state: _MappedState) -> int:
+        lists = len(state.ivf.centroids)
+        return state.ivf.rows * min(self.ivf_probes, lists) // lists + state.rows - state.ivf.rows
+
+    def _ivf_candidates(self, state: _MappedState, query: np.ndarray) -> np.ndarray:
+        ivf = state.ivf
+        distances = ivf.centroid_norms - 2 * ivf.centroids @ query
+        probes = min(self.ivf_probes, len(distances))
+        nearest = np.argpartition(distances, probes - 1)[:probes]
+        parts = [ivf.order[ivf.offsets[index] : ivf.offsets[index + 1]] for index in nearest]
+        parts.append(np.arange(ivf.rows, state.rows))  # added since training, not in any list
+        rows = np.sort(np.concatenate(parts))
+        return rows[state.live[rows]]
+
+    def _scan(
+        self,
+        state: _MappedState,
+        queries: np.ndarray,
+        top_k: int,
+        rows: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k over ``rows`` (all live rows when ``None``), nearest first."""
+        query_norms = (queries**2).sum(axis=1)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        total = state.rows if rows is None else len(rows)
+        for start in range(0, total, _SCAN_BLOCK_ROWS):
+            stop = min(start + _SCAN_BLOCK_ROWS, total)
+            if rows is None:
+                live = state.live[start:stop]
+                block_rows = np.arange(start, stop)[live]
+                if not len(block_rows):
+                    continue
+                vectors, stats = state.vectors[start:stop], state.stats[start:stop]
+                if len(block_rows) < stop - start:
+                    vectors, stats = vectors[live], stats[live]
+            else:
+                block_rows = rows[start:stop]
+                vectors, stats = state.vectors[block_rows], state.stats[block_rows]
+            products = np.asarray(vectors, dtype=np.float32) @ queries.T
+            if self.dtype == np.int8:
+                products *= stats[:, 0:1]
+            distances = (stats[:, 1:2] + query_norms[None, :] - 2 * products).T
+            best_distances = np.concatenate([best_distances, distances], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(block_rows, distances.shape)], axis=1)
+            if best_distances.shape[1] > top_k:
+                keep = np.argpartition(best_distances, top_k - 1, axis=1)[:, :top_k]
+                best_distances = np.take_along_axis(best_distances, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(best_distances, axis=1)
+        return np.take_along_axis(best_distances, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+    def _results(self, state: _MappedState, distances: np.ndarray, rows: np.ndarray) -> List[List[Dict]]:
+        wanted = sorted({int(row) for row in rows.ravel() if row >= 0})
+        found: Dict[int, Tuple[str, str, str]] = {}
+        # Row numbers are only meaningful for the vectors file the state mapped.
+        with self._read() as connection:
+            if self._meta(connection)["file"] != state.file:
+                raise _RowsRenumbered
+            for start in range(0, len(wanted), _SQL_BATCH):
+                batch = wanted[start : start + _SQL_BATCH]
+                for row, chunk_id, document, metadata in connection.execute(
+                    f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({_placeholders(batch)})", batch
+                ):
+                    found[row] = (chunk_id, document, metadata)
+        results: List[List[Dict]] = []
+        for query_distances, query_rows in zip(distances, rows):
+            items = []
+            for distance, row in zip(query_distances.tolist(), query_rows.tolist()):
+                # A row missing here was deleted since the state was mapped.
+                if row < 0 or row not in found:
+                    continue
+                chunk_id, document, metadata = found[row]
+                items.append(
+                    {"id": chunk_id, "content": document, "metadata": json.loads(metadata), "score": max(distance, 0.0)}
+                )
+            results.append(items)
+        return results
+
+    # Maintenance.
+
+    def commit(self) -> None:
+        """Persist lexical deletions, compact dead rows and (re)train the IVF index when due."""
+        super().commit()
+        self._maintain(_COMPACT_DEAD_RATIO)
+
+    def _storage_paths(self) -> List[Path]:
+        return [self.directory]
+
+    def _compact_storage(self) -> None:
+        """Drop every dead row, not only past the automatic threshold, and shrink the SQLite file."""
+        self._maintain(0.0)
+        with self._write_lock:
+            connection = self._db()
+            connection.execute("VACUUM")
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _snapshot_storage(self, target: Callable[[Path], Path]) -> None:
+        # Holding the write lock freezes the vector files; SQLite's backup API
+        # copies the rows consistently while other connections keep reading.
+        with self._write_lock:
+            destination = target(self.directory)
+            destination.mkdir(parents=True, exist_ok=True)
+            with closing(sqlite3.connect(destination / _ROWS_DB)) as copy:
+                self._db().backup(copy)
+            meta = self._meta()
+            names = [f"{meta['file']}.bin", f"{meta['file']}.stats"]
+            if meta["ivf"]:
+                names += [f"{meta['ivf']}.{part}.npy" for part in ("centroids", "order", "offsets")]
+            for name in names:
+                if (self.directory / name).exists():
+                    shutil.copy2(self.directory / name, destination / name)
+
+    def _maintain(self, dead_ratio: float) -> None:
+        with self._write_lock:
+            state = self._load_state()
+            if state.rows and state.rows - state.live_count > dead_ratio * state.rows:
+                self._compact(state)
+                state = self._load_state()
+            if not self.ivf_lists or state.live_count < self.ivf_lists * _IVF_MIN_ROWS_PER_LIST:
+                return
+            ivf = state.ivf
+            if ivf is None or len(ivf.centroids) != self.ivf_lists or (
+                state.rows - ivf.rows > _IVF_RETRAIN_RATIO * ivf.rows
+            ):
+                self._train_ivf(state)
+
+    def _compact(self, state: _MappedState) -> None:
+        connection = self._db()
+        meta = self._meta(connection)
+        live_rows = np.flatnonzero(state.live)
+        name = f"vectors-{int(meta['generation']) + 1}"
+        with open(self.directory / f"{name}.bin", "wb") as vectors_file, open(
+            self.directory / f"{name}.stats", "wb"
+        ) as stats_file:
+            for start in range(0, len(live_rows), _SCAN_BLOCK_ROWS):
+                block = live_rows[start : start + _SCAN_BLOCK_ROWS]
+                vectors_file.write(np.ascontiguousarray(state.vectors[block]).tobytes())
+                stats_file.write(np.ascontiguousarray(state.stats[block]).tobytes())
+        with connection:
+            # Ascending order never moves a row onto one that is still occupied.
+            connection.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(new_row, int(old_row)) for new_row, old_row in enumerate(live_rows) if new_row != old_row],
+            )
+            self._set_meta(connection, rows=len(live_rows), file=name, ivf="", ivf_rows=0)
+            self._bump_generation(connection)
+        self._remove_unused_files({name})
+
+    def _train_ivf(self, state: _MappedState) -> None:
+        """k-means over a sample of live rows, then every live row is filed under its nearest centroid."""
+        lists = self.ivf_lists
+        live_rows = np.flatnonzero(state.live)
+        rng = np.random.default_rng(0)
+        sample_size = min(len(live_rows), lists * _IVF_TRAIN_ROWS_PER_LIST)
+        sample = np.sort(rng.choice(live_rows, size=sample_size, replace=False))
+        data = self._dequantize(state, sample)
+        centroids = data[rng.choice(len(data), size=lists, replace=False)].copy()
+        for _ in range(_IVF_ITERATIONS):
+            assignment = _nearest_centroid(data, centroids)
+            counts = np.bincount(assignment, minlength=lists)
+            filled = counts > 0  # an empty list keeps its previous centroid
+            # Sum each list's rows as one contiguous run of the rows sorted by list.
+            starts = np.cumsum(counts) - counts
+            sums = np.add.reduceat(data[np.argsort(assignment, kind="stable")], starts[filled], axis=0)
+            centroids[filled] = sums / counts[filled, None]
+        assignment = np.concatenate(
+            [
+                _nearest_centroid(self._dequantize(state, live_rows[start : start + _SCAN_BLOCK_ROWS]), centroids)
+                for start in range(0, len(live_rows), _SCAN_BLOCK_ROWS)
+            ]
+        )
+        by_list = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[by_list], np.arange(lists + 1))
+        connection = self._db()
+        name = f"ivf-{int(self._meta(connection)['generation']) + 1}"
+        np.save(self.directory / f"{name}.centroids.npy", centroids.astype(np.float32))
+        np.save(self.directory / f"{name}.order.npy", live_rows[by_list])
+        np.save(self.directory / f"{name}.offsets.npy", offsets)
+        with connection:
+            self._set_meta(connection, ivf=name, ivf_rows=state.rows)
+            self._bump_generation(connection)
+        self._remove_unused_files({self._meta(connection)["file"], name})
+
+    def _remove_unused_files(self, keep: set) -> None:
+        # Processes that still map an old file keep reading it; POSIX frees it once they remap.
+        for path in list(self.directory.glob("vectors-*")) + list(self.directory.glob("ivf-*")):
+            if path.name.split(".")[0] not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+def _write_rows(path: Path, array: np.ndarray, row: int) -> None:
+    """Write ``array`` starting at ``row``, dropping anything an interrupted write left after it."""
+    offset = row * array[0].nbytes if len(array) else 0
+    with open(path, "r+b" if path.exists() else "wb") as handle:
+        handle.seek(offset)
+        handle.write(np.ascontiguousarray(array).tobytes())
+        handle.truncate()
+
+
+def _nearest_centroid(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmin((centroids**2).sum(axis=1)[None, :] - 2 * data @ centroids.T, axis=1)
+
+
+def _placeholders(values: Sequence) -> str:
+    return ", ".join("?" * len(values))
+
+
+def _where_sql(where: Mapping) -> Tuple[str, List]:
+    """Translate a Chroma ``where`` clause into an SQLite condition over the JSON metadata column."""
+    clauses: List[str] = []
+    params: List = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(clause) for clause in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + (joiner.join(part for part, _ in parts) or "1") + ")")
+            params.extend(param for _, part_params in parts for param in part_params)
+            continue
+        path = '$."' + key.replace('"', '\\"') + '"'
+        operators = condition.items() if isinstance(condition, Mapping) else [("$eq", condition)]
+        for operator, operand in operators:
+            if operator in ("$in", "$nin"):
+                values = list(operand)
+                negate = "NOT " if operator == "$nin" else ""
+                clause = f"json_extract(metadata, ?) {negate}IN ({_placeholders(values)})"
+                if operator == "$nin":
+                    clause = f"(json_extract(metadata, ?) IS NULL OR {clause})"
+                    params.append(path)
+                clauses.append(clause)
+                params.extend([path, *values])
+            elif operator in _SQL_OPERATORS:
+                clauses.append(f"json_extract(metadata, ?) {_SQL_OPERATORS[operator]} ?")
+                params.extend([path, operand])
+            else:
+                raise ValueError(f"unsupported filter operator: {operator}")
+    return " AND ".join(clauses) or "1", params
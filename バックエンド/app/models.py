@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -12,33 +13,211 @@ class HealthResponse(BaseModel):
     environment: str
 
 
+class ReadinessResponse(BaseModel):
+    ready: bool
+    status: str
+    components: Dict[str, float] = Field(default_factory=dict)
+    error: Optional[str] = None
+
+
 class IngestRequest(BaseModel):
     paths: Optional[List[str]] = Field(
         default=None,
         description="Specific document paths (relative to the source directory) to ingest.",
     )
+    tags: Optional[List[str]] = Field(
+        default=None,
+        description="Tags replacing those of the ingested files; omitted keeps the recorded tags.",
+    )
 
 
 class IngestResponse(BaseModel):
     ingested_files: int
     ingested_chunks: int
     skipped_files: int
+    added_files: int = 0
+    updated_files: int = 0
+    unchanged_files: int = 0
+    deleted_files: int = 0
+    deleted_chunks: int = 0
+    failed_files: int = 0
+    elapsed_seconds: float = 0.0
+    chunks_per_second: float = 0.0
+    stage_seconds: Dict[str, float] = Field(default_factory=dict)
     detail: str
 
 
+class FileProgressModel(BaseModel):
+    path: str
+    status: str
+    chunks: int
+    error: Optional[str]
+
+
+class IngestJobResponse(BaseModel):
+    id: str
+    collection: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    total_files: int
+    processed_files: int
+    failed_files: int
+    ingested_chunks: int
+    elapsed_seconds: float
+    chunks_per_second: float
+    files: List[FileProgressModel]
+    errors: List[str]
+    result: Optional[IngestResponse]
+
+
+class UploadedFileModel(BaseModel):
+    filename: str
+    size_bytes: int
+    sha256: str
+    status: str = Field(..., description="queued: stored and queued for ingestion; duplicate: content already present.")
+    path: Optional[str] = None
+    duplicate_of: Optional[str] = Field(default=None, description="Existing file with the same content.")
+
+
+class UploadResponse(BaseModel):
+    files: List[UploadedFileModel]
+    job: Optional[IngestJobResponse] = Field(
+        default=None, description="Ingest job for the queued files; absent when every file was a duplicate."
+    )
+
+
+class DeleteDocumentsRequest(BaseModel):
+    sources: List[str] = Field(default_factory=list, description="File names; the file is deleted from every folder.")
+    paths: List[str] = Field(default_factory=list, description="Paths, absolute or relative to the source directory.")
+    remove_files: bool = Field(
+        default=True, description="Also delete the source files, so the next full ingest does not add them again."
+    )
+
+
+class DedupRequest(BaseModel):
+    dry_run: bool = Field(default=False, description="Only count the duplicate chunks.")
+
+
+class MaintenanceResponse(BaseModel):
+    operation: str
+    collection: str
+    bytes_before: int
+    bytes_after: int
+    bytes_reclaimed: int
+    elapsed_seconds: float
+    deleted_files: int = 0
+    deleted_chunks: int = 0
+    duplicate_chunks: int = 0
+    removed_files: List[str] = Field(default_factory=list)
+
+
+class SnapshotRequest(BaseModel):
+    collections: Optional[List[str]] = Field(default=None, description="Collections to copy; all when omitted.")
+
+
+class SnapshotResponse(BaseModel):
+    path: str
+    collections: List[str]
+    bytes_written: int
+    removed_snapshots: List[str]
+    elapsed_seconds: float
+
+
+class ExportRequest(BaseModel):
+    dtype: Literal["float32", "float16"] = Field(
+        default="float32", description="Precision of the exported embeddings; float16 halves the file size."
+    )
+
+
+class ImportRequest(BaseModel):
+    bundle: str = Field(..., description="Bundle directory under RAG_EXPORT_DIR, as returned by /admin/export.")
+
+
+class BundleResponse(BaseModel):
+    path: str
+    collection: str
+    embedding_model: str
+    chunks: int
+    files: int
+    bytes_written: int = 0
+    deleted_chunks: int = 0
+    elapsed_seconds: float
+
+
+class MetadataFilter(BaseModel):
+    sources: Optional[List[str]] = Field(default=None, description="File names to search in.")
+    path_prefixes: Optional[List[str]] = Field(
+        default=None,
+        description="Folders relative to the source directory; their sub-folders are included.",
+    )
+    extensions: Optional[List[str]] = Field(default=None, description="File extensions such as 'pdf' or 'md'.")
+    ingested_after: Optional[datetime] = Field(default=None, description="Only chunks ingested at or after this time.")
+    ingested_before: Optional[datetime] = Field(default=None, description="Only chunks ingested before this time.")
+    tags: Optional[List[str]] = Field(default=None, description="Only files carrying every one of these tags.")
+
+
 class QuestionRequest(BaseModel):
     question: str = Field(..., description="User question in natural language.")
     top_k: Optional[int] = Field(
         default=None,
-        description="Override for number of documents to retrieve.",
+        description="Override for the most documents to retrieve.",
+    )
+    min_k: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Override for the results always kept by the score_gap cutoff.",
+    )
+    max_distance: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Override for the vector distance beyond which chunks are dropped (0 disables).",
+    )
+    score_gap: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Override for the relative distance jump that ends retrieval (0 disables).",
+    )
+    filters: Optional[MetadataFilter] = Field(
+        default=None,
+        description="Restrict retrieval to chunks whose metadata matches every condition.",
+    )
+
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, description="Questions answered in one request.")
+    top_k: Optional[int] = Field(
+        default=None,
+        description="Override for the most documents to retrieve per question.",
+    )
+    min_k: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Override for the results always kept by the score_gap cutoff.",
+    )
+    max_distance: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Override for the vector distance beyond which chunks are dropped (0 disables).",
+    )
+    score_gap: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Override for the relative distance jump that ends retrieval (0 disables).",
+    )
+    filters: Optional[MetadataFilter] = Field(
+        default=None,
+        description="Metadata filter applied to every question.",
     )
 
 
 class SourceDocument(BaseModel):
     id: str
     content: str
-    metadata: Dict[str, str]
+    metadata: Dict[str, Union[str, int, float, bool]]
     score: Optional[float]
+    rerank_score: Optional[float] = None
 
 
 class AnswerResponse(BaseModel):
@@ -46,3 +225,34 @@ class AnswerResponse(BaseModel):
     answer: str
     prompt: str
     sources: List[SourceDocument]
+    cached: bool = False
+    timings: Dict[str, float] = Field(default_factory=dict)
+
+
+class CollectionInfo(BaseModel):
+    name: str
+    default: bool
+    loaded: bool
+    active_users: int
+
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool
+    entries: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    hit_rate: float = 0.0
+    threshold: Optional[float] = None
+
+
+class EmbeddingStatsResponse(BaseModel):
+    model: str
+    embedded_texts: int
+    encode_seconds: float
+    embeddings_per_second: float
+    query_cache_entries: int
+    query_cache_hits: int
+    query_cache_misses: int
+    query_cache_hit_rate: float
+    query_batches: int
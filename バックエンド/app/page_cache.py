@@ -0,0 +1,84 @@
+"""On-disk cache of text extracted from PDF pages."""
+
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pypdf
+
+# Text extracted by another pypdf release may differ, so it lives in its own tree.
+_VERSION_DIR = f"pypdf-{pypdf.__version__}"
+
+
+class PdfPageCache:
+    """Stores the extracted text of every PDF page, keyed by file hash and page number.
+
+    Each page is one UTF-8 file written atomically, so several worker
+    processes can fill the pages of one document at the same time. A page
+    that is missing simply has not been extracted yet.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.root = self.directory / _VERSION_DIR
+
+    def _document_dir(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / content_hash
+
+    def _page_path(self, content_hash: str, page: int) -> Path:
+        return self._document_dir(content_hash) / f"{page:06d}.txt"
+
+    def get(self, content_hash: str, page: int) -> Optional[str]:
+        try:
+            return self._page_path(content_hash, page).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put(self, content_hash: str, page: int, text: str) -> None:
+        self._write(self._page_path(content_hash, page), text)
+
+    @staticmethod
+    def _write(path: Path, text: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def page_count(self, content_hash: str) -> Optional[int]:
+        try:
+            return int((self._document_dir(content_hash) / "pages").read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set_page_count(self, content_hash: str, page_count: int) -> None:
+        self._write(self._document_dir(content_hash) / "pages", str(page_count))
+
+    def missing_pages(self, content_hash: str, page_count: int) -> List[int]:
+        document_dir = self._document_dir(content_hash)
+        if not document_dir.exists():
+            return list(range(page_count))
+        cached = {path.name for path in document_dir.glob("*.txt")}
+        return [page for page in range(page_count) if f"{page:06d}.txt" not in cached]
+
+    def prune(self, keep_hashes: Iterable[str]) -> int:
+        """Delete cached documents (and other pypdf versions) not in ``keep_hashes``."""
+        keep = set(keep_hashes)
+        removed = 0
+        if not self.directory.exists():
+            return removed
+        for version_dir in self.directory.iterdir():
+            if version_dir != self.root:
+                shutil.rmtree(version_dir, ignore_errors=True)
+        if not self.root.exists():
+            return removed
+        for prefix_dir in self.root.iterdir():
+            for document_dir in prefix_dir.iterdir():
+                if document_dir.name not in keep:
+                    shutil.rmtree(document_dir, ignore_errors=True)
+                    removed += 1
+            if not any(prefix_dir.iterdir()):
+                prefix_dir.rmdir()
+        return removed
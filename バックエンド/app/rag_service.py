@@ -2,15 +2,40 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import json
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import AsyncIterator, Callable, ContextManager, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
 
-from openai import OpenAI
+import httpx
+import numpy as np
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
 
-from .config import settings
-from .document_loader import DocumentLoader, discover_documents
-from .vector_store import VectorStore
+from .collection_manager import CollectionManager, KnowledgeBase
+from .config import Settings, settings as default_settings
+from .context_builder import ContextBuilder
+from .coordination import INDEX_VERSION_FILENAME
+from .document_index import add_to_sums
+from .document_loader import DocumentChunk, discover_documents
+from .embedding_bundle import BundleError, BundleInfo, iter_bundle, read_bundle_info, write_bundle
+from .embeddings import EmbeddingService, RemoteEmbeddingService
+from .filters import MetadataValue, normalize_tag, tag_key
+from .ingest_pipeline import IngestCancelled, IngestProgress
+from .manifest import MANIFEST_FILENAME, FileRecord, chunk_id, document_key, hash_file
+from .metrics import RAGMetrics
+from .reranker import CrossEncoderReranker
+from .tokens import TokenCounter
+from .uploads import ReceivedUpload
+from .vector_store import ScoreCutoff, path_size
 
 
 PROMPT_TEMPLATE = """You are an AI assistant that answers corporate knowledge base questions.
@@ -26,6 +51,15 @@ Question:
 Answer:
 """
 
+NO_DOCUMENTS_ANSWER = "関連する文書を見つけられませんでした。"
+WARMUP_QUERY = "warm-up"
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_INFO_FILENAME = "snapshot.json"
+
+T = TypeVar("T")
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
 
 @dataclass
 class RetrievedDocument:
@@ -33,54 +67,211 @@ class RetrievedDocument:
 
     id: str
     content: str
-    metadata: Dict[str, str]
+    metadata: Dict[str, MetadataValue]
     score: Optional[float]
+    rerank_score: Optional[float] = None
+
+
+@dataclass
+class Readiness:
+    """Startup warm-up progress reported by ``/ready``."""
+
+    status: str = "starting"  # starting | ready | failed
+    components: Dict[str, float] = field(default_factory=dict)  # component -> load seconds
+    error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
 
 
 class LLMClient:
-    """Thin wrapper over the OpenAI chat completion API."""
+    """Thin wrapper over the async OpenAI chat completion API.
+
+    ``http_client`` is shared by every request so connections to the API are
+    pooled and kept alive instead of being re-established per question.
+    """
 
-    def __init__(self, api_key: str, model: str, temperature: float, max_tokens: int) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ) -> None:
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.client = OpenAI(api_key=api_key)
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
 
-    def generate(self, prompt: str) -> str:
-        response = self.client.chat.completions.create(
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": "You are a helpful assistant for enterprise knowledge bases."},
+            {"role": "user", "content": prompt},
+        ]
+
+    async def generate(self, prompt: str, max_retries: int = 0, max_backoff: float = 30.0) -> str:
+        """Generate an answer, retrying rate limits and transient errors up to ``max_retries`` times.
+
+        Waits follow the ``Retry-After`` header when the API sends one, otherwise
+        exponential backoff with jitter capped at ``max_backoff`` seconds.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    messages=self._messages(prompt),
+                )
+                return response.choices[0].message.content or ""
+            except (APIConnectionError, APIStatusError) as exc:
+                retryable = not isinstance(exc, APIStatusError) or exc.status_code in _RETRYABLE_STATUS
+                if not retryable or attempt >= max_retries:
+                    raise
+                await asyncio.sleep(_retry_delay(exc, attempt, max_backoff))
+                attempt += 1
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield answer text deltas as the API produces them."""
+        response = await self.client.chat.completions.create(
             model=self.model,
             temperature=self.temperature,
             max_tokens=self.max_tokens,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant for enterprise knowledge bases."},
-                {"role": "user", "content": prompt},
-            ],
+            messages=self._messages(prompt),
+            stream=True,
         )
-        return response.choices[0].message.content or ""
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
 
 class RAGService:
-    """Provides ingestion and question answering capabilities."""
+    """Provides ingestion and question answering over the collections of a :class:`CollectionManager`.
 
-    def __init__(self) -> None:
-        self.settings = settings
-        self.loader = DocumentLoader(
-            chunk_size=self.settings.chunk_size,
-            chunk_overlap=self.settings.chunk_overlap,
+    ``settings`` and ``embedder`` default to the application's; benchmarks pass their own.
+    A reader worker (``process_role=reader``) only answers questions from
+    the stores the writer process maintains, which requires the mmap backend:
+    Chroma's on-disk index is not safe to share between processes.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, embedder: Optional[EmbeddingService] = None) -> None:
+        self.settings = settings or default_settings
+        if self.settings.process_role == "reader" and self.settings.vector_backend != "mmap":
+            raise ValueError("RAG_PROCESS_ROLE=reader requires RAG_VECTOR_BACKEND=mmap")
+        self.embedder = embedder or self._create_embedder()
+        self.collections = CollectionManager(self.settings, self.embedder)
+        self.context_builder = ContextBuilder(
+            TokenCounter(self.settings.openai_model, cache_dir=self.settings.tiktoken_cache_dir),
+            max_tokens=self.settings.context_max_tokens,
+            dedup_threshold=self.settings.context_dedup_threshold,
+        )
+        self.reranker: Optional[CrossEncoderReranker] = None
+        if self.settings.rerank_enabled:
+            self.reranker = CrossEncoderReranker(
+                model_name=self.settings.rerank_model,
+                batch_size=self.settings.rerank_batch_size,
+                max_length=self.settings.rerank_max_length,
+                device=self.settings.embedding_device,
+            )
+        # Embedding and vector search are CPU-bound and synchronous; they run on
+        # this bounded pool so the event loop keeps serving other requests.
+        self.query_executor = ThreadPoolExecutor(
+            max_workers=self.settings.query_workers,
+            thread_name_prefix="query",
         )
-        self.vector_store = VectorStore(
-            persist_directory=self.settings.vector_store_dir,
-            collection_name="documents",
-            embedding_model=self.settings.embedding_model,
+        self.query_slots = asyncio.Semaphore(self.settings.max_concurrent_queries)
+        self.batch_llm_slots = asyncio.Semaphore(self.settings.batch_llm_concurrency)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.settings.llm_max_connections,
+                max_keepalive_connections=self.settings.llm_max_connections,
+            ),
+            timeout=httpx.Timeout(self.settings.llm_timeout_seconds),
         )
         self.llm_client: Optional[LLMClient] = None
         if self.settings.openai_api_key:
-            self.llm_client = LLMClient(
-                api_key=self.settings.openai_api_key,
-                model=self.settings.openai_model,
-                temperature=self.settings.temperature,
-                max_tokens=self.settings.max_answer_tokens,
+            self.reload_llm()
+        # Models and Chroma load lazily; without a warm-up the first request pays for them.
+        self.readiness = Readiness(status="starting" if self.settings.warmup_enabled else "ready")
+        self.metrics = RAGMetrics(enabled=self.settings.metrics_enabled)
+        self._register_gauges()
+
+    def _register_gauges(self) -> None:
+        registry = self.metrics.registry
+        registry.gauge("rag_ready", "1 once warm-up finished (see /ready).", lambda: {(): float(self.readiness.ready)})
+        registry.gauge(
+            "rag_collection_active_users",
+            "Requests using each collection loaded in memory.",
+            lambda: {(name,): users for name, users in self.collections.open_collections().items()},
+            ["collection"],
+        )
+        registry.callback_counter(
+            "rag_embedded_texts_total",
+            "Texts embedded since startup.",
+            lambda: {(): self.embedder.embedded_texts},
+        )
+        registry.callback_counter(
+            "rag_embedding_encode_seconds_total",
+            "Time spent in the embedding model since startup.",
+            lambda: {(): self.embedder.encode_seconds},
+        )
+        registry.callback_counter(
+            "rag_query_embedding_cache_lookups_total",
+            "Query embedding cache lookups since startup.",
+            lambda: {("hit",): self.embedder.query_cache_hits, ("miss",): self.embedder.query_cache_misses},
+            ["result"],
+        )
+
+    def _create_embedder(self) -> EmbeddingService:
+        settings = self.settings
+        options = dict(
+            model_name=settings.embedding_model,
+            batch_size=settings.embedding_batch_size,
+            normalize=settings.embedding_normalize,
+            use_prefixes=settings.embedding_prefixes,
+            query_cache_size=settings.query_embedding_cache_size,
+            batch_window_ms=settings.embedding_batch_window_ms,
+            max_query_batch=settings.embedding_max_query_batch,
+        )
+        if settings.embedding_server_url:
+            return RemoteEmbeddingService(
+                settings.embedding_server_url, timeout=settings.embedding_server_timeout_seconds, **options
             )
+        return EmbeddingService(num_threads=settings.embedding_threads, device=settings.embedding_device, **options)
+
+    def warm_up(self) -> Readiness:
+        """Load the models and open the default collection so the first queries are fast.
+
+        Blocking; the app runs it once in the background at startup. The time
+        spent on each component is recorded in ``readiness.components``.
+        """
+        steps: List[Tuple[str, Callable[[], object]]] = [
+            ("embedding_model", lambda: self.embedder.model),
+            ("embedding", lambda: self.embedder.embed_queries([WARMUP_QUERY])),
+            ("tokenizer", lambda: self.context_builder.counter.count(WARMUP_QUERY)),
+            ("collection", self._warm_up_collection),
+        ]
+        if self.reranker:
+            steps.append(("reranker", lambda: self.reranker.model))
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception as exc:  # noqa: BLE001 - reported through /ready
+                self.readiness.status = "failed"
+                self.readiness.error = f"{name}: {exc}"
+                return self.readiness
+            self.readiness.components[name] = round(time.perf_counter() - started, 3)
+        self.readiness.status = "ready"
+        return self.readiness
+
+    def _warm_up_collection(self) -> None:
+        # A search loads the HNSW segment and the BM25 index, not just the collection handle.
+        with self.collections.use() as kb:
+            kb.vector_store.similarity_search(WARMUP_QUERY, top_k=1, mode=self.settings.retrieval_mode)
 
     def reload_llm(self) -> None:
         """Instantiate the OpenAI client if the key became available later."""
@@ -91,67 +282,992 @@ class RAGService:
             model=self.settings.openai_model,
             temperature=self.settings.temperature,
             max_tokens=self.settings.max_answer_tokens,
+            http_client=self.http_client,
         )
 
-    def _resolve_targets(self, requested: Optional[Iterable[str]]) -> List[Path]:
+    async def aclose(self) -> None:
+        """Persist the answer caches and release connections and worker threads."""
+        self.collections.close_all()
+        await self.http_client.aclose()
+        self.query_executor.shutdown(wait=False)
+
+    async def _run_blocking(self, func: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.query_executor, partial(func, *args))
+
+    @asynccontextmanager
+    async def _use(self, collection: Optional[str]) -> AsyncIterator[KnowledgeBase]:
+        """:meth:`CollectionManager.use` for the event loop: opening and refreshing run in a worker thread."""
+        kb = await self._run_blocking(self.collections.acquire, collection)
+        try:
+            yield kb
+        finally:
+            await self._run_blocking(self.collections.release, kb)
+
+    def _resolve_targets(self, kb: KnowledgeBase, requested: Optional[Iterable[str]]) -> List[Path]:
         if not requested:
-            return discover_documents(self.settings.source_dir)
+            return discover_documents(kb.source_dir)
         resolved_paths: List[Path] = []
         for raw_path in requested:
             candidate = Path(raw_path)
             if not candidate.is_absolute():
-                candidate = (self.settings.source_dir / candidate).resolve()
+                candidate = (kb.source_dir / candidate).resolve()
             if candidate.is_file():
                 resolved_paths.append(candidate)
         return resolved_paths
 
-    def ingest(self, requested_paths: Optional[Iterable[str]] = None) -> Dict[str, int]:
-        """Load documents, chunk, and store them into the vector database."""
+    def ingest(
+        self,
+        requested_paths: Optional[Iterable[str]] = None,
+        progress: Optional[IngestProgress] = None,
+        tags: Optional[Iterable[str]] = None,
+        collection: Optional[str] = None,
+    ) -> Dict:
+        """Embed new or changed documents of ``collection`` and drop chunks of removed ones.
+
+        The collection is created on first ingest; see :meth:`_ingest`. Reader
+        workers refuse: only the writer process ingests.
+        """
+        self._check_writer()
+        with self.collections.use(collection, create=True) as kb:
+            started = time.perf_counter()
+            try:
+                stats = self._ingest(kb, requested_paths, progress, tags)
+            except IngestCancelled:
+                self.metrics.ingest_runs.inc(collection=kb.name, outcome="cancelled")
+                raise
+            except Exception:
+                self.metrics.ingest_runs.inc(collection=kb.name, outcome="error")
+                raise
+            self._observe_ingest(kb, stats, time.perf_counter() - started)
+            return stats
+
+    def store_uploads(self, uploads: List[ReceivedUpload], collection: Optional[str] = None) -> List[ReceivedUpload]:
+        """Move received uploads into the source directory of ``collection``.
+
+        An upload whose content hash matches a file already ingested into the
+        collection, a file waiting at its destination, or an earlier upload of
+        the same request is discarded and marked with ``duplicate_of``; the
+        others get their final ``path``.
+        """
+        with self.collections.use(collection, create=True) as kb:
+            known = {
+                record.content_hash: record.path
+                for record in list(kb.manifest.records.values())
+                if Path(record.path).is_file()
+            }
+            for upload in uploads:
+                destination = kb.source_dir / upload.filename
+                duplicate_of = known.get(upload.sha256)
+                if duplicate_of is None and destination.is_file() and destination.stat().st_size == upload.size:
+                    if hash_file(destination) == upload.sha256:
+                        duplicate_of = str(destination)
+                if duplicate_of is not None:
+                    upload.duplicate_of = duplicate_of
+                    upload.discard()
+                    continue
+                os.replace(upload.temp_path, destination)
+                upload.path = str(destination)
+                known[upload.sha256] = upload.path
+        return uploads
+
+    # Maintenance. Callers keep ingest jobs out of the collection meanwhile
+    # (``IngestJobManager.exclusive``); queries keep running.
+
+    def delete_documents(
+        self,
+        collection: Optional[str] = None,
+        sources: Iterable[str] = (),
+        paths: Iterable[str] = (),
+        remove_files: bool = True,
+    ) -> Dict:
+        """Delete the chunks and manifest records of documents, and by default their source files.
+
+        ``sources`` are file names (matching the file in every folder),
+        ``paths`` are absolute or relative to the source directory. Chunks are
+        matched by their ``source`` / ``path`` metadata, so copies the manifest
+        does not know about are removed as well.
+        """
+        self._check_writer()
+        with self.collections.use(collection) as kb:
+            return self._maintain(kb, "delete", lambda: self._delete_documents(kb, sources, paths, remove_files))
+
+    def _delete_documents(
+        self, kb: KnowledgeBase, sources: Iterable[str], paths: Iterable[str], remove_files: bool
+    ) -> Dict:
+        names = set(sources)
+        targets = set()
+        for raw_path in paths:
+            candidate = Path(raw_path)
+            targets.add(str(candidate if candidate.is_absolute() else (kb.source_dir / candidate).resolve()))
+        conditions = []
+        if names:
+            conditions.append({"source": {"$in": sorted(names)}})
+        if targets:
+            conditions.append({"path": {"$in": sorted(targets)}})
+        where = conditions[0] if len(conditions) == 1 else {"$or": conditions}
+        deleted_chunks = kb.vector_store.delete_where(where)
+        records = [
+            record
+            for record in list(kb.manifest.records.values())
+            if record.path in targets or Path(record.path).name in names
+        ]
+        for record in records:
+            kb.manifest.forget(record.path)
+        kb.vector_store.remove_documents({record.path for record in records} | targets)
+        removed_files: List[str] = []
+        if remove_files:
+            source_root = kb.source_dir.resolve()
+            for file_path in sorted({Path(record.path) for record in records} | {Path(path) for path in targets}):
+                # Only files inside the collection's source directory are ever removed.
+                if file_path.is_file() and file_path.resolve().is_relative_to(source_root):
+                    file_path.unlink()
+                    removed_files.append(str(file_path))
+        kb.vector_store.commit()
+        kb.manifest.save()
+        if deleted_chunks or records:
+            self._publish_write(kb)
+        return {"deleted_files": len(records), "deleted_chunks": deleted_chunks, "removed_files": removed_files}
+
+    def remove_duplicates(self, collection: Optional[str] = None, dry_run: bool = False) -> Dict:
+        """Delete chunks whose text exactly repeats another chunk of the collection, keeping one copy.
+
+        With ``dry_run`` the duplicates are only counted.
+        """
+        self._check_writer()
+        with self.collections.use(collection) as kb:
+
+            def run() -> Dict:
+                duplicates = kb.vector_store.duplicate_ids()
+                deleted = 0
+                if duplicates and not dry_run:
+                    deleted = kb.vector_store.delete_ids(duplicates)
+                    kb.vector_store.commit()
+                    self._publish_write(kb)
+                return {"duplicate_chunks": len(duplicates), "deleted_chunks": deleted}
+
+            return self._maintain(kb, "dedup", run)
+
+    def compact(self, collection: Optional[str] = None) -> Dict:
+        """Rewrite the vector, SQLite and lexical index files without deleted chunks.
+
+        PDF page texts of files no longer in the manifest are dropped as well.
+        """
+        self._check_writer()
+        with self.collections.use(collection) as kb:
+
+            def run() -> Dict:
+                kb.vector_store.compact()
+                if kb.loader.pdf_cache is not None:
+                    kb.loader.pdf_cache.prune(record.content_hash for record in kb.manifest.records.values())
+                # Same chunks, new files: readers reopen the lexical index, cached answers stay valid.
+                self._publish_write(kb, answers_changed=False)
+                return {}
+
+            return self._maintain(kb, "compact", run)
+
+    def snapshot(
+        self,
+        exclusive: Callable[[str], ContextManager],
+        collections: Optional[Iterable[str]] = None,
+    ) -> Dict:
+        """Copy the stores of ``collections`` (default: all) into a new directory under ``snapshot_dir``.
+
+        Each collection is copied while ``exclusive(name)`` keeps its ingest
+        jobs out; queries go on. The snapshot mirrors the data directories
+        (``vector_store/`` and ``collections/``), so restoring it is a copy
+        back with the server stopped. Only the newest ``snapshot_retention``
+        snapshots are kept.
+        """
+        self._check_writer()
+        started = time.perf_counter()
+        names = (
+            sorted({self.collections.resolve_name(name) for name in collections})
+            if collections
+            else self.collections.names()
+        )
+        created_at = datetime.now(timezone.utc)
+        snapshot_dir = self.settings.snapshot_dir
+        final = snapshot_dir / f"{SNAPSHOT_PREFIX}{created_at:%Y%m%dT%H%M%S%fZ}"
+        partial_dir = snapshot_dir / f".{final.name}.partial"
+        roots = {"vector_store": self.settings.vector_store_dir, "collections": self.settings.collections_dir}
+
+        def target(path: Path) -> Path:
+            for label, root in roots.items():
+                if path.is_relative_to(root):
+                    return partial_dir / label / path.relative_to(root)
+            raise ValueError(f"{path} is outside the data directories")
+
+        partial_dir.mkdir()
+        try:
+            for name in names:
+                with exclusive(name), self.collections.use(name) as kb:
+                    kb.vector_store.snapshot(target)
+                    for file_name in (MANIFEST_FILENAME, INDEX_VERSION_FILENAME):
+                        path = kb.store_dir / file_name
+                        if path.exists():
+                            target(path).parent.mkdir(parents=True, exist_ok=True)
+                            shutil.copy2(path, target(path))
+            info = {
+                "created_at": created_at.isoformat(),
+                "collections": names,
+                "vector_backend": self.settings.vector_backend,
+                "embedding_model": self.embedder.model_name,
+            }
+            (partial_dir / SNAPSHOT_INFO_FILENAME).write_text(json.dumps(info, ensure_ascii=False), encoding="utf-8")
+            os.replace(partial_dir, final)
+        except BaseException:
+            shutil.rmtree(partial_dir, ignore_errors=True)
+            raise
+        removed = self._prune_snapshots()
+        return {
+            "path": str(final),
+            "collections": names,
+            "bytes_written": path_size(final),
+            "removed_snapshots": removed,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _prune_snapshots(self) -> List[str]:
+        keep = self.settings.snapshot_retention
+        snapshots = sorted(path for path in self.settings.snapshot_dir.glob(f"{SNAPSHOT_PREFIX}*") if path.is_dir())
+        if keep <= 0 or len(snapshots) <= keep:
+            return []
+        removed = snapshots[: len(snapshots) - keep]
+        for path in removed:
+            shutil.rmtree(path, ignore_errors=True)
+        return [str(path) for path in removed]
+
+    def export_embeddings(self, collection: Optional[str] = None, dtype: str = "float32") -> Dict:
+        """Write the chunks, metadata and embeddings of a collection to a new bundle under ``export_dir``.
+
+        Paths in the chunk metadata and manifest records are stored relative
+        to the collection's source directory, so the bundle can be imported on
+        a server with another data directory. The caller keeps ingest jobs out
+        for the duration.
+        """
+        started = time.perf_counter()
+        with self.collections.use(collection) as kb:
+            created_at = datetime.now(timezone.utc)
+            final = self.settings.export_dir / f"{kb.name}-{created_at:%Y%m%dT%H%M%S%fZ}"
+            partial_dir = final.parent / f".{final.name}.partial"
+            source_root = kb.source_dir.resolve()
+            relative_paths: Dict[str, str] = {}
+
+            def relative(path: str) -> str:
+                if path not in relative_paths:
+                    try:
+                        relative_paths[path] = Path(path).resolve().relative_to(source_root).as_posix()
+                    except ValueError:  # outside the source directory: kept as is
+                        relative_paths[path] = path
+                return relative_paths[path]
+
+            def pages():
+                for ids, documents, metadatas, embeddings in kb.vector_store.iter_records():
+                    for metadata in metadatas:
+                        if "path" in metadata:
+                            metadata["path"] = relative(str(metadata["path"]))
+                    yield ids, documents, metadatas, embeddings
+
+            info = BundleInfo(
+                collection=kb.name,
+                created_at=created_at.isoformat(),
+                embedding_model=self.embedder.model_name,
+                embedding_signature=self.embedder.signature,
+                chunker_signature=kb.loader.signature,
+                count=kb.vector_store.count(),
+                dtype=dtype,
+                # The document key is kept because chunk IDs were derived from the original path.
+                files=[
+                    {**asdict(record), "path": relative(record.path), "document_key": record.document_key}
+                    for record in kb.manifest.records.values()
+                ],
+            )
+            try:
+                write_bundle(partial_dir, info, pages())
+                os.replace(partial_dir, final)
+            except BaseException:
+                shutil.rmtree(partial_dir, ignore_errors=True)
+                raise
+        return {
+            "path": str(final),
+            "collection": kb.name,
+            "embedding_model": info.embedding_model,
+            "chunks": info.count,
+            "files": len(info.files),
+            "bytes_written": path_size(final),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def import_embeddings(self, bundle: str, collection: Optional[str] = None) -> Dict:
+        """Load a bundle written by :meth:`export_embeddings` into a collection without embedding anything.
+
+        ``bundle`` is a directory under ``export_dir``. Bundles made with another
+        embedding model (or other prefix/normalization settings) are refused
+        with :class:`BundleError`. Chunks are upserted, relative paths are
+        placed under the collection's source directory and the files are
+        recorded in the manifest, so a later ingest skips source files whose
+        content matches. Files chunked with other chunk settings are recorded
+        so that they are chunked and embedded again by the next ingest.
+        """
+        self._check_writer()
+        started = time.perf_counter()
+        export_root = self.settings.export_dir.resolve()
+        directory = (export_root / bundle).resolve()
+        if not directory.is_relative_to(export_root) or directory == export_root:
+            raise BundleError(f"bundle must name a directory under {export_root}")
+        info = read_bundle_info(directory)
+        if info.embedding_model != self.settings.embedding_model:
+            raise BundleError(
+                f"bundle was embedded with {info.embedding_model}, this server uses {self.settings.embedding_model}"
+            )
+        if info.embedding_signature != self.embedder.signature:
+            raise BundleError(
+                f"bundle embedding settings ({info.embedding_signature}) differ from this server's "
+                f"({self.embedder.signature})"
+            )
+        with self.collections.use(collection, create=True) as kb:
+            return self._import_embeddings(kb, directory, info, started)
+
+    def _import_embeddings(self, kb: KnowledgeBase, directory: Path, info: BundleInfo, started: float) -> Dict:
+        def absolute(path: str) -> str:
+            return path if Path(path).is_absolute() else str(kb.source_dir / path)
+
+        # Chunk IDs embed the file path (see ``document_key``), so they follow the file to its new place.
+        signature = kb.manifest.embedding_signature
+        if info.chunker_signature != kb.loader.signature:
+            signature = f"{info.embedding_signature}|chunker={info.chunker_signature}|imported"
+        renamed: Dict[str, str] = {}
+        records: List[FileRecord] = []
+        for item in info.files:
+            item = dict(item)
+            original_key = item.pop("document_key", None)
+            record = FileRecord(**{**item, "path": absolute(item["path"]), "embedding_signature": signature})
+            if original_key:
+                renamed[original_key] = record.document_key
+            records.append(record)
+        deleted_chunks = 0
+        for record in records:
+            previous = kb.manifest.get(Path(record.path))
+            if previous is not None and previous.document_key != record.document_key:
+                deleted_chunks += kb.vector_store.delete_ids(previous.chunk_ids())
+
+        sums: Dict[str, np.ndarray] = {}
+        imported = 0
+        for ids, documents, metadatas, embeddings in iter_bundle(directory, info, self.settings.write_batch_size):
+            chunks = []
+            for old_id, document, metadata in zip(ids, documents, metadatas):
+                key, _, index = old_id.rpartition(":")
+                if key in renamed:
+                    old_id = chunk_id(renamed[key], int(index))
+                if "path" in metadata:
+                    metadata["path"] = absolute(str(metadata["path"]))
+                chunks.append(DocumentChunk(content=document, metadata=metadata, id=old_id))
+            imported += kb.vector_store.add_chunks(chunks, embeddings=embeddings.tolist())
+            add_to_sums(sums, metadatas, embeddings)
+        for path, total in sums.items():
+            kb.vector_store.index_document(path, [total])
+        for record in records:
+            kb.manifest.records[record.path] = record
+        kb.vector_store.commit()
+        kb.manifest.save()
+        if imported or deleted_chunks:
+            self._publish_write(kb)
+        return {
+            "path": str(directory),
+            "collection": kb.name,
+            "embedding_model": info.embedding_model,
+            "chunks": imported,
+            "files": len(records),
+            "deleted_chunks": deleted_chunks,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _maintain(self, kb: KnowledgeBase, operation: str, run: Callable[[], Dict]) -> Dict:
+        """Run one maintenance operation, reporting its duration and the store bytes it gave back."""
+        started = time.perf_counter()
+        bytes_before = self._store_bytes(kb)
+        stats = run()
+        bytes_after = self._store_bytes(kb)
+        return {
+            "operation": operation,
+            "collection": kb.name,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_reclaimed": bytes_before - bytes_after,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            **stats,
+        }
+
+    @staticmethod
+    def _store_bytes(kb: KnowledgeBase) -> int:
+        total = kb.vector_store.disk_usage()
+        if kb.loader.pdf_cache is not None:
+            total += path_size(kb.loader.pdf_cache.directory)
+        return total
+
+    def _publish_write(self, kb: KnowledgeBase, answers_changed: bool = True) -> None:
+        """Make a committed change visible: drop stale cached answers and notify reader workers."""
+        if answers_changed and kb.answer_cache:
+            kb.answer_cache.invalidate()
+        # Tells reader workers to reload the BM25 index and drop their answer caches.
+        kb.index_version.bump()
+
+    def _check_writer(self) -> None:
+        if self.settings.process_role == "reader":
+            raise RuntimeError("reader workers do not write; send ingest and maintenance requests to the writer process")
+
+    def _observe_ingest(self, kb: KnowledgeBase, stats: Dict, seconds: float) -> None:
+        metrics = self.metrics
+        if not metrics.enabled:
+            return
+        metrics.ingest_runs.inc(collection=kb.name, outcome="completed")
+        metrics.ingest_seconds.observe(seconds)
+        for stage, stage_seconds in stats["stage_seconds"].items():
+            metrics.ingest_stage_seconds.observe(stage_seconds, stage=stage)
+        metrics.ingested_files.inc(stats["ingested_files"], collection=kb.name)
+        metrics.failed_files.inc(stats["failed_files"], collection=kb.name)
+        metrics.ingested_chunks.inc(stats["ingested_chunks"], collection=kb.name)
+        metrics.deleted_chunks.inc(stats["deleted_chunks"], collection=kb.name)
+
+    def _ingest(
+        self,
+        kb: KnowledgeBase,
+        requested_paths: Optional[Iterable[str]],
+        progress: Optional[IngestProgress],
+        tags: Optional[Iterable[str]],
+    ) -> Dict:
+        """Embed new or changed documents and drop chunks of removed ones.
+
+        Files are compared with the ingest manifest; unchanged files are skipped
+        entirely. A full scan (no paths requested) also deletes the chunks of
+        files that disappeared from the source directory. Changed files are
+        streamed through the ingest pipeline; ``progress`` is notified per file
+        and may cancel the run between files.
+
+        ``tags`` replace the tags of the targeted files (files whose tags change
+        are re-ingested); without it, files keep the tags recorded in the
+        manifest. Every chunk carries ``tag_<name>: True`` per tag and an
+        ``ingested_at`` epoch timestamp for filtered retrieval.
+        """
+        progress = progress or IngestProgress()
         requested_list = list(requested_paths) if requested_paths else None
-        targets = self._resolve_targets(requested_list)
-        chunks = self.loader.load(targets)
-        stored = self.vector_store.add_chunks(chunks)
+        normalized_tags: Optional[List[str]] = None
+        if tags is not None:
+            normalized_tags = sorted({normalize_tag(tag) for tag in tags} - {""})
+        targets = self._resolve_targets(kb, requested_list)
+        plan = kb.manifest.plan(targets, full_scan=requested_list is None, tags=normalized_tags)
+        ingested_at = int(time.time())
+        deleted_chunks = 0
+
+        def file_tags(file_path: Path) -> List[str]:
+            if normalized_tags is not None:
+                return normalized_tags
+            previous = kb.manifest.get(file_path)
+            return previous.tags if previous is not None else []
+
+        if kb.vector_store.lexical_index_missing():
+            kb.vector_store.rebuild_lexical_index()
+        if kb.vector_store.document_index_missing():
+            kb.vector_store.rebuild_document_index()
+
+        def prepare(file_path: Path, chunks: List[DocumentChunk], first_index: int) -> None:
+            nonlocal deleted_chunks
+            progress.check_cancelled()
+            key = document_key(str(file_path), plan.hashes[str(file_path)])
+            tag_metadata = {tag_key(tag): True for tag in file_tags(file_path)}
+            for index, chunk in enumerate(chunks, start=first_index):
+                chunk.id = chunk_id(key, index)
+                chunk.metadata.update(tag_metadata, ingested_at=ingested_at)
+            if first_index == 0 and kb.manifest.get(file_path) is None:
+                # Purge copies written before the manifest existed (random IDs).
+                deleted_chunks += kb.vector_store.delete_where({"path": str(file_path)})
+
+        def on_file_done(file_path: Path, chunk_count: int) -> None:
+            nonlocal deleted_chunks
+            previous = kb.manifest.get(file_path)
+            if previous is not None:
+                key = document_key(str(file_path), plan.hashes[str(file_path)])
+                new_ids = {chunk_id(key, index) for index in range(chunk_count)}
+                stale = [item for item in previous.chunk_ids() if item not in new_ids]
+                deleted_chunks += kb.vector_store.delete_ids(stale)
+            kb.manifest.record(file_path, plan.hashes[str(file_path)], chunk_count, file_tags(file_path))
+            progress.file_done(file_path, chunk_count)
+
+        changed = plan.added + plan.updated
+        progress.start(changed)
+        try:
+            pipeline_stats = kb.pipeline.run(changed, prepare, on_file_done, progress.file_failed, plan.hashes)
+            progress.check_cancelled()
+            for record in plan.removed:
+                deleted_chunks += kb.vector_store.delete_ids(record.chunk_ids())
+                kb.manifest.forget(record.path)
+            kb.vector_store.remove_documents(record.path for record in plan.removed)
+            if requested_list is None and kb.loader.pdf_cache is not None:
+                kb.loader.pdf_cache.prune(record.content_hash for record in kb.manifest.records.values())
+        finally:
+            # Files that finished before a cancellation or error stay recorded.
+            kb.vector_store.commit()
+            kb.manifest.save()
+            if changed or plan.removed or deleted_chunks:
+                self._publish_write(kb)
         return {
-            "ingested_files": len(targets),
-            "ingested_chunks": stored,
+            "ingested_files": pipeline_stats.files,
+            "ingested_chunks": pipeline_stats.chunks,
             "skipped_files": max(len(requested_list or []) - len(targets), 0),
+            "added_files": len(plan.added),
+            "updated_files": len(plan.updated),
+            "unchanged_files": len(plan.unchanged),
+            "deleted_files": len(plan.removed),
+            "deleted_chunks": deleted_chunks,
+            **pipeline_stats.as_dict(),
         }
 
-    def query(self, question: str, top_k: Optional[int] = None) -> Dict:
-        """Answer a user question by retrieving supporting documents and generating an answer."""
-        if not question.strip():
-            raise ValueError("question must not be empty")
-        if not self.llm_client:
-            raise RuntimeError("OpenAI API key is not configured")
-        k = top_k or self.settings.top_k
-        retrieved = self.vector_store.similarity_search(question, k)
-        if not retrieved:
-            return {
-                "question": question,
-                "answer": "関連する文書を見つけられませんでした。",
-                "prompt": "",
-                "sources": [],
-            }
-        context_lines = []
+    def _build_prompt(
+        self,
+        kb: KnowledgeBase,
+        question: str,
+        retrieved: List[Dict],
+        timings: Dict[str, float],
+    ) -> Tuple[str, List[RetrievedDocument]]:
+        """Fit the retrieved chunks into the context token budget and format the prompt.
+
+        Only chunks that made it into the context are returned as sources. The
+        time taken is recorded as ``prompt_ms`` in ``timings``.
+        """
+        started = time.perf_counter()
+        context = self.context_builder.build(retrieved)
         normalized_sources: List[RetrievedDocument] = []
-        for item in retrieved:
+        for item in context.documents:
             metadata = item.get("metadata") or {}
-            label = f"{metadata.get('source')}:{metadata.get('chunk_index')}"
-            context_lines.append(f"[{label}] {item['content']}")
             normalized_sources.append(
                 RetrievedDocument(
                     id=item.get("id", ""),
                     content=item["content"],
                     metadata=metadata,
                     score=item.get("score"),
+                    rerank_score=item.get("rerank_score"),
                 )
             )
-        context_block = "\n".join(context_lines)
-        prompt = PROMPT_TEMPLATE.format(context=context_block, question=question)
-        answer = self.llm_client.generate(prompt)
+        prompt = PROMPT_TEMPLATE.format(context=context.context, question=question)
+        timings["prompt_ms"] = _elapsed_ms(started)
+        self.metrics.context_chunks.inc(len(context.documents), collection=kb.name)
+        self.metrics.context_tokens.inc(context.tokens, collection=kb.name)
+        return prompt, normalized_sources
+
+    def _retrieve(
+        self,
+        kb: KnowledgeBase,
+        question: str,
+        k: int,
+        where: Optional[Dict] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> Tuple[Sequence[float], List[Dict], Dict[str, float]]:
+        """Embed the question, search, and optionally rerank.
+
+        With reranking enabled, ``rerank_candidates`` results are fetched and the
+        cross-encoder keeps the best ``k``. ``where`` restricts the search to
+        chunks whose metadata matches (a Chroma filter, see
+        :class:`~app.filters.SearchFilter`). ``cutoff`` (the configured one
+        when omitted) drops chunks too far from the question, so fewer than
+        ``k`` or none may come back. Returns the question embedding, the
+        chunks and per-stage timings in milliseconds.
+        """
+        started = time.perf_counter()
+        embedding = kb.vector_store.embed_query(question)
+        return self._search(kb, [question], [embedding], k, _elapsed_ms(started), where, cutoff)[0]
+
+    def _retrieve_batch(
+        self,
+        kb: KnowledgeBase,
+        questions: List[str],
+        k: int,
+        where: Optional[Dict] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> List[Tuple[Sequence[float], List[Dict], Dict[str, float]]]:
+        """:meth:`_retrieve` for many questions: one embedding batch and one multi-query search.
+
+        ``embed_ms`` and ``search_ms`` are the shared batch times.
+        """
+        started = time.perf_counter()
+        embeddings = kb.vector_store.embed_queries(questions)
+        return self._search(kb, questions, embeddings, k, _elapsed_ms(started), where, cutoff)
+
+    def _search(
+        self,
+        kb: KnowledgeBase,
+        questions: List[str],
+        embeddings: Sequence[Sequence[float]],
+        k: int,
+        embed_ms: float,
+        where: Optional[Dict] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> List[Tuple[Sequence[float], List[Dict], Dict[str, float]]]:
+        fetch = max(self.settings.rerank_candidates, k) if self.reranker else k
+        started = time.perf_counter()
+        results = kb.vector_store.similarity_search_batch(
+            questions,
+            fetch,
+            query_embeddings=embeddings,
+            mode=self.settings.retrieval_mode,
+            candidates=max(self.settings.hybrid_candidates, fetch),
+            where=where,
+            documents=self.settings.two_tier_documents,
+            cutoff=cutoff or self.score_cutoff(),
+        )
+        search_ms = _elapsed_ms(started)
+        # Batches share one embedding call and one search; each is observed once.
+        self.metrics.query_stage_seconds.observe(embed_ms / 1000, stage="embed")
+        self.metrics.query_stage_seconds.observe(search_ms / 1000, stage="search")
+        searched = []
+        for question, embedding, retrieved in zip(questions, embeddings, results):
+            timings = {"embed_ms": embed_ms, "search_ms": search_ms}
+            if self.reranker and len(retrieved) > 1:
+                result = self.reranker.rerank(question, retrieved, k, self.settings.rerank_budget_ms)
+                retrieved = result.documents
+                timings["rerank_ms"] = round(result.elapsed_ms, 1)
+                self.metrics.query_stage_seconds.observe(result.elapsed_ms / 1000, stage="rerank")
+            self.metrics.retrieved_chunks.inc(min(len(retrieved), k), collection=kb.name)
+            searched.append((embedding, retrieved[:k], timings))
+        return searched
+
+    def score_cutoff(
+        self,
+        min_k: Optional[int] = None,
+        max_distance: Optional[float] = None,
+        score_gap: Optional[float] = None,
+    ) -> ScoreCutoff:
+        """The retrieval cutoff of the settings, with any of its values overridden."""
+        return ScoreCutoff(
+            max_distance=self.settings.max_distance if max_distance is None else max_distance,
+            score_gap=self.settings.score_gap if score_gap is None else score_gap,
+            min_k=self.settings.min_k if min_k is None else min_k,
+        )
+
+    def _cache_lookup(self, kb: KnowledgeBase, embedding: Sequence[float], retrieved: List[Dict]) -> Optional[Dict]:
+        if not kb.answer_cache:
+            return None
+        cached = kb.answer_cache.lookup(embedding, [item.get("id", "") for item in retrieved])
+        self.metrics.answer_cache_lookups.inc(collection=kb.name, result="miss" if cached is None else "hit")
+        if cached is None:
+            return None
+        return {
+            "answer": cached["answer"],
+            "prompt": cached["prompt"],
+            "sources": [RetrievedDocument(**source) for source in cached["sources"]],
+        }
+
+    def _cache_store(
+        self,
+        kb: KnowledgeBase,
+        question: str,
+        embedding: Sequence[float],
+        retrieved: List[Dict],
+        answer: str,
+        prompt: str,
+        sources: List[RetrievedDocument],
+    ) -> None:
+        if not kb.answer_cache:
+            return
+        kb.answer_cache.store(
+            question,
+            embedding,
+            [item.get("id", "") for item in retrieved],
+            {"answer": answer, "prompt": prompt, "sources": [vars(doc) for doc in sources]},
+        )
+
+    def _observe_query(
+        self,
+        kind: str,
+        kb: KnowledgeBase,
+        outcome: str,
+        timings: Optional[Dict[str, float]] = None,
+        answer: Optional[str] = None,
+    ) -> None:
+        """Record a finished question; ``kind`` is ``query``, ``stream`` or ``batch``."""
+        metrics = self.metrics
+        if not metrics.enabled:
+            return
+        metrics.queries.inc(kind=kind, collection=kb.name, outcome=outcome)
+        timings = timings or {}
+        for stage in ("prompt", "generation", "first_token"):
+            if f"{stage}_ms" in timings:
+                metrics.query_stage_seconds.observe(timings[f"{stage}_ms"] / 1000, stage=stage)
+        if "total_ms" in timings:
+            metrics.query_seconds.observe(timings["total_ms"] / 1000, kind=kind)
+        if answer:
+            metrics.answer_tokens.inc(self.context_builder.counter.count(answer), collection=kb.name)
+
+    def _check_query(self, question: str) -> None:
+        if not question.strip():
+            raise ValueError("question must not be empty")
+        if not self.llm_client:
+            raise RuntimeError("OpenAI API key is not configured")
+
+    async def query(
+        self,
+        question: str,
+        top_k: Optional[int] = None,
+        where: Optional[Dict] = None,
+        collection: Optional[str] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> Dict:
+        """Answer a question from ``collection`` (the default collection when omitted).
+
+        ``top_k`` is the most chunks retrieved; ``cutoff`` (see
+        :meth:`score_cutoff`) drops those too far from the question.
+        Raises :class:`CollectionNotFound` for a collection that was never ingested.
+        """
+        async with self._use(collection) as kb:
+            try:
+                return await self._query(kb, question, top_k, where, cutoff)
+            except Exception:
+                self._observe_query("query", kb, "error")
+                raise
+
+    async def _query(
+        self,
+        kb: KnowledgeBase,
+        question: str,
+        top_k: Optional[int],
+        where: Optional[Dict],
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> Dict:
+        """Answer a user question by retrieving supporting documents and generating an answer.
+
+        At most ``max_concurrent_queries`` questions are processed at once;
+        retrieval runs on the query executor and the LLM call is awaited. A
+        semantic cache hit skips the LLM call, and so does a question no chunk
+        is close enough to (answered with ``NO_DOCUMENTS_ANSWER``).
+        """
+        self._check_query(question)
+        k = top_k or self.settings.top_k
+        started = time.perf_counter()
+        async with self.query_slots:
+            embedding, retrieved, timings = await self._run_blocking(self._retrieve, kb, question, k, where, cutoff)
+            if not retrieved:
+                timings["total_ms"] = _elapsed_ms(started)
+                self._observe_query("query", kb, "no_documents", timings)
+                return {
+                    "question": question,
+                    "answer": NO_DOCUMENTS_ANSWER,
+                    "prompt": "",
+                    "sources": [],
+                    "cached": False,
+                    "timings": timings,
+                }
+            cached = self._cache_lookup(kb, embedding, retrieved)
+            if cached:
+                timings["total_ms"] = _elapsed_ms(started)
+                self._observe_query("query", kb, "cached", timings)
+                return {"question": question, **cached, "cached": True, "timings": timings}
+            prompt, normalized_sources = self._build_prompt(kb, question, retrieved, timings)
+            generation_started = time.perf_counter()
+            answer = (await self.llm_client.generate(prompt)).strip()
+            timings["generation_ms"] = _elapsed_ms(generation_started)
+        self._cache_store(kb, question, embedding, retrieved, answer, prompt, normalized_sources)
+        timings["total_ms"] = _elapsed_ms(started)
+        self._observe_query("query", kb, "answered", timings, answer)
         return {
             "question": question,
-            "answer": answer.strip(),
+            "answer": answer,
             "prompt": prompt,
             "sources": normalized_sources,
+            "cached": False,
+            "timings": timings,
         }
+
+    async def stream_query(
+        self,
+        question: str,
+        top_k: Optional[int] = None,
+        where: Optional[Dict] = None,
+        collection: Optional[str] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """:meth:`_stream_query` on ``collection``; the collection stays open until the stream ends."""
+        async with self._use(collection) as kb:
+            try:
+                async for event in self._stream_query(kb, question, top_k, where, cutoff):
+                    yield event
+            except Exception:
+                self._observe_query("stream", kb, "error")
+                raise
+
+    async def _stream_query(
+        self,
+        kb: KnowledgeBase,
+        question: str,
+        top_k: Optional[int],
+        where: Optional[Dict],
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """Answer a question as a sequence of ``(event, data)`` pairs.
+
+        Emits ``sources`` once retrieval finishes, one ``token`` per answer
+        delta, and ``done`` with the prompt and stage timings in milliseconds.
+        Validation errors are raised before the first event.
+        """
+        self._check_query(question)
+        k = top_k or self.settings.top_k
+        started = time.perf_counter()
+        async with self.query_slots:
+            embedding, retrieved, timings = await self._run_blocking(self._retrieve, kb, question, k, where, cutoff)
+            timings["retrieval_ms"] = _elapsed_ms(started)
+            cached = self._cache_lookup(kb, embedding, retrieved) if retrieved else None
+            if cached:
+                prompt, normalized_sources = cached["prompt"], cached["sources"]
+            elif retrieved:
+                prompt, normalized_sources = self._build_prompt(kb, question, retrieved, timings)
+            else:
+                prompt, normalized_sources = "", []
+            yield "sources", {"question": question, "sources": [vars(doc) for doc in normalized_sources]}
+            if cached:
+                timings["first_token_ms"] = _elapsed_ms(started)
+                yield "token", {"text": cached["answer"]}
+            elif not retrieved:
+                yield "token", {"text": NO_DOCUMENTS_ANSWER}
+            else:
+                generation_started = time.perf_counter()
+                answer_parts: List[str] = []
+                async for delta in self.llm_client.stream(prompt):
+                    timings.setdefault("first_token_ms", _elapsed_ms(started))
+                    answer_parts.append(delta)
+                    yield "token", {"text": delta}
+                answer = "".join(answer_parts).strip()
+                timings["generation_ms"] = _elapsed_ms(generation_started)
+                self._cache_store(kb, question, embedding, retrieved, answer, prompt, normalized_sources)
+        timings["total_ms"] = _elapsed_ms(started)
+        outcome = "cached" if cached else "answered" if retrieved else "no_documents"
+        self._observe_query("stream", kb, outcome, timings, answer if outcome == "answered" else None)
+        yield "done", {"prompt": prompt, "cached": cached is not None, "timings": timings}
+
+    async def query_batch(
+        self,
+        questions: List[str],
+        top_k: Optional[int] = None,
+        where: Optional[Dict] = None,
+        collection: Optional[str] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> AsyncIterator[Dict]:
+        """:meth:`_query_batch` on ``collection``; the collection stays open until the batch ends."""
+        if not self.llm_client:
+            raise RuntimeError("OpenAI API key is not configured")
+        async with self._use(collection) as kb:
+            async for result in self._query_batch(kb, questions, top_k, where, cutoff):
+                yield result
+
+    async def _query_batch(
+        self,
+        kb: KnowledgeBase,
+        questions: List[str],
+        top_k: Optional[int],
+        where: Optional[Dict],
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> AsyncIterator[Dict]:
+        """Answer many questions, yielding one result per question as soon as it is ready.
+
+        Questions are retrieved ``batch_retrieval_size`` at a time (one embedding
+        batch and one multi-query search each) while earlier questions are
+        already being answered. LLM calls share ``batch_llm_concurrency`` slots
+        and back off on rate limits. Results arrive in completion order and
+        carry the ``index`` of their question; a failed question yields an
+        ``error`` instead of stopping the batch.
+        """
+        k = top_k or self.settings.top_k
+        results: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
+
+        async def retrieve_all() -> None:
+            size = max(self.settings.batch_retrieval_size, 1)
+            for start in range(0, len(questions), size):
+                batch = []
+                for index, question in enumerate(questions[start : start + size], start=start):
+                    if question.strip():
+                        batch.append((index, question))
+                    else:
+                        results.put_nowait(
+                            {"index": index, "question": question, "error": "question must not be empty"}
+                        )
+                if not batch:
+                    continue
+                try:
+                    searched = await self._run_blocking(
+                        self._retrieve_batch, kb, [question for _, question in batch], k, where, cutoff
+                    )
+                except Exception as exc:  # reported per question
+                    for index, question in batch:
+                        results.put_nowait({"index": index, "question": question, "error": str(exc)})
+                    continue
+                for (index, question), (embedding, retrieved, timings) in zip(batch, searched):
+                    tasks.append(
+                        asyncio.create_task(
+                            self._answer_batch_item(kb, index, question, embedding, retrieved, timings, results)
+                        )
+                    )
+
+        producer = asyncio.create_task(retrieve_all())
+        try:
+            for _ in range(len(questions)):
+                yield await results.get()
+            await producer
+        finally:
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def _answer_batch_item(
+        self,
+        kb: KnowledgeBase,
+        index: int,
+        question: str,
+        embedding: Sequence[float],
+        retrieved: List[Dict],
+        timings: Dict[str, float],
+        results: asyncio.Queue,
+    ) -> None:
+        result: Dict = {"index": index, "question": question}
+        try:
+            cached = self._cache_lookup(kb, embedding, retrieved) if retrieved else None
+            answer = None
+            if not retrieved:
+                outcome = "no_documents"
+                result.update(answer=NO_DOCUMENTS_ANSWER, sources=[], cached=False)
+            elif cached:
+                outcome = "cached"
+                result.update(answer=cached["answer"], sources=[vars(doc) for doc in cached["sources"]], cached=True)
+            else:
+                outcome = "answered"
+                async with self.batch_llm_slots:
+                    prompt, normalized_sources = self._build_prompt(kb, question, retrieved, timings)
+                    started = time.perf_counter()
+                    answer = await self.llm_client.generate(
+                        prompt,
+                        max_retries=self.settings.llm_max_retries,
+                        max_backoff=self.settings.llm_max_backoff_seconds,
+                    )
+                    timings["generation_ms"] = _elapsed_ms(started)
+                answer = answer.strip()
+                self._cache_store(kb, question, embedding, retrieved, answer, prompt, normalized_sources)
+                result.update(answer=answer, sources=[vars(doc) for doc in normalized_sources], cached=False)
+            result["timings"] = timings
+            self._observe_query("batch", kb, outcome, timings, answer)
+        except Exception as exc:  # reported per question
+            result = {"index": index, "question": question, "error": str(exc)}
+            self._observe_query("batch", kb, "error")
+        results.put_nowait(result)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _retry_delay(exc: Exception, attempt: int, max_backoff: float) -> float:
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), max_backoff)
+        except ValueError:
+            pass
+    return min(2**attempt, max_backoff) * random.uniform(0.5, 1.0)
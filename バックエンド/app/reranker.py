@@ -0,0 +1,81 @@
+"""Cross-encoder reranking of retrieved chunks."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class RerankResult:
+    documents: List[Dict]
+    elapsed_ms: float
+    fallback: bool = False
+
+
+class CrossEncoderReranker:
+    """Rescores (question, chunk) pairs with a local cross-encoder on CPU.
+
+    Candidates are scored in ``batch_size`` batches. When the time budget runs
+    out before every candidate is scored, the original retrieval order is kept
+    so a slow model never delays the answer by more than one batch.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 16,
+        max_length: int = 512,
+        device: Optional[str] = None,
+    ) -> None:
+        self.model_name = model_name
+        self.batch_size = max(batch_size, 1)
+        self.max_length = max_length
+        self.device = device
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        from sentence_transformers import CrossEncoder
+
+        return CrossEncoder(self.model_name, max_length=self.max_length, device=self.device)
+
+    def rerank(self, query: str, candidates: List[Dict], top_k: int, budget_ms: float) -> RerankResult:
+        """Return the ``top_k`` best candidates, each with a ``rerank_score``.
+
+        The budget starts after the model is loaded, so only scoring counts
+        against it. A non-positive budget disables the limit.
+        """
+        model = self.model
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000 if budget_ms > 0 else None
+        scores: List[float] = []
+        for start in range(0, len(candidates), self.batch_size):
+            if deadline is not None and scores and time.perf_counter() > deadline:
+                return RerankResult(
+                    documents=candidates[:top_k],
+                    elapsed_ms=(time.perf_counter() - started) * 1000,
+                    fallback=True,
+                )
+            batch = candidates[start : start + self.batch_size]
+            predicted = model.predict(
+                [(query, item["content"]) for item in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            scores.extend(float(score) for score in predicted)
+        ranked = sorted(zip(scores, candidates), key=lambda pair: pair[0], reverse=True)[:top_k]
+        return RerankResult(
+            documents=[{**item, "rerank_score": score} for score, item in ranked],
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+        )
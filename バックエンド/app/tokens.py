@@ -0,0 +1,137 @@
+"""Token counting with the OpenAI model's tokenizer."""
+
+from __future__ import annotations
+
+import bisect
+import math
+import os
+import threading
+from itertools import accumulate
+from typing import List, Optional
+
+
+class TokenCounter:
+    """Counts tokens with the OpenAI model's tokenizer.
+
+    ``tiktoken`` is optional. Its BPE files are downloaded on first use unless
+    ``cache_dir`` (``TIKTOKEN_CACHE_DIR``) already holds them, so offline hosts
+    should pre-populate that directory. If the tokenizer cannot be loaded, a
+    conservative estimate is used instead: one token per non-ASCII character
+    and one per four ASCII characters.
+    """
+
+    def __init__(self, model: str, cache_dir: Optional[str] = None) -> None:
+        self.model = model
+        self.cache_dir = cache_dir
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to ingest worker processes; the encoding is reloaded there.
+        return {"model": self.model, "cache_dir": self.cache_dir}
+
+    def __setstate__(self, state) -> None:
+        self.__init__(state["model"], state["cache_dir"])
+
+    @property
+    def encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._encoding = self._load_encoding()
+                    self._loaded = True
+        return self._encoding
+
+    def _load_encoding(self):
+        if self.cache_dir:
+            os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(self.cache_dir))
+        try:
+            import tiktoken
+        except ImportError:
+            return None
+        try:
+            try:
+                return tiktoken.encoding_for_model(self.model)
+            except KeyError:  # model unknown to this tiktoken version
+                return tiktoken.get_encoding("o200k_base")
+        except Exception:  # BPE file unavailable offline; fall back to the estimate
+            return None
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Return the longest prefix of ``text`` that fits in ``max_tokens``."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            # Tokens are byte sequences and may end inside a character; drop the incomplete tail
+            # so the result is a real prefix of ``text`` rather than one ending in U+FFFD.
+            head = self.encoding.decode_bytes(tokens[:max_tokens]).decode("utf-8", errors="ignore")
+            return text[: len(head)]
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """Cut ``text`` into consecutive pieces of at most ``max_tokens`` tokens each.
+
+        The text is encoded once and cut at token offsets (moved back to a
+        character boundary), so the cost is linear in its length; cutting
+        with :meth:`truncate` would re-encode the remainder for every piece.
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if self.encoding is None:
+            return self._split_estimated(text, max_tokens)
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return [text] if text else []
+        data = text.encode("utf-8")
+        # Byte offset at which each token ends.
+        ends = list(accumulate(len(self.encoding.decode_bytes([token])) for token in tokens))
+        pieces: List[str] = []
+        start = 0
+        while start < len(data):
+            # The token holding ``start`` counts as the piece's first token even if it began earlier.
+            first = bisect.bisect_right(ends, start)
+            cut = ends[min(first + max_tokens, len(ends)) - 1]
+            while cut < len(data) and data[cut] & 0xC0 == 0x80:  # inside a multi-byte character
+                cut -= 1
+            if cut <= start:  # one character spans more than max_tokens tokens
+                cut = start + 1
+                while cut < len(data) and data[cut] & 0xC0 == 0x80:
+                    cut += 1
+            pieces.append(data[start:cut].decode("utf-8"))
+            start = cut
+        return pieces
+
+    @staticmethod
+    def _split_estimated(text: str, max_tokens: int) -> List[str]:
+        # The estimate adds up per character, so one pass finds every cut.
+        pieces: List[str] = []
+        start = non_ascii = ascii_chars = 0
+        for index, char in enumerate(text):
+            if char.isascii():
+                ascii_chars += 1
+            else:
+                non_ascii += 1
+            if non_ascii + math.ceil(ascii_chars / 4) > max_tokens and index > start:
+                pieces.append(text[start:index])
+                start = index
+                non_ascii, ascii_chars = (0, 1) if char.isascii() else (1, 0)
+        if start < len(text):
+            pieces.append(text[start:])
+        return pieces
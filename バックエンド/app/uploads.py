@@ -0,0 +1,201 @@
+"""Receive multipart uploads straight to disk, block by block.
+
+The request body is parsed while it arrives: each file part is hashed and
+written to a temporary file next to its destination in fixed-size blocks, so
+memory use per upload stays around one block whatever the file size. The
+size limit and the extension check reject a file as soon as its bytes show
+it is not acceptable, without reading the rest of the request.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+TEMP_PREFIX = ".upload-"
+_MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    """The request is not an acceptable upload (bad form, unsupported file type, too many files)."""
+
+
+class UploadTooLarge(UploadRejected):
+    """A file exceeded the upload size limit while it was being received."""
+
+
+@dataclass
+class ReceivedUpload:
+    """One uploaded file, received into ``temp_path`` and later moved to ``path``."""
+
+    filename: str
+    temp_path: Path
+    size: int = 0
+    sha256: str = ""
+    path: Optional[str] = None
+    duplicate_of: Optional[str] = None
+
+    def discard(self) -> None:
+        self.temp_path.unlink(missing_ok=True)
+
+
+@dataclass
+class ReceivedForm:
+    files: List[ReceivedUpload]
+    fields: Dict[str, str]
+
+
+class _FilePart:
+    """Hashes and writes one file part, buffering up to one block between writes."""
+
+    def __init__(self, upload: ReceivedUpload, max_bytes: int) -> None:
+        self.upload = upload
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.buffer = bytearray()
+        self.handle = open(upload.temp_path, "wb")
+
+    async def feed(self, data: bytes) -> None:
+        self.upload.size += len(data)
+        if self.upload.size > self.max_bytes:
+            raise UploadTooLarge(
+                f"{self.upload.filename} is larger than the upload limit of {self.max_bytes // (1024 * 1024)} MB"
+            )
+        self.buffer += data
+        if len(self.buffer) >= UPLOAD_BLOCK_SIZE:
+            await self._flush()
+
+    async def finish(self) -> None:
+        await self._flush()
+        self.handle.close()
+        self.upload.sha256 = self.digest.hexdigest()
+
+    def close(self) -> None:
+        self.handle.close()
+
+    async def _flush(self) -> None:
+        if not self.buffer:
+            return
+        block, self.buffer = bytes(self.buffer), bytearray()
+        await run_in_threadpool(self._write, block)
+
+    def _write(self, block: bytes) -> None:
+        self.digest.update(block)
+        self.handle.write(block)
+
+
+async def receive_multipart(
+    content_type: str,
+    stream: AsyncIterator[bytes],
+    directory: Path,
+    max_file_bytes: int,
+    max_files: int,
+    allowed_extensions: Iterable[str],
+) -> ReceivedForm:
+    """Parse a ``multipart/form-data`` body, writing every file part into ``directory``.
+
+    Files are kept under temporary names (``.upload-*``) until the caller moves
+    or discards them. On any error every file received so far is removed.
+    """
+    media_type, params = parse_options_header(content_type or "")
+    boundary = params.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected("Expected a multipart/form-data request.")
+    allowed = {extension.lower() for extension in allowed_extensions}
+
+    # The parser's callbacks are synchronous; they queue events that are
+    # handled (with awaits for disk writes) after each chunk of the body.
+    events: List[Tuple[str, bytes]] = []
+    header_field = bytearray()
+    header_value = bytearray()
+    headers: Dict[bytes, bytes] = {}
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        events.append(("start", headers.get(b"content-disposition", b"")))
+        headers.clear()
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end() -> None:
+        events.append(("end", b""))
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    form = ReceivedForm(files=[], fields={})
+    part: Optional[_FilePart] = None
+    field_name: Optional[str] = None
+    field_value = bytearray()
+    try:
+        async for chunk in stream:
+            parser.write(chunk)
+            for kind, data in events:
+                if kind == "start":
+                    _, options = parse_options_header(data)
+                    name = options.get(b"name", b"").decode("utf-8", "replace")
+                    if b"filename" not in options:
+                        field_name, field_value = name, bytearray()
+                        continue
+                    filename = Path(options[b"filename"].decode("utf-8", "replace")).name
+                    extension = Path(filename).suffix.lower()
+                    if extension not in allowed:
+                        raise UploadRejected(
+                            f"Unsupported file type: {extension or filename}. Allowed: {', '.join(sorted(allowed))}"
+                        )
+                    if len(form.files) >= max_files:
+                        raise UploadRejected(f"At most {max_files} files can be uploaded in one request.")
+                    upload = ReceivedUpload(filename=filename, temp_path=directory / f"{TEMP_PREFIX}{uuid.uuid4().hex}")
+                    form.files.append(upload)
+                    part = _FilePart(upload, max_file_bytes)
+                elif kind == "data":
+                    if part is not None:
+                        await part.feed(data)
+                    elif field_name is not None:
+                        field_value += data
+                        if len(field_value) > _MAX_FIELD_BYTES:
+                            raise UploadRejected(f"Form field {field_name} is too long.")
+                elif part is not None:
+                    await part.finish()
+                    part = None
+                elif field_name is not None:
+                    form.fields[field_name] = field_value.decode("utf-8", "replace")
+                    field_name = None
+            events.clear()
+        parser.finalize()
+        if part is not None or field_name is not None:
+            raise UploadRejected("The multipart body ended in the middle of a part.")
+    except BaseException:
+        if part is not None:
+            part.close()
+        for upload in form.files:
+            upload.discard()
+        raise
+    return form
@@ -1,84 +1,732 @@
-"""Wrapper around ChromaDB for persisting embeddings and running similarity search."""
+"""Vector stores: the shared hybrid-search logic and the ChromaDB backend."""
 
 from __future__ import annotations
 
+import hashlib
+import json
+import math
+import shutil
+import sqlite3
+import threading
 import uuid
-from typing import Dict, Iterable, List, Sequence
+from abc import ABC, abstractmethod
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 import chromadb
+import numpy as np
 from chromadb.api import ClientAPI
-from chromadb.api.types import Documents, EmbeddingFunction
+from chromadb.api.types import Documents, Embeddings
 from chromadb.config import Settings as ChromaSettings
-from chromadb.utils import embedding_functions
 
+from .document_index import DocumentIndex, add_to_sums
 from .document_loader import DocumentChunk
+from .embeddings import ChromaEmbeddingFunction, EmbeddingService
+from .filters import MetadataValue, matches
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
 
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid", "two_tier")
+_REBUILD_PAGE_SIZE = 1000
+# Documents whose chunks a two_tier search scans when the caller does not say.
+_TWO_TIER_DOCUMENTS = 10
+# The lexical index knows no metadata: with a filter it over-fetches and Chroma drops non-matching hits.
+_FILTERED_LEXICAL_FACTOR = 5
+# Chroma resolves a ``where`` clause by loading every matching row, so a filter
+# matching a large share of the collection is cheaper to apply to an
+# over-fetched unfiltered query. See ``ChromaVectorStore._post_filter_fetch``.
+_POST_FILTER_OVERSAMPLE = 2.0
+_POST_FILTER_MAX_FETCH = 1000
+_FILTER_STATS_CACHE_SIZE = 256
+_CHROMA_DB = "chroma.sqlite3"
 
-class VectorStore:
-    """Encapsulates the ChromaDB collection operations."""
+
+@dataclass
+class ScoreCutoff:
+    """Drop search results that are too far from the question, so ``top_k`` is only an upper bound.
+
+    ``max_distance`` keeps chunks within that vector distance; when none is
+    that close the search returns nothing. ``score_gap`` cuts the ranking at
+    the first distance more than ``score_gap`` times larger than the one
+    before it (a relative jump), but never below ``min_k`` results. 0
+    disables either rule. Chunks without a distance (found only by the
+    lexical side of a hybrid search) are kept as long as some chunk passes
+    ``max_distance``; a purely lexical ranking is left as it is.
+    """
+
+    max_distance: float = 0.0
+    score_gap: float = 0.0
+    min_k: int = 1
+
+    @property
+    def active(self) -> bool:
+        return self.max_distance > 0 or self.score_gap > 0
+
+    def apply(self, results: List[Dict]) -> List[Dict]:
+        if not self.active:
+            return results
+        distances = sorted(item["score"] for item in results if item.get("score") is not None)
+        if not distances:
+            return results
+        threshold = self.max_distance if self.max_distance > 0 else math.inf
+        if distances[0] > threshold:
+            return []
+        limit = threshold
+        if self.score_gap > 0:
+            for previous, current in zip(distances, distances[1:]):
+                if current > threshold:
+                    break
+                if current > previous * (1 + self.score_gap):
+                    limit = previous
+                    break
+        return [
+            item
+            for position, item in enumerate(results)
+            if item.get("score") is None
+            or item["score"] <= limit
+            or (position < self.min_k and item["score"] <= threshold)
+        ]
+
+
+class VectorStore(ABC):
+    """Chunk storage with vector, lexical and hybrid search.
+
+    Subclasses provide the storage backend, all abstract methods: :meth:`count`
+    and the ``_upsert`` / ``_delete`` / ``_query`` / ``_fetch`` /
+    ``_matching_ids`` / ``_matching_paths`` / ``_document_pages`` /
+    ``_record_pages`` primitives, plus ``_storage_paths`` /
+    ``_compact_storage`` / ``_snapshot_storage`` for maintenance. Search modes, the lexical and document indexes and rank
+    fusion are handled here, so every backend behaves the same.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedder: EmbeddingService,
+        lexical_index: Optional[LexicalIndex] = None,
+        rrf_k: int = 60,
+        document_index: Optional[DocumentIndex] = None,
+    ) -> None:
+        self.collection_name = collection_name
+        self.embedder = embedder
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        self.document_index = document_index
+
+    def embed(self, texts: Sequence[str]) -> Embeddings:
+        """Embed passages for storage."""
+        return self.embedder.embed_documents(texts)
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query (cached and micro-batched by the embedding service)."""
+        return self.embedder.embed_query(query)
+
+    def add_chunks(
+        self,
+        chunks: Iterable[DocumentChunk],
+        embeddings: Optional[Embeddings] = None,
+    ) -> int:
+        """Store chunks inside the collection.
+
+        Chunks carrying an ``id`` are upserted so re-ingesting the same file
+        overwrites its previous chunks instead of duplicating them. Precomputed
+        ``embeddings`` skip the embedding function.
+        """
+        documents: Documents = []
+        metadatas: List[Dict[str, MetadataValue]] = []
+        ids: List[str] = []
+        for chunk in chunks:
+            documents.append(chunk.content)
+            metadatas.append(chunk.metadata)
+            ids.append(chunk.id or str(uuid.uuid4()))
+        if not documents:
+            return 0
+        self._upsert(ids, documents, metadatas, embeddings)
+        if self.lexical_index is not None:
+            self.lexical_index.add(zip(ids, documents))
+        return len(documents)
+
+    def delete_ids(self, ids: Sequence[str]) -> int:
+        """Remove chunks by identifier and return how many were stored. Unknown IDs are ignored."""
+        if not ids:
+            return 0
+        deleted = self._delete(list(ids))
+        if self.lexical_index is not None:
+            self.lexical_index.delete(ids)
+        return deleted
+
+    def delete_where(self, where: Dict) -> int:
+        """Remove every chunk whose metadata matches the filter."""
+        matched = self._matching_ids(where)
+        return self.delete_ids(matched) if matched else 0
+
+    def index_document(self, path: str, chunk_embeddings: Sequence[Sequence[float]]) -> None:
+        """Record the document-level embedding of ``path`` from the embeddings of all its chunks."""
+        if self.document_index is not None:
+            self.document_index.put(path, chunk_embeddings)
+
+    def remove_documents(self, paths: Iterable[str]) -> None:
+        """Drop documents from the document index (their chunks are deleted separately)."""
+        if self.document_index is not None:
+            self.document_index.remove(paths)
+
+    def commit(self) -> None:
+        """Persist pending lexical index deletions and the document index; call once per ingest run."""
+        if self.lexical_index is not None:
+            self.lexical_index.commit()
+        if self.document_index is not None:
+            self.document_index.save()
+
+    def rebuild_lexical_index(self) -> int:
+        """Index every stored chunk lexically, e.g. for collections created before the index existed."""
+        if self.lexical_index is None:
+            return 0
+        self.lexical_index.clear()
+        indexed = 0
+        for ids, documents in self._document_pages(_REBUILD_PAGE_SIZE):
+            self.lexical_index.add(zip(ids, documents))
+            indexed += len(ids)
+        self.lexical_index.commit()
+        return indexed
+
+    def lexical_index_missing(self) -> bool:
+        return self.lexical_index is not None and self.lexical_index.doc_count == 0 and self.count() > 0
+
+    def rebuild_document_index(self) -> int:
+        """Derive every document embedding from the stored chunk vectors; returns the document count."""
+        if self.document_index is None:
+            return 0
+        sums: Dict[str, np.ndarray] = {}
+        for _, _, metadatas, embeddings in self.iter_records():
+            add_to_sums(sums, metadatas, embeddings)
+        self.document_index.clear()
+        for path, total in sums.items():
+            self.document_index.put(path, [total])
+        self.document_index.save()
+        return len(sums)
+
+    def document_index_missing(self) -> bool:
+        return self.document_index is not None and len(self.document_index) == 0 and self.count() > 0
+
+    def iter_records(
+        self, page_size: int = _REBUILD_PAGE_SIZE
+    ) -> Iterator[Tuple[List[str], List[str], List[Dict[str, MetadataValue]], np.ndarray]]:
+        """Yield ``(ids, documents, metadatas, embeddings)`` pages covering every stored chunk.
+
+        Embeddings are float32 rows as stored (dequantized by quantizing backends).
+        """
+        for ids, documents, metadatas, embeddings in self._record_pages(page_size):
+            yield ids, documents, metadatas, np.asarray(embeddings, dtype=np.float32)
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks."""
+
+    # Maintenance.
+
+    def duplicate_ids(self) -> List[str]:
+        """IDs of chunks whose text repeats an earlier stored chunk exactly; the first copy is kept."""
+        seen = set()
+        duplicates: List[str] = []
+        for ids, documents in self._document_pages(_REBUILD_PAGE_SIZE):
+            for chunk_id, document in zip(ids, documents):
+                digest = hashlib.blake2b(document.encode("utf-8"), digest_size=16).digest()
+                if digest in seen:
+                    duplicates.append(chunk_id)
+                else:
+                    seen.add(digest)
+        return duplicates
+
+    def disk_usage(self) -> int:
+        """Bytes on disk of the vectors, chunk rows, lexical and document indexes."""
+        paths = self._storage_paths()
+        if self.lexical_index is not None:
+            paths.append(self.lexical_index.directory)
+        if self.document_index is not None:
+            paths.append(self.document_index.path)
+        return sum(path_size(path) for path in paths)
+
+    def compact(self) -> None:
+        """Give back the space deleted chunks still occupy in the lexical index and the backend files."""
+        if self.lexical_index is not None:
+            self.lexical_index.compact()
+        self._compact_storage()
+
+    def snapshot(self, target: Callable[[Path], Path]) -> None:
+        """Copy a consistent image of the store while searches continue.
+
+        ``target`` maps a path of the live store to its place in the snapshot.
+        The caller keeps writers out for the duration (see ``IngestJobManager.exclusive``).
+        """
+        if self.lexical_index is not None:
+            self.lexical_index.snapshot(target(self.lexical_index.directory))
+        if self.document_index is not None:
+            self.document_index.snapshot(target(self.document_index.path))
+        self._snapshot_storage(target)
+
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """Embed many search queries in a single batch."""
+        return self.embedder.embed_queries(queries)
+
+    def similarity_search(
+        self,
+        query: str,
+        top_k: int,
+        query_embedding: Optional[Sequence[float]] = None,
+        mode: str = "vector",
+        candidates: Optional[int] = None,
+        where: Optional[Dict] = None,
+        documents: Optional[int] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> List[Dict]:
+        """Run a search and return normalized results.
+
+        ``mode`` selects dense vectors, BM25 over the lexical index, or
+        ``hybrid``: both rankings over ``candidates`` results each, fused with
+        reciprocal rank fusion. ``two_tier`` ranks whole documents by their
+        mean chunk embedding first and searches the vectors of only the chunks
+        of the best ``documents`` files (plain vector search while the document
+        index is empty). ``score`` is always the vector distance (``None``
+        for chunks only the lexical side found); fused results also carry
+        ``fusion_score``. Pass ``query_embedding`` when the question has already
+        been embedded to avoid embedding it a second time.
+
+        ``where`` is a Chroma-style metadata filter (see
+        :meth:`~app.filters.SearchFilter.to_where`). The backend applies it to
+        the vector search; lexical hits are over-fetched and checked against
+        the same filter.
+
+        With a ``cutoff``, ``top_k`` is the most results returned: chunks too
+        far from the question are dropped (see :class:`ScoreCutoff`), down to
+        none at all.
+        """
+        embeddings = [query_embedding] if query_embedding is not None else None
+        return self.similarity_search_batch([query], top_k, embeddings, mode, candidates, where, documents, cutoff)[0]
+
+    def similarity_search_batch(
+        self,
+        queries: Sequence[str],
+        top_k: int,
+        query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+        mode: str = "vector",
+        candidates: Optional[int] = None,
+        where: Optional[Dict] = None,
+        documents: Optional[int] = None,
+        cutoff: Optional[ScoreCutoff] = None,
+    ) -> List[List[Dict]]:
+        """Search for many queries at once; see :meth:`similarity_search`.
+
+        The vector side is a single multi-query backend call and chunks found
+        only lexically are loaded with one fetch.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"unknown retrieval mode: {mode}")
+        if not queries:
+            return []
+        results = self._rank(queries, top_k, query_embeddings, mode, candidates, where, documents)
+        if cutoff is not None and cutoff.active:
+            results = [cutoff.apply(ranking) for ranking in results]
+        return results
+
+    def _rank(
+        self,
+        queries: Sequence[str],
+        top_k: int,
+        query_embeddings: Optional[Sequence[Sequence[float]]],
+        mode: str,
+        candidates: Optional[int],
+        where: Optional[Dict],
+        documents: Optional[int],
+    ) -> List[List[Dict]]:
+        if mode == "two_tier":
+            return self._two_tier_search(queries, top_k, query_embeddings, where, documents or _TWO_TIER_DOCUMENTS)
+        if self.lexical_index is None or mode == "vector":
+            return self._vector_search(queries, top_k, query_embeddings, where)
+        if mode == "lexical":
+            rankings = self._lexical_rankings(queries, top_k, where)
+            ids = sorted({doc_id for ranking in rankings for doc_id in ranking})
+            fetched = {item["id"]: item for item in self._fetch(ids)}
+            return [[fetched[doc_id] for doc_id in ranking if doc_id in fetched] for ranking in rankings]
+        candidates = max(candidates or top_k, top_k)
+        dense_results = self._vector_search(queries, candidates, query_embeddings, where)
+        lexical_rankings = self._lexical_rankings(queries, candidates, where)
+        fused_results = []
+        for dense, lexical in zip(dense_results, lexical_rankings):
+            fused = reciprocal_rank_fusion([[item["id"] for item in dense], lexical], k=self.rrf_k)[:top_k]
+            fused_results.append((fused, {item["id"]: item for item in dense}))
+        missing = sorted({doc_id for fused, by_id in fused_results for doc_id, _ in fused if doc_id not in by_id})
+        fetched = {item["id"]: item for item in self._fetch(missing)}
+        results: List[List[Dict]] = []
+        for fused, by_id in fused_results:
+            merged: List[Dict] = []
+            for doc_id, fusion_score in fused:
+                item = by_id.get(doc_id) or fetched.get(doc_id)
+                # The lexical index may briefly reference a chunk Chroma no longer has.
+                if item is not None:
+                    merged.append({**item, "fusion_score": fusion_score})
+            results.append(merged)
+        return results
+
+    def _lexical_rankings(self, queries: Sequence[str], top_k: int, where: Optional[Dict]) -> List[List[str]]:
+        if where is None:
+            return [[doc_id for doc_id, _ in self.lexical_index.search(query, top_k)] for query in queries]
+        rankings = [
+            [doc_id for doc_id, _ in self.lexical_index.search(query, top_k * _FILTERED_LEXICAL_FACTOR)]
+            for query in queries
+        ]
+        hits = sorted({doc_id for ranking in rankings for doc_id in ranking})
+        allowed = set(self._matching_ids(where, hits)) if hits else set()
+        return [[doc_id for doc_id in ranking if doc_id in allowed][:top_k] for ranking in rankings]
+
+    def _embed_all(
+        self, queries: Sequence[str], query_embeddings: Optional[Sequence[Sequence[float]]]
+    ) -> List[List[float]]:
+        if query_embeddings is None:
+            if len(queries) == 1:
+                query_embeddings = [self.embed_query(queries[0])]
+            else:
+                query_embeddings = self.embed_queries(queries)
+        return [list(embedding) for embedding in query_embeddings]
+
+    def _vector_search(
+        self,
+        queries: Sequence[str],
+        top_k: int,
+        query_embeddings: Optional[Sequence[Sequence[float]]],
+        where: Optional[Dict] = None,
+    ) -> List[List[Dict]]:
+        return self._search_vectors(self._embed_all(queries, query_embeddings), top_k, where)
+
+    def _two_tier_search(
+        self,
+        queries: Sequence[str],
+        top_k: int,
+        query_embeddings: Optional[Sequence[Sequence[float]]],
+        where: Optional[Dict],
+        documents: int,
+    ) -> List[List[Dict]]:
+        embeddings = self._embed_all(queries, query_embeddings)
+        if self.document_index is None or not len(self.document_index):
+            return self._search_vectors(embeddings, top_k, where)
+        # Only documents with a chunk matching the filter can contribute results.
+        allowed = None if where is None else self._matching_paths(where)
+        shortlists = self.document_index.search(embeddings, documents, allowed)
+        return [
+            self._search_documents(embedding, top_k, paths, where) if paths else []
+            for embedding, paths in zip(embeddings, shortlists)
+        ]
+
+    def _search_documents(
+        self,
+        embedding: List[float],
+        top_k: int,
+        paths: List[str],
+        where: Optional[Dict],
+    ) -> List[Dict]:
+        """Nearest chunks among those of the documents ``paths``; backends may look the chunks up faster."""
+        scope: Dict = {"path": {"$in": paths}}
+        return self._query([embedding], top_k, scope if where is None else {"$and": [where, scope]})[0]
+
+    def _search_vectors(
+        self,
+        embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict],
+    ) -> List[List[Dict]]:
+        return self._query(embeddings, top_k, where)
+
+    # Backend primitives.
+
+    @abstractmethod
+    def _upsert(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, MetadataValue]],
+        embeddings: Optional[Embeddings],
+    ) -> None:
+        """Insert or replace chunks; ``embeddings`` of ``None`` means the store embeds ``documents``."""
+
+    @abstractmethod
+    def _delete(self, ids: List[str]) -> int:
+        """Delete the chunks among ``ids`` that exist and return their number."""
+
+    @abstractmethod
+    def _matching_ids(self, where: Dict, ids: Optional[Sequence[str]] = None) -> List[str]:
+        """IDs of chunks matching ``where``, optionally only among ``ids``."""
+
+    @abstractmethod
+    def _matching_paths(self, where: Dict) -> Set[str]:
+        """``path`` metadata of the documents having at least one chunk matching ``where``."""
+
+    @abstractmethod
+    def _document_pages(self, page_size: int) -> Iterator[Tuple[List[str], List[str]]]:
+        """Yield ``(ids, documents)`` pages covering every stored chunk."""
+
+    @abstractmethod
+    def _record_pages(
+        self, page_size: int
+    ) -> Iterator[Tuple[List[str], List[str], List[Dict[str, MetadataValue]], Sequence[Sequence[float]]]]:
+        """Yield ``(ids, documents, metadatas, embeddings)`` pages covering every stored chunk."""
+
+    @abstractmethod
+    def _query(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict] = None,
+    ) -> List[List[Dict]]:
+        """Nearest chunks per query as result dicts, ``score`` being the squared L2 distance."""
+
+    @abstractmethod
+    def _fetch(self, ids: Sequence[str]) -> List[Dict]:
+        """Load chunks by ID, preserving the order of ``ids``."""
+
+    @abstractmethod
+    def _storage_paths(self) -> List[Path]:
+        """Files and directories holding this store's vectors and rows."""
+
+    @abstractmethod
+    def _compact_storage(self) -> None:
+        """Give back the space of deleted chunks."""
+
+    @abstractmethod
+    def _snapshot_storage(self, target: Callable[[Path], Path]) -> None:
+        """Copy the backend files consistently to ``target(source)`` while reads continue."""
+
+
+def path_size(path: Path) -> int:
+    """Bytes of a file, or of every file below a directory (0 when missing)."""
+    files = path.rglob("*") if path.is_dir() else [path]
+    total = 0
+    for item in files:
+        try:
+            if item.is_file():
+                total += item.stat().st_size
+        except OSError:  # removed meanwhile, e.g. a merged lexical segment
+            continue
+    return total
+
+
+class ChromaVectorStore(VectorStore):
+    """Stores chunks in a ChromaDB collection (HNSW index plus SQLite)."""
 
     def __init__(
         self,
         persist_directory,
         collection_name: str,
-        embedding_model: str,
+        embedder: EmbeddingService,
+        lexical_index: Optional[LexicalIndex] = None,
+        rrf_k: int = 60,
+        client: Optional[ClientAPI] = None,
+        document_index: Optional[DocumentIndex] = None,
     ) -> None:
+        super().__init__(collection_name, embedder, lexical_index, rrf_k, document_index)
         self.persist_directory = str(persist_directory)
-        self.collection_name = collection_name
-        self.embedding_model = embedding_model
-        self.client: ClientAPI = chromadb.PersistentClient(
+        # Collections opened by one CollectionManager share its client.
+        self.client: ClientAPI = client or chromadb.PersistentClient(
             path=self.persist_directory,
             settings=ChromaSettings(anonymized_telemetry=False),
         )
         self.collection = self._init_collection()
+        # Bumped on every write; cached filter match counts are tied to it.
+        self._generation = 0
+        self._filter_stats: Dict[str, Tuple[int, int, int]] = {}
+        self._filter_paths: Dict[str, Tuple[int, Set[str]]] = {}
+        self._filter_stats_lock = threading.Lock()
 
     def _init_collection(self):
-        embedding_fn: EmbeddingFunction = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=self.embedding_model
-        )
         return self.client.get_or_create_collection(
             name=self.collection_name,
-            embedding_function=embedding_fn,
+            embedding_function=ChromaEmbeddingFunction(self.embedder),
         )
 
-    def add_chunks(self, chunks: Iterable[DocumentChunk]) -> int:
-        """Store chunks inside the collection."""
-        documents: Documents = []
-        metadatas: List[Dict[str, str]] = []
-        ids: List[str] = []
-        for chunk in chunks:
-            documents.append(chunk.content)
-            metadatas.append(chunk.metadata)
-            ids.append(str(uuid.uuid4()))
-        if not documents:
+    def count(self) -> int:
+        return self.collection.count()
+
+    @property
+    def _database_path(self) -> Path:
+        return Path(self.persist_directory) / _CHROMA_DB
+
+    def _segment_dirs(self) -> List[Path]:
+        """HNSW directories of this collection (the SQLite database is shared by all collections)."""
+        with closing(sqlite3.connect(self._database_path, timeout=30)) as connection:
+            segment_ids = connection.execute(
+                "SELECT id FROM segments WHERE collection = ?", (str(self.collection.id),)
+            ).fetchall()
+        directories = [Path(self.persist_directory) / segment_id for (segment_id,) in segment_ids]
+        return [directory for directory in directories if directory.is_dir()]
+
+    def _storage_paths(self) -> List[Path]:
+        return [self._database_path, *self._segment_dirs()]
+
+    def _compact_storage(self) -> None:
+        # Chroma 0.5 keeps deleted vectors as HNSW tombstones and never trims
+        # its write log, so only the free pages of SQLite can be given back.
+        with closing(sqlite3.connect(self._database_path, timeout=60)) as connection:
+            connection.execute("VACUUM")
+
+    def _snapshot_storage(self, target: Callable[[Path], Path]) -> None:
+        # HNSW files first: on open, Chroma replays log entries newer than the
+        # persisted index from SQLite, so a newer database is consistent.
+        for directory in self._segment_dirs():
+            shutil.copytree(directory, target(directory), dirs_exist_ok=True)
+        destination = target(self._database_path)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self._database_path, timeout=60)) as source, closing(
+            sqlite3.connect(destination)
+        ) as copy:
+            source.backup(copy)
+
+    def _upsert(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, MetadataValue]],
+        embeddings: Optional[Embeddings],
+    ) -> None:
+        self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        self._generation += 1
+
+    def _delete(self, ids: List[str]) -> int:
+        # Chroma does not report what it deleted.
+        existing = self.collection.get(ids=ids, include=[]).get("ids") or []
+        if existing:
+            self.collection.delete(ids=existing)
+            self._generation += 1
+        return len(existing)
+
+    def _matching_ids(self, where: Dict, ids: Optional[Sequence[str]] = None) -> List[str]:
+        found = self.collection.get(ids=list(ids) if ids is not None else None, where=where, include=[])
+        return found.get("ids") or []
+
+    def _matching_paths(self, where: Dict) -> Set[str]:
+        # Fetching every matching chunk's metadata is the expensive part of a
+        # filtered two_tier search, so the result is kept until the next write.
+        key = json.dumps(where, sort_keys=True)
+        with self._filter_stats_lock:
+            cached = self._filter_paths.get(key)
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        generation = self._generation
+        metadatas = self.collection.get(where=where, include=["metadatas"]).get("metadatas") or []
+        paths = {str(metadata["path"]) for metadata in metadatas if metadata and metadata.get("path")}
+        with self._filter_stats_lock:
+            if len(self._filter_paths) >= _FILTER_STATS_CACHE_SIZE:
+                self._filter_paths.clear()
+            self._filter_paths[key] = (generation, paths)
+        return paths
+
+    def _document_pages(self, page_size: int) -> Iterator[Tuple[List[str], List[str]]]:
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                return
+            yield ids, page.get("documents") or []
+            offset += len(ids)
+
+    def _record_pages(
+        self, page_size: int
+    ) -> Iterator[Tuple[List[str], List[str], List[Dict[str, MetadataValue]], Sequence[Sequence[float]]]]:
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                return
+            metadatas = [metadata or {} for metadata in page.get("metadatas") or []]
+            yield ids, page.get("documents") or [], metadatas, page.get("embeddings")
+            offset += len(ids)
+
+    def _search_vectors(
+        self,
+        embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict],
+    ) -> List[List[Dict]]:
+        if where is None:
+            return self._query(embeddings, top_k)
+        fetch = self._post_filter_fetch(where, top_k)
+        if fetch == 0:
+            return [[] for _ in embeddings]
+        if fetch is None:
+            return self._query(embeddings, top_k, where)
+        results = [
+            [item for item in found if matches(where, item["metadata"])][:top_k]
+            for found in self._query(embeddings, fetch)
+        ]
+        # Rare: the over-fetch was not enough, so ask Chroma to filter.
+        short = [position for position, found in enumerate(results) if len(found) < top_k]
+        if short:
+            retried = self._query([embeddings[position] for position in short], top_k, where)
+            for position, found in zip(short, retried):
+                results[position] = found
+        return results
+
+    def _post_filter_fetch(self, where: Dict, top_k: int) -> Optional[int]:
+        """How many unfiltered results to fetch so ``top_k`` of them likely match.
+
+        Returns ``None`` when pushing ``where`` down to Chroma is cheaper (the
+        filter matches fewer chunks than would be fetched), and ``0`` when
+        nothing matches. Match counts are cached until the next write.
+        """
+        key = json.dumps(where, sort_keys=True)
+        with self._filter_stats_lock:
+            cached = self._filter_stats.get(key)
+        if cached is not None and cached[0] == self._generation:
+            _, matched, total = cached
+        else:
+            generation = self._generation
+            matched = len(self._matching_ids(where))
+            total = self.collection.count()
+            with self._filter_stats_lock:
+                if len(self._filter_stats) >= _FILTER_STATS_CACHE_SIZE:
+                    self._filter_stats.clear()
+                self._filter_stats[key] = (generation, matched, total)
+        if matched == 0:
             return 0
-        self.collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas,
-        )
-        return len(documents)
+        fetch = math.ceil(_POST_FILTER_OVERSAMPLE * top_k * total / matched)
+        if fetch >= matched or fetch > _POST_FILTER_MAX_FETCH:
+            return None
+        return fetch
 
-    def similarity_search(self, query: str, top_k: int) -> List[Dict]:
-        """Run a similarity search and return normalized results."""
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k,
-        )
-        normalized: List[Dict] = []
+    def _query(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict] = None,
+    ) -> List[List[Dict]]:
+        results = self.collection.query(query_embeddings=query_embeddings, n_results=top_k, where=where)
+        normalized: List[List[Dict]] = [[] for _ in query_embeddings]
         if not results or not results.get("documents"):
             return normalized
         docs: Sequence[Sequence[str]] = results["documents"]
-        metadatas: Sequence[Sequence[Dict]] = results.get("metadatas", [])
-        distances: Sequence[Sequence[float]] = results.get("distances", [])
-        ids: Sequence[Sequence[str]] = results.get("ids", [])
-        for index, document in enumerate(docs[0]):
-            normalized.append(
-                {
-                    "id": ids[0][index] if ids else "",
-                    "content": document,
-                    "metadata": metadatas[0][index] if metadatas else {},
-                    "score": distances[0][index] if distances else None,
-                }
-            )
+        metadatas: Sequence[Sequence[Dict]] = results.get("metadatas") or []
+        distances: Sequence[Sequence[float]] = results.get("distances") or []
+        ids: Sequence[Sequence[str]] = results.get("ids") or []
+        for position, documents in enumerate(docs):
+            for index, document in enumerate(documents):
+                normalized[position].append(
+                    {
+                        "id": ids[position][index] if ids else "",
+                        "content": document,
+                        "metadata": metadatas[position][index] if metadatas else {},
+                        "score": distances[position][index] if distances else None,
+                    }
+                )
         return normalized
+
+    def _fetch(self, ids: Sequence[str]) -> List[Dict]:
+        if not ids:
+            return []
+        results = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        found = {
+            doc_id: {"id": doc_id, "content": document, "metadata": metadata or {}, "score": None}
+            for doc_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [found[doc_id] for doc_id in ids if doc_id in found]
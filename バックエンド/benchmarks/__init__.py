@@ -0,0 +1 @@
+"""Reproducible performance benchmarks for the backend (run with ``python -m benchmarks.<name>``)."""
@@ -0,0 +1,83 @@
+"""Compare two benchmark reports and flag regressions.
+
+    python -m benchmarks.compare results/base.json results/new.json --tolerance 0.1
+
+Exits with status 1 when any metric got worse by more than ``--tolerance``
+(a fraction of the baseline), so it can gate CI. Throughput metrics
+(``*_per_second``, ``qps``) should go up; timings (``*_ms``, ``*seconds``)
+should go down; other numbers (counts) are shown but never flagged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+def flatten(value, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """Yield ``("a.b.c", number)`` for every numeric leaf."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def direction(metric: str) -> int:
+    """+1 when larger is better, -1 when smaller is better, 0 when neither."""
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith("per_second") or name == "qps" or name.startswith("recall"):
+        return 1
+    if name.endswith("_ms") or name.endswith("seconds"):
+        return -1
+    return 0
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> Tuple[List[Tuple], List[str]]:
+    old = dict(flatten(baseline.get("results", {})))
+    new = dict(flatten(current.get("results", {})))
+    rows, regressions = [], []
+    for metric in sorted(old.keys() & new.keys()):
+        before, after = old[metric], new[metric]
+        change = (after - before) / before if before else 0.0
+        sign = direction(metric)
+        regressed = sign != 0 and -sign * change > tolerance
+        rows.append((metric, before, after, change, regressed))
+        if regressed:
+            regressions.append(metric)
+    return rows, regressions
+
+
+def settings_diff(baseline: Dict, current: Dict) -> List[str]:
+    old, new = baseline.get("settings", {}), current.get("settings", {})
+    return [f"{key}: {old.get(key)!r} -> {new.get(key)!r}" for key in sorted(old.keys() | new.keys()) if old.get(key) != new.get(key)]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative change (default 0.1 = 10%%)")
+    args = parser.parse_args(argv)
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+    if baseline.get("benchmark") != current.get("benchmark"):
+        parser.error(f"reports come from different benchmarks: {baseline.get('benchmark')} / {current.get('benchmark')}")
+    for line in settings_diff(baseline, current):
+        print(f"setting  {line}")
+    rows, regressions = compare(baseline, current, args.tolerance)
+    width = max((len(row[0]) for row in rows), default=10)
+    for metric, before, after, change, regressed in rows:
+        marker = "REGRESSION" if regressed else ""
+        print(f"{metric:<{width}}  {before:>12.3f}  {after:>12.3f}  {change:>+8.1%}  {marker}")
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Synthetic Japanese and English documents shaped like internal manuals."""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+LANGUAGES = ("ja", "en")
+
+_JA_TOPICS = [
+    "年次休暇", "経費精算", "VPN接続", "勤怠管理", "情報セキュリティ", "出張申請", "社内研修", "人事評価",
+    "ソフトウェア導入", "パスワード変更", "会議室予約", "在宅勤務", "健康診断", "物品購入", "契約審査", "障害対応",
+]
+_JA_NOUNS = [
+    "申請書", "承認者", "システム", "担当部署", "手順", "期限", "規程", "利用者", "管理者", "設定画面",
+    "ポータル", "ワークフロー", "上長", "窓口", "証憑", "ネットワーク", "アカウント", "端末", "帳票", "マニュアル",
+]
+_JA_VERBS = [
+    "提出してください", "確認します", "登録する必要があります", "承認されます", "変更できます",
+    "問い合わせてください", "保存されます", "通知されます", "申請します", "更新されます",
+]
+_JA_CONNECTIVES = ["なお、", "また、", "ただし、", "その後、", "原則として、", ""]
+
+_EN_TOPICS = [
+    "annual leave", "expense reports", "VPN access", "time tracking", "information security", "business travel",
+    "onboarding", "performance review", "software requests", "password reset", "meeting rooms", "remote work",
+]
+_EN_NOUNS = [
+    "request form", "approver", "portal", "department", "procedure", "deadline", "policy", "employee",
+    "administrator", "settings page", "workflow", "manager", "help desk", "receipt", "network", "account",
+]
+_EN_VERBS = ["must submit", "should review", "can update", "will approve", "needs to register", "may contact"]
+
+
+def _ja_sentence(rng: random.Random, topic: str) -> str:
+    noun, other = rng.sample(_JA_NOUNS, 2)
+    code = f"E-{rng.randint(1000, 9999)}" if rng.random() < 0.1 else ""
+    return f"{rng.choice(_JA_CONNECTIVES)}{topic}の{noun}は{other}{code}で{rng.choice(_JA_VERBS)}。"
+
+
+def _en_sentence(rng: random.Random, topic: str) -> str:
+    noun, other = rng.sample(_EN_NOUNS, 2)
+    code = f" (error E-{rng.randint(1000, 9999)})" if rng.random() < 0.1 else ""
+    return f"For {topic}, the {noun} {rng.choice(_EN_VERBS)} the {other}{code}."
+
+
+def _document(rng: random.Random, language: str, paragraphs: int) -> str:
+    topics, sentence = (_JA_TOPICS, _ja_sentence) if language == "ja" else (_EN_TOPICS, _en_sentence)
+    topic = rng.choice(topics)
+    lines = [f"# {topic}", ""]
+    for index in range(paragraphs):
+        if index % 4 == 0:
+            lines += [f"## {topic} {index // 4 + 1}" if language == "en" else f"## {topic}（{index // 4 + 1}）", ""]
+        lines += [" ".join(sentence(rng, topic) for _ in range(rng.randint(3, 8))), ""]
+    return "\n".join(lines)
+
+
+def generate_corpus(
+    directory: Path,
+    files: int,
+    paragraphs: int,
+    languages: Sequence[str] = LANGUAGES,
+    seed: int = 0,
+) -> Dict:
+    """Write ``files`` Markdown documents of ``paragraphs`` paragraphs each, alternating ``languages``."""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    total_bytes = 0
+    for index in range(files):
+        language = languages[index % len(languages)]
+        path = directory / f"{language}/doc_{index:05d}.md"
+        path.parent.mkdir(exist_ok=True)
+        text = _document(rng, language, paragraphs)
+        path.write_text(text, encoding="utf-8")
+        total_bytes += len(text.encode("utf-8"))
+    return {"files": files, "paragraphs": paragraphs, "languages": list(languages), "megabytes": round(total_bytes / 1e6, 2)}
+
+
+def sample_questions(count: int, languages: Sequence[str] = LANGUAGES, seed: int = 0) -> List[str]:
+    """Distinct questions about the corpus topics, so no query hits the embedding cache."""
+    rng = random.Random(seed)
+    questions = []
+    for index in range(count):
+        if languages[index % len(languages)] == "ja":
+            question = f"{rng.choice(_JA_TOPICS)}の{rng.choice(_JA_NOUNS)}はどうすればよいですか"
+        else:
+            question = f"How do I handle the {rng.choice(_EN_NOUNS)} for {rng.choice(_EN_TOPICS)}"
+        questions.append(f"{question} ({index})")
+    return questions
@@ -0,0 +1,65 @@
+"""Local stand-ins for OpenAI and (optionally) the embedding model, so runs are offline and repeatable."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Sequence
+
+import numpy as np
+
+from app.embeddings import EmbeddingService
+
+
+class FakeLLMClient:
+    """Answers every prompt with a fixed text after ``latency_ms``, streaming it in ``chunks`` pieces."""
+
+    def __init__(self, latency_ms: float = 0.0, answer: str = "ベンチマーク用の回答です。[source:0]", chunks: int = 8):
+        self.model = "fake"
+        self.latency = latency_ms / 1000
+        self.answer = answer
+        self.chunks = max(chunks, 1)
+
+    async def generate(self, prompt: str, max_retries: int = 0, max_backoff: float = 30.0) -> str:
+        await asyncio.sleep(self.latency)
+        return self.answer
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        size = -(-len(self.answer) // self.chunks)
+        for start in range(0, len(self.answer), size):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield self.answer[start : start + size]
+
+
+class _HashingModel:
+    """Bag of hashed character bigrams; cheap, deterministic and similar texts get similar vectors."""
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, normalize_embeddings: bool = True, **_) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+            if len(codes) < 2:
+                continue
+            buckets = (codes[:-1] * 1_000_003 + codes[1:]) % self.dim
+            vectors[row] = np.bincount(buckets.astype(np.int64), minlength=self.dim)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors
+
+
+class HashingEmbeddingService(EmbeddingService):
+    """:class:`EmbeddingService` backed by :class:`_HashingModel` instead of sentence-transformers.
+
+    Use it to measure everything except model inference; embedding throughput
+    numbers from it say nothing about the real model.
+    """
+
+    def __init__(self, dim: int = 384, **kwargs) -> None:
+        super().__init__(model_name=f"hashing-bigram-{dim}", use_prefixes=False, **kwargs)
+        self.dim = dim
+
+    def _load_model(self):
+        return _HashingModel(self.dim)
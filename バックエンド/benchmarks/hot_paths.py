@@ -0,0 +1,306 @@
+"""Measure the ingest and query hot paths on a synthetic corpus with the current settings.
+
+Run from the backend directory; ``RAG_*`` variables and ``.env`` apply as in the server::
+
+    python -m benchmarks.hot_paths --files 200 --output results/base.json
+    RAG_CHUNK_SIZE=600 python -m benchmarks.hot_paths --files 200 --output results/chunk600.json
+    python -m benchmarks.compare results/base.json results/chunk600.json
+
+Stages:
+
+* ``loader``: ``DocumentLoader.load_file`` over every file (one process)
+* ``ingest``: ``RAGService.ingest`` end to end, with the pipeline's stage timings
+* ``embedding``: ``EmbeddingService.embed_documents`` over a sample of chunks
+* ``write``: ``VectorStore.add_chunks`` with precomputed embeddings (vectors and lexical index)
+* ``search``: ``VectorStore.similarity_search`` latency percentiles at each concurrency
+* ``query``: ``RAGService.query`` with a local fake LLM, at each concurrency
+
+``--embedder hashing`` replaces the embedding model with a hashing stand-in
+so the other stages can be measured without downloading a model.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import Settings
+from app.document_loader import DocumentChunk, discover_documents
+from app.rag_service import RAGService
+
+from .corpus import LANGUAGES, generate_corpus, sample_questions
+from .fakes import FakeLLMClient, HashingEmbeddingService
+
+# Settings recorded with every report, so two reports show what differed.
+_RECORDED_SETTINGS = (
+    "chunk_size",
+    "chunk_overlap",
+    "top_k",
+    "embedding_model",
+    "embedding_batch_size",
+    "embedding_threads",
+    "ingest_workers",
+    "write_batch_size",
+    "retrieval_mode",
+    "hybrid_candidates",
+    "two_tier_documents",
+    "rerank_enabled",
+    "context_max_tokens",
+    "vector_backend",
+    "mmap_vector_dtype",
+    "mmap_ivf_lists",
+    "mmap_ivf_probes",
+    "query_workers",
+    "max_concurrent_queries",
+)
+
+
+def latency_summary(latencies_ms: Sequence[float], wall_seconds: float) -> Dict:
+    values = np.asarray(latencies_ms)
+    return {
+        "count": len(values),
+        "qps": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def bench_loader(service: RAGService, files: List[Path]) -> Tuple[List[DocumentChunk], Dict]:
+    with service.collections.use() as kb:
+        started = time.perf_counter()
+        chunks = [chunk for path in files for chunk in kb.loader.load_file(path)]
+        seconds = time.perf_counter() - started
+    megabytes = sum(path.stat().st_size for path in files) / 1e6
+    return chunks, {
+        "files": len(files),
+        "chunks": len(chunks),
+        "seconds": round(seconds, 3),
+        "files_per_second": round(len(files) / seconds, 2),
+        "chunks_per_second": round(len(chunks) / seconds, 2),
+        "megabytes_per_second": round(megabytes / seconds, 3),
+    }
+
+
+def bench_embedding(service: RAGService, texts: List[str]) -> Tuple[List[List[float]], Dict]:
+    started = time.perf_counter()
+    embeddings = service.embedder.embed_documents(texts)
+    seconds = time.perf_counter() - started
+    return embeddings, {
+        "texts": len(texts),
+        "seconds": round(seconds, 3),
+        "texts_per_second": round(len(texts) / seconds, 2),
+    }
+
+
+def bench_write(service: RAGService, chunks: List[DocumentChunk], dim: int, seed: int) -> Dict:
+    """Write every chunk into a scratch collection with random unit vectors."""
+    rng = np.random.default_rng(seed)
+    batch_size = service.settings.write_batch_size
+    with service.collections.use("benchmark-write", create=True) as kb:
+        started = time.perf_counter()
+        for start in range(0, len(chunks), batch_size):
+            batch = [
+                DocumentChunk(id=f"write-{start + offset}", content=chunk.content, metadata=dict(chunk.metadata))
+                for offset, chunk in enumerate(chunks[start : start + batch_size])
+            ]
+            vectors = rng.normal(size=(len(batch), dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            kb.vector_store.add_chunks(batch, embeddings=vectors.tolist())
+        add_seconds = time.perf_counter() - started
+        kb.vector_store.commit()
+        seconds = time.perf_counter() - started
+    return {
+        "chunks": len(chunks),
+        "seconds": round(seconds, 3),
+        "commit_seconds": round(seconds - add_seconds, 3),
+        "chunks_per_second": round(len(chunks) / seconds, 2),
+    }
+
+
+def bench_search(service: RAGService, questions: List[str], concurrency: int) -> Dict:
+    settings = service.settings
+
+    def search(question: str) -> float:
+        started = time.perf_counter()
+        kb.vector_store.similarity_search(
+            question,
+            top_k=settings.top_k,
+            mode=settings.retrieval_mode,
+            candidates=settings.hybrid_candidates,
+            documents=settings.two_tier_documents,
+        )
+        return (time.perf_counter() - started) * 1000
+
+    with service.collections.use() as kb, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        latencies = list(pool.map(search, questions))
+        wall = time.perf_counter() - started
+    return {"concurrency": concurrency, **latency_summary(latencies, wall)}
+
+
+async def bench_queries(service: RAGService, question_sets: Dict[int, List[str]]) -> Dict[str, Dict]:
+    results = {}
+    for concurrency, questions in question_sets.items():
+        slots = asyncio.Semaphore(concurrency)
+        embed_ms: List[float] = []
+        search_ms: List[float] = []
+
+        async def ask(question: str) -> float:
+            async with slots:
+                started = time.perf_counter()
+                answer = await service.query(question)
+                embed_ms.append(answer["timings"].get("embed_ms", 0.0))
+                search_ms.append(answer["timings"].get("search_ms", 0.0))
+                return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(ask(question) for question in questions))
+        wall = time.perf_counter() - started
+        results[f"concurrency_{concurrency}"] = {
+            "concurrency": concurrency,
+            **latency_summary(latencies, wall),
+            "embed_p50_ms": round(float(np.percentile(embed_ms, 50)), 3),
+            "search_p50_ms": round(float(np.percentile(search_ms, 50)), 3),
+        }
+    await service.aclose()
+    return results
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "git_commit": commit,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict:
+    workdir = Path(args.workdir)
+    shutil.rmtree(workdir, ignore_errors=True)
+    corpus = generate_corpus(workdir / "source", args.files, args.paragraphs, args.languages, seed=args.seed)
+    settings = Settings(
+        source_dir=workdir / "source",
+        vector_store_dir=workdir / "store",
+        collections_dir=workdir / "collections",
+        # Every question is distinct, but similar ones would still hit the semantic cache.
+        answer_cache_enabled=False,
+        warmup_enabled=False,
+    )
+    settings.resolve_paths()
+    embedder = None
+    if args.embedder == "hashing":
+        embedder = HashingEmbeddingService(
+            dim=args.hashing_dim,
+            batch_size=settings.embedding_batch_size,
+            query_cache_size=settings.query_embedding_cache_size,
+            batch_window_ms=settings.embedding_batch_window_ms,
+            max_query_batch=settings.embedding_max_query_batch,
+        )
+    service = RAGService(settings=settings, embedder=embedder)
+    service.llm_client = FakeLLMClient(latency_ms=args.llm_latency_ms)
+    results: Dict = {}
+
+    files = discover_documents(settings.source_dir)
+    chunks, results["loader"] = bench_loader(service, files)
+    _progress("loader", results["loader"])
+    results["ingest"] = service.ingest()
+    _progress("ingest", results["ingest"])
+    sample = [chunk.content for chunk in chunks[: args.embed_sample]]
+    embeddings, results["embedding"] = bench_embedding(service, sample)
+    _progress("embedding", results["embedding"])
+    results["write"] = bench_write(service, chunks, dim=len(embeddings[0]), seed=args.seed)
+    _progress("write", results["write"])
+
+    results["search"] = {}
+    for concurrency in args.concurrency:
+        questions = sample_questions(args.queries, args.languages, seed=args.seed * 1000 + concurrency)
+        results["search"][f"concurrency_{concurrency}"] = bench_search(service, questions, concurrency)
+        _progress(f"search c={concurrency}", results["search"][f"concurrency_{concurrency}"])
+    question_sets = {
+        concurrency: sample_questions(args.queries, args.languages, seed=args.seed * 1000 + 500 + concurrency)
+        for concurrency in args.concurrency
+    }
+    results["query"] = asyncio.run(bench_queries(service, question_sets))
+    _progress("query", results["query"])
+
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "benchmark": "hot_paths",
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "settings": {name: getattr(settings, name) for name in _RECORDED_SETTINGS},
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "workdir", "keep")
+        },
+        "corpus": corpus,
+        "results": results,
+    }
+
+
+def _progress(stage: str, result: Dict) -> None:
+    print(f"[{stage}] {json.dumps(result, ensure_ascii=False)}", file=sys.stderr)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--files", type=int, default=200, help="documents in the synthetic corpus")
+    parser.add_argument("--paragraphs", type=int, default=40, help="paragraphs per document")
+    parser.add_argument("--languages", type=lambda value: value.split(","), default=list(LANGUAGES))
+    parser.add_argument("--queries", type=int, default=200, help="questions per concurrency level")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16])
+    parser.add_argument("--embed-sample", type=int, default=2000, help="chunks embedded by the embedding stage")
+    parser.add_argument("--embedder", choices=("model", "hashing"), default="model")
+    parser.add_argument("--hashing-dim", type=int, default=384)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="delay of the fake LLM per answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default="data/benchmarks/hot_paths")
+    parser.add_argument("--keep", action="store_true", help="keep the corpus and stores in --workdir")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    unknown = set(args.languages) - set(LANGUAGES)
+    if unknown:
+        parser.error(f"unknown languages: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    report = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
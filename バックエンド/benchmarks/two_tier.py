@@ -0,0 +1,193 @@
+"""Compare flat vector search with two-tier (documents first, then their chunks) retrieval.
+
+Run from the backend directory::
+
+    python -m benchmarks.two_tier --documents 2000 --chunks-per-document 50 --output two_tier.json
+
+Embeddings are synthetic and hierarchical: documents scatter around topics
+and chunks around their document, so a question about one document also
+resembles the rest of its topic, as with a shelf of similar manuals. A share
+of every document's chunks (``--mixed-share``) is about another document,
+like an appendix, which is what a document shortlist can miss. Recall
+is measured against exact flat search; each backend reports flat latency and
+then latency and recall for every ``--shortlists`` value (documents searched).
+The ``filtered`` section repeats both with a metadata filter matching one of
+``--shelves`` groups of documents, against exact search over that group.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.document_index import DOCUMENT_INDEX_FILENAME, DocumentIndex
+from app.document_loader import DocumentChunk
+
+from .vector_backends import exact_neighbors, open_store, percentile
+
+BACKENDS = ("chroma", "mmap-int8", "mmap-float16")
+_WRITE_BATCH = 512
+_WARMUP_QUERIES = 10
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def hierarchical_corpus(args: argparse.Namespace):
+    """Chunk embeddings, the document of each chunk, and queries drawn near random documents."""
+    rng = np.random.default_rng(args.seed)
+    topics = rng.normal(size=(args.topics, args.dim)).astype(np.float32)
+    documents = topics[rng.integers(args.topics, size=args.documents)]
+    documents += args.document_spread * rng.normal(size=documents.shape).astype(np.float32)
+    owner = np.repeat(np.arange(args.documents), args.chunks_per_document)
+    about = owner.copy()
+    mixed = rng.random(len(owner)) < args.mixed_share
+    about[mixed] = rng.integers(args.documents, size=int(mixed.sum()))
+    chunks = _unit(documents[about] + args.chunk_spread * rng.normal(size=(len(owner), args.dim)).astype(np.float32))
+    asked = rng.integers(args.documents, size=args.queries)
+    queries = _unit(documents[asked] + args.chunk_spread * rng.normal(size=(args.queries, args.dim)).astype(np.float32))
+    return chunks, owner, queries
+
+
+def build(backend: str, directory: Path, chunks: np.ndarray, owner: np.ndarray, shelves: int):
+    store = open_store(backend, directory / "store", ivf_lists=0, ivf_probes=1)
+    store.document_index = DocumentIndex(directory / DOCUMENT_INDEX_FILENAME)
+    started = time.perf_counter()
+    for start in range(0, len(chunks), _WRITE_BATCH):
+        rows = range(start, min(start + _WRITE_BATCH, len(chunks)))
+        batch = [
+            DocumentChunk(
+                id=str(row),
+                content=f"chunk {row}",
+                metadata={"path": f"doc{owner[row]}.md", "shelf": int(owner[row] % shelves)},
+            )
+            for row in rows
+        ]
+        store.add_chunks(batch, embeddings=chunks[start : rows.stop].tolist())
+    for document in range(int(owner.max()) + 1):
+        store.index_document(f"doc{document}.md", chunks[owner == document])
+    store.commit()
+    return store, time.perf_counter() - started
+
+
+def measure(
+    store,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    top_k: int,
+    mode: str,
+    documents: int = 0,
+    where: Optional[Dict] = None,
+) -> Dict:
+    def search(embedding: np.ndarray) -> List[Dict]:
+        return store.similarity_search(
+            "", top_k, query_embedding=embedding.tolist(), mode=mode, documents=documents, where=where
+        )
+
+    for embedding in queries[:_WARMUP_QUERIES]:
+        search(embedding)
+    latencies: List[float] = []
+    recalls: List[float] = []
+    for embedding, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = search(embedding)
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len({int(item["id"]) for item in results} & set(expected.tolist())) / top_k)
+    return {
+        f"recall_at_{top_k}": round(float(np.mean(recalls)), 4),
+        "latency_ms": {
+            "mean": round(float(np.mean(latencies)), 3),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+        },
+    }
+
+
+def run(args: argparse.Namespace) -> Dict:
+    workdir = Path(args.workdir)
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    chunks, owner, queries = hierarchical_corpus(args)
+    truth = exact_neighbors(chunks, queries, args.top_k)
+    shelf = np.flatnonzero(owner % args.shelves == 0)
+    shelf_truth = shelf[exact_neighbors(chunks[shelf], queries, args.top_k)]
+    where = {"shelf": 0}
+    results = []
+    for backend in args.backends:
+        store, build_seconds = build(backend, workdir / backend, chunks, owner, args.shelves)
+        result = {
+            "backend": backend,
+            "build_seconds": round(build_seconds, 2),
+            "flat": measure(store, queries, truth, args.top_k, "vector"),
+            "two_tier": [
+                {"documents": documents, **measure(store, queries, truth, args.top_k, "two_tier", documents)}
+                for documents in args.shortlists
+            ],
+            "filtered": {
+                "flat": measure(store, queries, shelf_truth, args.top_k, "vector", where=where),
+                "two_tier": [
+                    {
+                        "documents": documents,
+                        **measure(store, queries, shelf_truth, args.top_k, "two_tier", documents, where),
+                    }
+                    for documents in args.shortlists
+                ],
+            },
+        }
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "workdir", "keep")}
+    return {"benchmark": "two_tier", "config": {**config, "chunks": len(chunks)}, "results": results}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--chunks-per-document", type=int, default=50)
+    parser.add_argument("--topics", type=int, default=40, help="topics the documents are drawn around")
+    parser.add_argument("--document-spread", type=float, default=0.5, help="noise between a topic and its documents")
+    parser.add_argument("--chunk-spread", type=float, default=0.8, help="noise between a document and its chunks")
+    parser.add_argument("--mixed-share", type=float, default=0.1, help="share of chunks about another document")
+    parser.add_argument("--shelves", type=int, default=10, help="groups of documents; one is the filter target")
+    parser.add_argument("--dim", type=int, default=384, help="384 matches multilingual-e5-small")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument(
+        "--shortlists",
+        type=lambda value: [int(item) for item in value.split(",")],
+        default=[5, 10, 20, 50],
+        help="documents searched by two_tier, comma-separated",
+    )
+    parser.add_argument("--backends", type=lambda value: value.split(","), default=list(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default="data/benchmarks/two_tier")
+    parser.add_argument("--keep", action="store_true", help="keep the built stores in --workdir")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))} (choose from {', '.join(BACKENDS)})")
+    return args
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Compare vector store backends on recall, query latency, memory and build speed.
+
+Run from the backend directory::
+
+    python -m benchmarks.vector_backends --chunks 50000 --dim 384 --output vector_backends.json
+
+Embeddings are synthetic (clustered, normalized like e5 output), so no model
+is downloaded. Each backend is built and then queried in fresh processes;
+the query process reports its resident memory split into anonymous (private)
+and file-backed pages, the latter being shared between worker processes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from app.document_loader import DocumentChunk
+from app.embeddings import EmbeddingService
+from app.mmap_store import MmapVectorStore
+from app.vector_store import ChromaVectorStore, VectorStore
+
+BACKENDS = ("chroma", "mmap-int8", "mmap-float16", "mmap-int8-ivf", "mmap-float16-ivf")
+_WRITE_BATCH = 512
+_WARMUP_QUERIES = 10
+
+
+def synthetic_embeddings(count: int, dim: int, clusters: int, seed: int, topic_seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around ``clusters`` topics, roughly like sentence embeddings of a corpus.
+
+    The topics depend only on ``topic_seed``, so queries drawn with another
+    ``seed`` ask about the same topics as the corpus.
+    """
+    centers = np.random.default_rng(topic_seed).normal(size=(clusters, dim)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_neighbors(corpus: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    neighbors = []
+    norms = (corpus**2).sum(axis=1)
+    for query in queries:
+        distances = norms - 2 * corpus @ query
+        nearest = np.argpartition(distances, top_k)[:top_k]
+        neighbors.append(nearest[np.argsort(distances[nearest])])
+    return np.asarray(neighbors)
+
+
+def memory_mb() -> Dict[str, float]:
+    """Resident memory of this process from ``/proc`` (Linux), else peak RSS only."""
+    try:
+        status = Path("/proc/self/status").read_text()
+    except OSError:
+        import resource
+
+        return {"peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    fields = {"VmRSS": "rss_mb", "RssAnon": "rss_anon_mb", "RssFile": "rss_file_mb", "VmHWM": "peak_rss_mb"}
+    values = {}
+    for line in status.splitlines():
+        key, _, value = line.partition(":")
+        if key in fields:
+            values[fields[key]] = round(int(value.split()[0]) / 1024, 1)
+    return values
+
+
+def open_store(backend: str, directory: Path, ivf_lists: int, ivf_probes: int) -> VectorStore:
+    embedder = EmbeddingService("benchmark")  # embeddings are passed in; the model is never loaded
+    if backend == "chroma":
+        return ChromaVectorStore(directory, "benchmark", embedder)
+    _, dtype, *ivf = backend.split("-")
+    return MmapVectorStore(
+        directory,
+        "benchmark",
+        embedder,
+        dtype=dtype,
+        ivf_lists=ivf_lists if ivf else 0,
+        ivf_probes=ivf_probes,
+    )
+
+
+def build(backend: str, directory: str, corpus_path: str, ivf_lists: int, ivf_probes: int) -> Dict:
+    corpus = np.load(corpus_path, mmap_mode="r")
+    store = open_store(backend, Path(directory), ivf_lists, ivf_probes)
+    started = time.perf_counter()
+    for start in range(0, len(corpus), _WRITE_BATCH):
+        batch = corpus[start : start + _WRITE_BATCH]
+        chunks = [
+            DocumentChunk(id=str(row), content=f"chunk {row}", metadata={"source": f"doc{row // 20}.md"})
+            for row in range(start, start + len(batch))
+        ]
+        store.add_chunks(chunks, embeddings=np.asarray(batch).tolist())
+    store.commit()
+    seconds = time.perf_counter() - started
+    return {"build_seconds": round(seconds, 2), "chunks_per_second": round(len(corpus) / seconds, 1)}
+
+
+def query(backend: str, directory: str, queries_path: str, top_k: int, ivf_lists: int, ivf_probes: int) -> Dict:
+    baseline = memory_mb()
+    queries = np.load(queries_path)
+    store = open_store(backend, Path(directory), ivf_lists, ivf_probes)
+    for embedding in queries[:_WARMUP_QUERIES]:
+        store.similarity_search("", top_k, query_embedding=embedding.tolist())
+    latencies: List[float] = []
+    found: List[List[int]] = []
+    for embedding in queries:
+        started = time.perf_counter()
+        results = store.similarity_search("", top_k, query_embedding=embedding.tolist())
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append([int(item["id"]) for item in results])
+    return {
+        "latencies_ms": latencies,
+        "found": found,
+        "memory_baseline_mb": baseline.get("rss_mb"),
+        "memory_mb": memory_mb(),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3)
+
+
+def directory_mb(path: Path) -> float:
+    return round(sum(item.stat().st_size for item in path.rglob("*") if item.is_file()) / 1024 / 1024, 1)
+
+
+def run(args: argparse.Namespace) -> Dict:
+    workdir = Path(args.workdir)
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    corpus = synthetic_embeddings(args.chunks, args.dim, args.clusters, seed=args.seed + 1, topic_seed=args.seed)
+    queries = synthetic_embeddings(args.queries, args.dim, args.clusters, seed=args.seed + 2, topic_seed=args.seed)
+    np.save(workdir / "corpus.npy", corpus)
+    np.save(workdir / "queries.npy", queries)
+    truth = exact_neighbors(corpus, queries, args.top_k)
+    ivf_lists = args.ivf_lists or max(int(math.sqrt(args.chunks)), 1)
+    results = []
+    for backend in args.backends:
+        store_dir = workdir / backend
+        # Fresh processes, so one backend's memory never counts against another.
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            built = pool.submit(
+                build, backend, str(store_dir), str(workdir / "corpus.npy"), ivf_lists, args.ivf_probes
+            ).result()
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            measured = pool.submit(
+                query, backend, str(store_dir), str(workdir / "queries.npy"), args.top_k, ivf_lists, args.ivf_probes
+            ).result()
+        latencies = measured["latencies_ms"]
+        recall = np.mean(
+            [len(set(found) & set(expected.tolist())) / args.top_k for found, expected in zip(measured["found"], truth)]
+        )
+        result = {
+            "backend": backend,
+            **built,
+            "disk_mb": directory_mb(store_dir),
+            f"recall_at_{args.top_k}": round(float(recall), 4),
+            "latency_ms": {
+                "mean": round(float(np.mean(latencies)), 3),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+            },
+            "memory_baseline_mb": measured["memory_baseline_mb"],
+            "memory_mb": measured["memory_mb"],
+        }
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "workdir", "keep")}
+    return {"benchmark": "vector_backends", "config": {**config, "ivf_lists": ivf_lists}, "results": results}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384, help="384 matches multilingual-e5-small")
+    parser.add_argument("--clusters", type=int, default=200, help="topics the synthetic corpus is drawn from")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--ivf-lists", type=int, default=0, help="IVF lists for *-ivf backends (default sqrt(chunks))")
+    parser.add_argument("--ivf-probes", type=int, default=8)
+    parser.add_argument("--backends", type=lambda value: value.split(","), default=list(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default="data/benchmarks/vector_backends")
+    parser.add_argument("--keep", action="store_true", help="keep the built stores in --workdir")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))} (choose from {', '.join(BACKENDS)})")
+    return args
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
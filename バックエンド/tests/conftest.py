@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the backend as ``app``, as ``uvicorn app.main:app`` does.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.tokens import TokenCounter  # noqa: E402
+
+
+class ByteEncoding:
+    """A tiktoken stand-in with one token per UTF-8 byte, so kanji take several tokens as in cl100k/o200k."""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="replace")
+
+    def decode_bytes(self, tokens):
+        return bytes(tokens)
+
+
+@pytest.fixture
+def byte_counter() -> TokenCounter:
+    counter = TokenCounter("gpt-4o-mini")
+    counter._encoding, counter._loaded = ByteEncoding(), True
+    return counter
@@ -0,0 +1,65 @@
+import sys
+
+import pytest
+
+from app.chunker import TokenChunker, iter_segments
+from app.tokens import TokenCounter
+
+DOCUMENT = (
+    "# 経費精算\n\n"
+    "経費は月末までに申請する。領収書を添付すること。\n\n"
+    "## 締め日\n\n"
+    "締め日は毎月25日です。" + "遅れた申請は翌月扱いになる。" * 12 + "\n\n"
+    "# VPN接続\n\n"
+    + "VPNクライアントを起動して社内ネットワークに接続する手順" * 8
+    + "\n"
+)
+
+
+def blocks(text, size):
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("block_size", [7, 64, 100000])
+def test_segments_cover_the_document_in_order(block_size):
+    segments = list(iter_segments(blocks(DOCUMENT, block_size)))
+    for segment in segments:
+        assert DOCUMENT[segment.start : segment.end] == segment.text
+    assert [segment.start for segment in segments] == sorted(segment.start for segment in segments)
+    assert segments[0].headings == ("経費精算",)
+    assert segments[-1].headings == ("VPN接続",)
+
+
+@pytest.mark.parametrize("tokenizer", ["bytes", "estimate"])
+def test_chunks_fit_and_offsets_match_the_text(tokenizer, byte_counter, monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    counter = byte_counter if tokenizer == "bytes" else TokenCounter("gpt-4o-mini")
+    chunker = TokenChunker(counter, chunk_size=40, chunk_overlap=8)
+    chunks = list(chunker.chunks(blocks(DOCUMENT, 50)))
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert counter.count(chunk.text) <= 40
+        assert DOCUMENT[chunk.start : chunk.end] == chunk.text
+        assert "�" not in chunk.text
+
+
+def test_long_sentence_is_cut_without_losing_characters(byte_counter):
+    counter = byte_counter
+    text = "漢" * 50 + "字" * 50
+    chunker = TokenChunker(counter, chunk_size=20, chunk_overlap=0)
+    chunks = list(chunker.chunks([text]))
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert all(counter.count(chunk.text) <= 20 for chunk in chunks)
+    assert [chunk.start for chunk in chunks] == [sum(len(c.text) for c in chunks[:i]) for i in range(len(chunks))]
+
+
+def test_chunks_do_not_span_headings(byte_counter):
+    chunker = TokenChunker(byte_counter, chunk_size=400, chunk_overlap=0)
+    for chunk in chunker.chunks([DOCUMENT]):
+        body = chunk.text.split("\n", 1)[1] if chunk.text.startswith("#") else chunk.text
+        assert "\n# " not in "\n" + body
+
+
+def test_overlap_must_be_smaller_than_chunk_size(byte_counter):
+    with pytest.raises(ValueError):
+        TokenChunker(byte_counter, chunk_size=10, chunk_overlap=10)
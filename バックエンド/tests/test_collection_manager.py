@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.collection_manager import CollectionManager, CollectionNotFound
+from app.config import Settings
+from app.embeddings import EmbeddingService
+
+
+class FakeKnowledgeBase:
+    def __init__(self, name):
+        self.name = name
+        self.users = 0
+        self.last_used = 0.0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    settings = Settings(
+        source_dir=tmp_path / "source",
+        vector_store_dir=tmp_path / "store",
+        collections_dir=tmp_path / "collections",
+        max_open_collections=1,
+    )
+    manager = CollectionManager(settings, EmbeddingService("test"))
+    manager.builds = []
+    manager.started = threading.Event()
+    manager.gate = threading.Event()
+    manager.gate.set()
+
+    def build(name):
+        manager.builds.append(name)
+        manager.started.set()
+        assert manager.gate.wait(5)
+        return FakeKnowledgeBase(name)
+
+    monkeypatch.setattr(manager, "_build", build)
+    return manager
+
+
+def test_slow_open_does_not_block_other_collections(manager):
+    with manager.use() as default:
+        manager.started.clear()
+        manager.gate.clear()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            opening = pool.submit(lambda: manager.acquire("slow-one", create=True))
+            assert manager.started.wait(5)
+            # Neither an open collection nor the bookkeeping waits for the build.
+            with manager.use() as again:
+                assert again is default
+            assert manager.open_collections() == {manager.default_name: 1}
+            manager.gate.set()
+            slow = opening.result(5)
+        manager.release(slow)
+
+
+def test_concurrent_users_share_one_build(manager):
+    manager.gate.clear()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(manager.acquire, "shared", True) for _ in range(4)]
+        manager.gate.set()
+        kbs = [future.result(5) for future in futures]
+    assert manager.builds == ["shared"]
+    assert all(kb is kbs[0] for kb in kbs) and kbs[0].users == 4
+    for kb in kbs:
+        manager.release(kb)
+
+
+def test_idle_collections_are_evicted_and_closed(manager):
+    with manager.use() as default:
+        pass
+    with manager.use("other", create=True):
+        pass
+    assert default.closed and list(manager.open_collections()) == ["other"]
+    with pytest.raises(CollectionNotFound):
+        manager.acquire("missing")
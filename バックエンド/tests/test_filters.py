@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.filters import SearchFilter, folder_metadata, matches
+
+EPOCH_2024 = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+
+
+def chunk(**metadata):
+    return {"source": "a.md", "extension": "md", "ingested_at": EPOCH_2024, **metadata}
+
+
+def test_empty_filter_restricts_nothing():
+    assert SearchFilter().to_where() is None
+
+
+def test_single_condition_is_not_wrapped():
+    assert SearchFilter(sources=["a.md", " a.md "]).to_where() == {"source": "a.md"}
+    assert SearchFilter(extensions=[".PDF", "md"]).to_where() == {"extension": {"$in": ["pdf", "md"]}}
+
+
+def test_conditions_are_combined_with_and():
+    where = SearchFilter(
+        path_prefixes=["hr/", "it/servers"],
+        ingested_after=datetime(2024, 1, 1),
+        tags=["Policy", "policy", "draft"],
+    ).to_where()
+    assert where == {
+        "$and": [
+            {"$or": [{"folder_1": "hr"}, {"folder_2": "it/servers"}]},
+            {"ingested_at": {"$gte": EPOCH_2024}},
+            {"tag_policy": True},
+            {"tag_draft": True},
+        ]
+    }
+
+
+def test_root_folder_matches_everything():
+    assert SearchFilter(path_prefixes=["/", "hr"]).to_where() is None
+
+
+@pytest.mark.parametrize(
+    "search_filter",
+    [
+        SearchFilter(sources=[]),
+        SearchFilter(sources=[" "]),
+        SearchFilter(path_prefixes=[]),
+        SearchFilter(path_prefixes=["hr/../secret"]),
+        SearchFilter(tags=[""]),
+    ],
+)
+def test_unmatchable_values_raise(search_filter):
+    with pytest.raises(ValueError):
+        search_filter.to_where()
+
+
+def test_matches_evaluates_to_where_like_chroma():
+    where = SearchFilter(
+        path_prefixes=["hr"], extensions=["md", "txt"], ingested_before=datetime(2025, 1, 1), tags=["policy"]
+    ).to_where()
+    hr = folder_metadata("hr/policies")
+
+    assert matches(where, chunk(**hr, tag_policy=True))
+    assert not matches(where, chunk(**hr))
+    assert not matches(where, chunk(**folder_metadata("it"), tag_policy=True))
+    assert not matches(where, chunk(**hr, tag_policy=True, extension="pdf"))
+    assert not matches(where, chunk(**hr, tag_policy=True, ingested_at=EPOCH_2024 * 2))
+
+
+def test_matches_never_compares_mismatched_types():
+    assert not matches({"ingested_at": {"$gte": 0}}, {"ingested_at": "yesterday"})
+    assert not matches({"ingested_at": {"$lt": 10}}, {})
+    assert matches({"source": {"$nin": ["b.md"]}}, chunk())
@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from app import document_loader, ingest_pipeline
+from app.document_loader import DocumentLoader
+from app.ingest_pipeline import IngestPipeline
+
+PARAGRAPH = "The expense report is due at the end of the month. Receipts are attached as PDF files.\n\n"
+
+
+class RecordingStore:
+    """Just the vector store calls the pipeline makes, with a fake embedding per chunk."""
+
+    def __init__(self):
+        self.chunks = {}
+        self.writes = []
+        self.documents = {}
+
+    def embed(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def add_chunks(self, chunks, embeddings):
+        self.writes.append(len(chunks))
+        for chunk in chunks:
+            self.chunks[chunk.id] = chunk
+        return len(chunks)
+
+    def delete_ids(self, ids):
+        return sum(self.chunks.pop(chunk_id, None) is not None for chunk_id in ids)
+
+    def index_document(self, path, embeddings):
+        self.documents[path] = np.asarray(embeddings, dtype=np.float32)
+
+
+class Recorder:
+    def __init__(self):
+        self.prepared = []
+        self.done = {}
+        self.failed = {}
+
+    def prepare(self, file_path, chunks, first_index):
+        self.prepared.append((file_path.name, first_index, len(chunks)))
+        for index, chunk in enumerate(chunks, start=first_index):
+            chunk.id = f"{file_path.name}:{index}"
+
+    def on_file_done(self, file_path, chunk_count):
+        self.done[file_path.name] = chunk_count
+
+    def on_file_error(self, file_path, error):
+        self.failed[file_path.name] = error
+
+
+def run(tmp_path, files, workers=1, write_batch_size=8):
+    store, recorder = RecordingStore(), Recorder()
+    loader = DocumentLoader(chunk_size=30, chunk_overlap=0, root_dir=tmp_path)
+    pipeline = IngestPipeline(loader, store, workers=workers, write_batch_size=write_batch_size)
+    stats = pipeline.run(files, recorder.prepare, recorder.on_file_done, recorder.on_file_error)
+    return store, recorder, stats
+
+
+def test_large_file_is_written_while_it_is_still_being_chunked(tmp_path, monkeypatch):
+    path = tmp_path / "export.md"
+    path.write_text(PARAGRAPH * 200, encoding="utf-8")
+    yielded = []
+    original = DocumentLoader.iter_chunks
+
+    def counting_iter_chunks(self, file_path, content_hash=None):
+        for chunk in original(self, file_path, content_hash):
+            yielded.append(chunk)
+            yield chunk
+
+    monkeypatch.setattr(DocumentLoader, "iter_chunks", counting_iter_chunks)
+    first_write = []
+    monkeypatch.setattr(RecordingStore, "embed", lambda self, texts: first_write.append(len(yielded)) or [[1.0]] * len(texts))
+
+    store, recorder, stats = run(tmp_path, [path])
+
+    total = recorder.done["export.md"]
+    assert total == len(yielded) > 50
+    assert first_write[0] <= 8
+    assert max(store.writes) <= 8
+    assert [first for _, first, _ in recorder.prepared] == list(range(0, total, 8))
+    assert sorted(store.chunks) == sorted(f"export.md:{index}" for index in range(total))
+
+
+def test_document_embedding_is_the_mean_of_every_page(tmp_path):
+    path = tmp_path / "a.md"
+    path.write_text(PARAGRAPH * 20, encoding="utf-8")
+
+    store, recorder, _ = run(tmp_path, [path], write_batch_size=3)
+
+    lengths = [len(chunk.content) for chunk in store.chunks.values()]
+    mean = np.asarray([np.mean(lengths), 1.0])
+    recorded = store.documents[str(path)].mean(axis=0)
+    assert np.allclose(recorded / np.linalg.norm(recorded), mean / np.linalg.norm(mean))
+
+
+def test_file_failing_midway_leaves_no_chunks_behind(tmp_path, monkeypatch):
+    # Small read blocks, so the bad bytes are only reached after the first pages were written.
+    monkeypatch.setattr(document_loader, "_READ_BLOCK_BYTES", 1024)
+    broken = tmp_path / "broken.md"
+    broken.write_bytes((PARAGRAPH * 50).encode("utf-8") + b"\xff\xfe")
+    good = tmp_path / "good.md"
+    good.write_text(PARAGRAPH * 5, encoding="utf-8")
+
+    store, recorder, stats = run(tmp_path, [broken, good])
+
+    assert isinstance(recorder.failed["broken.md"], UnicodeDecodeError)
+    assert "broken.md" not in recorder.done and stats.failed_files == 1
+    assert any(first > 0 for name, first, _ in recorder.prepared if name == "broken.md")
+    assert all(chunk_id.startswith("good.md:") for chunk_id in store.chunks)
+    assert len(store.chunks) == recorder.done["good.md"] > 0
+
+
+def test_worker_pool_streams_large_files_in_process(tmp_path, monkeypatch):
+    small, large = tmp_path / "small.md", tmp_path / "large.md"
+    small.write_text(PARAGRAPH * 3, encoding="utf-8")
+    large.write_text(PARAGRAPH * 40, encoding="utf-8")
+    monkeypatch.setattr(ingest_pipeline, "STREAM_FILE_BYTES", large.stat().st_size - 1)
+
+    pooled, recorder, _ = run(tmp_path, [small, large], workers=2)
+    serial, expected, _ = run(tmp_path, [small, large])
+
+    assert recorder.done == expected.done
+    assert {key: chunk.content for key, chunk in pooled.chunks.items()} == {
+        key: chunk.content for key, chunk in serial.chunks.items()
+    }
+    # The large file arrived in pages, the small one whole from a worker.
+    assert [first for name, first, _ in recorder.prepared if name == "large.md"][1:] != []
+    assert [first for name, first, _ in recorder.prepared if name == "small.md"] == [0]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_empty_file_is_prepared_and_recorded(tmp_path, workers):
+    path = tmp_path / "empty.md"
+    path.write_text("", encoding="utf-8")
+
+    store, recorder, _ = run(tmp_path, [path], workers=workers)
+
+    assert recorder.prepared == [("empty.md", 0, 0)]
+    assert recorder.done == {"empty.md": 0}
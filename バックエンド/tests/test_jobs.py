@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from app.jobs import IngestJobManager, JobStatus
+
+
+@pytest.fixture
+def manager():
+    manager = IngestJobManager(max_workers=2, history_size=50)
+    yield manager
+    manager.shutdown()
+
+
+def blocking_runner(release: threading.Event, started: threading.Event = None):
+    def run(job):
+        if started is not None:
+            started.set()
+        assert release.wait(5)
+        return {"ok": True}
+
+    return run
+
+
+def wait_for(job, status):
+    for _ in range(500):
+        if job.status is status:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job stayed {job.status}, expected {status}")
+
+
+def test_queued_jobs_of_one_collection_leave_threads_to_others(manager):
+    release, started = threading.Event(), threading.Event()
+    running = manager.submit("a", None, blocking_runner(release, started))
+    assert started.wait(5)
+    waiting = manager.submit("a", None, blocking_runner(release))
+    other = manager.submit("b", None, lambda job: {"ok": True})
+
+    wait_for(other, JobStatus.SUCCEEDED)
+    assert running.status is JobStatus.RUNNING and waiting.status is JobStatus.QUEUED
+
+    release.set()
+    wait_for(waiting, JobStatus.SUCCEEDED)
+    assert running.status is JobStatus.SUCCEEDED
+
+
+def test_cancelling_a_queued_job_finishes_it_at_once(manager):
+    release, started = threading.Event(), threading.Event()
+    running = manager.submit("a", None, blocking_runner(release, started))
+    assert started.wait(5)
+    ran = []
+    waiting = manager.submit("a", None, ran.append)
+
+    manager.cancel(waiting.id)
+    assert waiting.status is JobStatus.CANCELLED and manager.queued() == 0
+
+    release.set()
+    wait_for(running, JobStatus.SUCCEEDED)
+    assert ran == []
+
+
+def test_jobs_of_one_collection_run_one_at_a_time_in_order(manager):
+    order, active = [], []
+
+    def runner(number):
+        def run(job):
+            active.append(number)
+            assert len(active) == 1
+            threading.Event().wait(0.01)
+            order.append(number)
+            active.remove(number)
+
+        return run
+
+    jobs = [manager.submit("a", None, runner(number)) for number in range(4)]
+    wait_for(jobs[-1], JobStatus.SUCCEEDED)
+    assert order == [0, 1, 2, 3]
+    assert all(job.status is JobStatus.SUCCEEDED for job in jobs)
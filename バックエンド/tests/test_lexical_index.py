@@ -0,0 +1,71 @@
+from app.lexical_index import LexicalIndex, tokenize
+
+
+def documents(start, stop):
+    return [(f"doc{number}", f"manual page {number} error E-{number}") for number in range(start, stop)]
+
+
+def found(index, query, top_k=10):
+    return [doc_id for doc_id, _ in index.search(query, top_k)]
+
+
+def test_tokenize_keeps_codes_and_splits_japanese_into_bigrams():
+    assert tokenize("エラー E-1024") == ["e-1024", "e", "1024", "エラ", "ラー"]
+
+
+def test_delete_hides_documents_and_survives_reload(tmp_path):
+    index = LexicalIndex(tmp_path)
+    index.add(documents(0, 3))
+    index.delete(["doc1"])
+    assert "doc1" not in found(index, "e-1")
+    assert all(score > 0 for _, score in index.search("manual", 10))
+    assert index.doc_count == 2
+
+    index.commit()
+    reopened = LexicalIndex(tmp_path)
+    assert reopened.doc_count == 2
+    assert "doc1" not in found(reopened, "manual")
+    assert found(reopened, "e-2")[0] == "doc2"
+
+
+def test_add_replaces_earlier_versions(tmp_path):
+    index = LexicalIndex(tmp_path)
+    index.add([("doc0", "old text")])
+    index.add([("doc0", "new text")])
+    assert index.doc_count == 1
+    assert found(index, "old") == []
+    assert found(index, "new") == ["doc0"]
+
+
+def test_similar_segments_are_merged(tmp_path):
+    index = LexicalIndex(tmp_path, merge_factor=2)
+    for start in range(0, 8, 2):
+        index.add(documents(start, start + 2))
+    assert index.segment_count < 4
+    assert index.doc_count == 8
+    assert found(index, "e-5") == ["doc5"]
+
+
+def test_merge_drops_deleted_documents(tmp_path):
+    index = LexicalIndex(tmp_path, merge_factor=10)
+    index.add(documents(0, 5))
+    index.add(documents(5, 10))
+    index.delete([f"doc{number}" for number in range(0, 10, 2)])
+    index.compact()
+
+    assert index.segment_count == 1
+    segment = index._segments[0]
+    assert segment.size == 5 and not segment.deleted.any()
+    assert sorted(found(index, "manual")) == [f"doc{number}" for number in range(1, 10, 2)]
+    assert found(index, "e-7") == ["doc7"]
+    assert len(list(tmp_path.glob("segment-*"))) == 1
+
+
+def test_mostly_deleted_segment_is_rewritten_on_commit(tmp_path):
+    index = LexicalIndex(tmp_path)
+    index.add(documents(0, 10))
+    before = index._segments[0].name
+    index.delete([f"doc{number}" for number in range(4)])
+    index.commit()
+    assert index._segments[0].name != before
+    assert index._segments[0].size == 6
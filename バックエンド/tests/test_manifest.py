@@ -0,0 +1,78 @@
+import os
+
+from app.manifest import IngestManifest, hash_file
+
+
+def write(path, text, mtime=None):
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def recorded(tmp_path, signature="sig", tags=None):
+    """A saved manifest holding ``a.md`` and ``b.md`` as they are on disk."""
+    manifest = IngestManifest(tmp_path / "manifest.json", signature)
+    for name in ("a.md", "b.md"):
+        path = write(tmp_path / name, f"{name} v1", mtime=1_000_000)
+        manifest.record(path, hash_file(path), 3, tags)
+    manifest.save()
+    return IngestManifest(tmp_path / "manifest.json", signature)
+
+
+def test_plan_classifies_targets(tmp_path):
+    manifest = recorded(tmp_path)
+    a, b = tmp_path / "a.md", tmp_path / "b.md"
+    write(b, "b.md v2")
+    c = write(tmp_path / "c.md", "c.md v1")
+
+    plan = manifest.plan([a, b, c], full_scan=False)
+
+    assert plan.unchanged == [a]
+    assert plan.updated == [b]
+    assert plan.added == [c]
+    assert plan.removed == []
+    assert plan.hashes == {str(b): hash_file(b), str(c): hash_file(c)}
+
+
+def test_unchanged_size_and_mtime_skip_hashing(tmp_path, monkeypatch):
+    manifest = recorded(tmp_path)
+
+    def refuse(path):
+        raise AssertionError(f"{path} was hashed")
+
+    monkeypatch.setattr("app.manifest.hash_file", refuse)
+    plan = manifest.plan([tmp_path / "a.md", tmp_path / "b.md"], full_scan=False)
+    assert len(plan.unchanged) == 2 and not plan.hashes
+
+
+def test_touched_file_with_same_content_is_unchanged(tmp_path):
+    manifest = recorded(tmp_path)
+    a = tmp_path / "a.md"
+    os.utime(a, (2_000_000, 2_000_000))
+
+    plan = manifest.plan([a], full_scan=False)
+
+    assert plan.unchanged == [a]
+    assert manifest.get(a).mtime == 2_000_000
+
+
+def test_full_scan_reports_missing_files_as_removed(tmp_path):
+    manifest = recorded(tmp_path)
+    (tmp_path / "b.md").unlink()
+
+    assert manifest.plan([tmp_path / "a.md"], full_scan=False).removed == []
+    removed = manifest.plan([tmp_path / "a.md"], full_scan=True).removed
+    assert [record.path for record in removed] == [str(tmp_path / "b.md")]
+
+
+def test_new_signature_or_tags_mark_files_updated(tmp_path):
+    recorded(tmp_path, tags=["hr"])
+    a = tmp_path / "a.md"
+
+    plan = IngestManifest(tmp_path / "manifest.json", "other").plan([a], full_scan=False)
+    assert plan.updated == [a] and plan.hashes == {str(a): hash_file(a)}
+
+    manifest = IngestManifest(tmp_path / "manifest.json", "sig")
+    assert manifest.plan([a], full_scan=False, tags=["hr"]).unchanged == [a]
+    assert manifest.plan([a], full_scan=False, tags=["it"]).updated == [a]
@@ -0,0 +1,83 @@
+import numpy as np
+
+from app.document_loader import DocumentChunk
+from app.embeddings import EmbeddingService
+from app.mmap_store import MmapVectorStore
+
+DIM = 16
+
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(size=(count, DIM)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def open_store(directory) -> MmapVectorStore:
+    # Embeddings are always passed in, so the model is never loaded.
+    return MmapVectorStore(directory, "test", EmbeddingService("test"), dtype="float16")
+
+
+def add(store: MmapVectorStore, matrix: np.ndarray) -> None:
+    chunks = [
+        DocumentChunk(id=f"c{row}", content=f"chunk {row}", metadata={"path": f"/docs/{row % 4}.md", "n": row})
+        for row in range(len(matrix))
+    ]
+    store.add_chunks(chunks, embeddings=matrix.tolist())
+
+
+def test_search_finds_exact_vectors(tmp_path):
+    store = open_store(tmp_path)
+    matrix = vectors(50)
+    add(store, matrix)
+    for row in (0, 17, 49):
+        assert store.similarity_search("", 1, query_embedding=matrix[row].tolist())[0]["id"] == f"c{row}"
+
+
+def test_search_racing_a_compaction_never_returns_another_chunk(tmp_path):
+    writer, reader = open_store(tmp_path), open_store(tmp_path)
+    matrix = vectors(40)
+    add(writer, matrix)
+    stale = reader._current_state()
+    # Deleting the first half and compacting moves chunk 30 to row 10, where chunk 10 used to be.
+    writer.delete_ids([f"c{row}" for row in range(20)])
+    writer.compact()
+    assert writer._current_state().file != stale.file
+
+    states = [stale]
+    current = reader._current_state
+    reader._current_state = lambda: states.pop() if states else current()
+    results = reader.similarity_search("", 3, query_embedding=matrix[30].tolist())
+    assert results[0]["id"] == "c30"
+    assert results[0]["score"] < 1e-3
+    assert all(int(item["id"][1:]) >= 20 for item in results)
+
+
+def test_filtered_search_after_compaction(tmp_path):
+    writer, reader = open_store(tmp_path), open_store(tmp_path)
+    matrix = vectors(40)
+    add(writer, matrix)
+    where = {"path": "/docs/2.md"}
+    before = reader.similarity_search("", 5, query_embedding=matrix[22].tolist(), where=where)
+    assert before[0]["id"] == "c22"
+    writer.delete_ids([f"c{row}" for row in range(20)])
+    writer.compact()
+    after = reader.similarity_search("", 5, query_embedding=matrix[22].tolist(), where=where)
+    survivors = [item["id"] for item in before if int(item["id"][1:]) >= 20]
+    assert [item["id"] for item in after][: len(survivors)] == survivors
+    assert all(item["metadata"]["path"] == "/docs/2.md" for item in after)
+
+
+def test_ivf_index_files_every_row_and_finds_it(tmp_path):
+    rng = np.random.default_rng(3)
+    centers = vectors(8, seed=1)
+    matrix = centers[np.arange(800) % 8] + 0.05 * rng.normal(size=(800, DIM)).astype(np.float32)
+    store = MmapVectorStore(tmp_path, "test", EmbeddingService("test"), dtype="float16", ivf_lists=8, ivf_probes=2)
+    add(store, matrix)
+    store.commit()
+
+    ivf = store._current_state().ivf
+    assert ivf is not None and len(ivf.centroids) == 8
+    assert sorted(ivf.order.tolist()) == list(range(800))
+    for row in (0, 123, 799):
+        assert store.similarity_search("", 1, query_embedding=matrix[row].tolist())[0]["id"] == f"c{row}"
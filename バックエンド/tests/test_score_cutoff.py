@@ -0,0 +1,43 @@
+from app.vector_store import ScoreCutoff
+
+
+def ranked(*scores):
+    return [{"id": str(index), "score": score} for index, score in enumerate(scores)]
+
+
+def ids(results):
+    return [item["id"] for item in results]
+
+
+def test_inactive_cutoff_keeps_everything():
+    results = ranked(0.1, 0.9, 5.0)
+    assert ScoreCutoff().apply(results) == results
+
+
+def test_max_distance():
+    assert ids(ScoreCutoff(max_distance=0.5).apply(ranked(0.1, 0.4, 0.5, 0.6))) == ["0", "1", "2"]
+    assert ScoreCutoff(max_distance=0.5).apply(ranked(0.6, 0.7)) == []
+
+
+def test_score_gap_cuts_at_the_first_relative_jump():
+    cutoff = ScoreCutoff(score_gap=0.5)
+    assert ids(cutoff.apply(ranked(0.20, 0.25, 0.29, 0.60, 0.62))) == ["0", "1", "2"]
+    assert ids(cutoff.apply(ranked(0.20, 0.25, 0.29))) == ["0", "1", "2"]
+
+
+def test_score_gap_keeps_min_k_within_max_distance():
+    scores = ranked(0.1, 0.4, 0.45, 0.9)
+    assert ids(ScoreCutoff(score_gap=0.5, min_k=3).apply(scores)) == ["0", "1", "2"]
+    assert ids(ScoreCutoff(max_distance=0.42, score_gap=0.5, min_k=3).apply(scores)) == ["0", "1"]
+
+
+def test_gap_beyond_max_distance_is_left_to_the_threshold():
+    assert ids(ScoreCutoff(max_distance=0.3, score_gap=0.5).apply(ranked(0.2, 0.25, 0.9))) == ["0", "1"]
+
+
+def test_lexical_only_hits_follow_the_vector_side():
+    results = ranked(0.2, None, 0.8)
+    assert ids(ScoreCutoff(max_distance=0.5).apply(results)) == ["0", "1"]
+    assert ScoreCutoff(max_distance=0.1).apply(results) == []
+    lexical = ranked(None, None)
+    assert ScoreCutoff(max_distance=0.1, score_gap=0.5).apply(lexical) == lexical
@@ -0,0 +1,64 @@
+import sys
+
+import pytest
+
+from app.tokens import TokenCounter
+
+
+@pytest.mark.parametrize("max_tokens", range(1, 12))
+def test_truncate_returns_a_prefix_without_broken_characters(byte_counter, max_tokens):
+    text = "経費精算の手順"
+    head = byte_counter.truncate(text, max_tokens)
+    assert text.startswith(head)
+    assert "�" not in head
+    assert len(head) == max_tokens // 3
+
+
+def test_truncate_keeps_text_that_fits(byte_counter):
+    assert byte_counter.truncate("abc", 3) == "abc"
+    assert byte_counter.truncate("abc", 0) == ""
+
+
+@pytest.mark.parametrize("max_tokens", [1, 2, 4, 7, 64])
+def test_split_covers_the_text_in_pieces_that_fit(byte_counter, max_tokens):
+    text = "経費精算 expense report、申請は月末まで。" * 5
+    pieces = byte_counter.split(text, max_tokens)
+    assert "".join(pieces) == text
+    # Only a character wider than the budget (3 bytes here) may exceed it.
+    assert all(byte_counter.count(piece) <= max(max_tokens, 3) for piece in pieces)
+    assert all(byte_counter.count(piece) + 3 > max_tokens for piece in pieces[:-1])
+
+
+def test_split_without_tiktoken(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    counter = TokenCounter("gpt-4o-mini")
+    text = "日本語abcdefgh" * 3
+    pieces = counter.split(text, 4)
+    assert "".join(pieces) == text
+    assert all(counter.count(piece) <= 4 for piece in pieces)
+    assert counter.split("", 4) == []
+
+
+def test_estimate_without_tiktoken(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    counter = TokenCounter("gpt-4o-mini")
+    assert counter.encoding is None
+    assert counter.count("日本語abcd") == 4
+    assert counter.truncate("日本語abcd", 2) == "日本"
+
+
+class OfflineTiktoken:
+    @staticmethod
+    def encoding_for_model(model):
+        raise KeyError(model)
+
+    @staticmethod
+    def get_encoding(name):
+        raise OSError("cannot download BPE file")
+
+
+def test_unknown_model_offline_falls_back_to_estimate(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", OfflineTiktoken)
+    counter = TokenCounter("my-private-model")
+    assert counter.encoding is None
+    assert counter.count("abcdefgh") == 2
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.document_index import DocumentIndex
+from app.document_loader import DocumentChunk
+from app.embeddings import EmbeddingService
+from app.mmap_store import MmapVectorStore
+from app.vector_store import ChromaVectorStore, VectorStore
+
+DIM = 16
+
+
+@pytest.fixture(params=["chroma", "mmap"])
+def store(request, tmp_path):
+    # Embeddings are always passed in, so the model is never loaded.
+    embedder = EmbeddingService("test")
+    document_index = DocumentIndex(tmp_path / "document_index.npz")
+    if request.param == "chroma":
+        return ChromaVectorStore(tmp_path / "chroma", "test", embedder, document_index=document_index)
+    return MmapVectorStore(tmp_path / "mmap", "test", embedder, document_index=document_index)
+
+
+def unit(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def add_documents(store, documents, chunks_per_document=5, seed=0):
+    """``documents`` maps a path to its metadata; each document's chunks lie near a random direction."""
+    rng = np.random.default_rng(seed)
+    centers = {}
+    for path, metadata in documents.items():
+        center = unit(rng.normal(size=(1, DIM)))[0]
+        matrix = unit(center + 0.1 * rng.normal(size=(chunks_per_document, DIM)))
+        store.add_chunks(
+            [
+                DocumentChunk(id=f"{path}:{index}", content=f"{path} chunk {index}", metadata={"path": path, **metadata})
+                for index in range(chunks_per_document)
+            ],
+            embeddings=matrix.tolist(),
+        )
+        store.index_document(path, matrix)
+        centers[path] = center
+    store.commit()
+    return centers
+
+
+def test_delete_ids_counts_only_stored_chunks(store):
+    add_documents(store, {"a.md": {}, "b.md": {}})
+    assert store.delete_ids(["a.md:0", "a.md:1", "missing:0"]) == 2
+    assert store.delete_ids(["a.md:0"]) == 0
+    assert store.count() == 8
+
+
+def test_delete_where(store):
+    add_documents(store, {"a.md": {"folder": "hr"}, "b.md": {"folder": "it"}})
+    assert store.delete_where({"folder": "hr"}) == 5
+    assert store.delete_where({"folder": "hr"}) == 0
+    assert {item["metadata"]["path"] for item in store._fetch([f"b.md:{i}" for i in range(5)])} == {"b.md"}
+
+
+def test_backend_must_implement_every_primitive():
+    class Incomplete(VectorStore):
+        def count(self):
+            return 0
+
+    with pytest.raises(TypeError, match="_snapshot_storage"):
+        Incomplete("test", EmbeddingService("test"))
+
+
+def test_two_tier_searches_the_documents_nearest_the_query(store):
+    centers = add_documents(store, {f"doc{number}.md": {} for number in range(6)})
+    results = store.similarity_search("", 3, query_embedding=centers["doc4.md"].tolist(), mode="two_tier", documents=1)
+    assert {item["metadata"]["path"] for item in results} == {"doc4.md"}
+
+
+def test_two_tier_picks_documents_among_those_matching_the_filter(store):
+    shelves = {f"doc{number}.md": {"shelf": "a" if number < 5 else "b"} for number in range(6)}
+    centers = add_documents(store, shelves)
+    # Every shelf "a" document is nearer the query than the only shelf "b" one.
+    query = unit(np.stack([centers[f"doc{number}.md"] for number in range(5)]).mean(axis=0, keepdims=True))[0]
+
+    results = store.similarity_search(
+        "", 3, query_embedding=query.tolist(), mode="two_tier", where={"shelf": "b"}, documents=2
+    )
+
+    assert len(results) == 3
+    assert {item["metadata"]["path"] for item in results} == {"doc5.md"}
+    assert store.similarity_search(
+        "", 3, query_embedding=query.tolist(), mode="two_tier", where={"shelf": "c"}, documents=2
+    ) == []
+
+
+def test_filtered_paths_are_cached_until_the_next_write(store):
+    add_documents(store, {"a.md": {"shelf": "a"}, "b.md": {"shelf": "b"}})
+    first = store._matching_paths({"shelf": "a"})
+    assert first == {"a.md"}
+    assert store._matching_paths({"shelf": "a"}) is first
+
+    add_documents(store, {"c.md": {"shelf": "a"}}, seed=1)
+    assert store._matching_paths({"shelf": "a"}) == {"a.md", "c.md"}
+    store.delete_where({"path": "a.md"})
+    assert store._matching_paths({"shelf": "a"}) == {"c.md"}
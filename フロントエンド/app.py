@@ -2,17 +2,27 @@
 
 from __future__ import annotations
 
-from typing import Dict
+import json
+import time
+from typing import Dict, Iterator, List, Tuple
 
 import requests
 import streamlit as st
 
 DEFAULT_BACKEND_URL = "http://localhost:8000"
+JOB_POLL_INTERVAL_SECONDS = 1.0
+FINISHED_JOB_STATUSES = {"succeeded", "failed", "cancelled"}
 backend_url = st.secrets.get("backend_url", DEFAULT_BACKEND_URL)
 
 st.set_page_config(page_title="RAG問合せ応答システム", layout="wide")
 st.title("RAG問合せ応答システム")
 st.caption("社内ドキュメントを参照してAIが回答を作成します。")
+collection = st.sidebar.text_input("コレクション", placeholder="未入力で既定のコレクション").strip()
+
+
+def collection_path(path: str) -> str:
+    """Prefix an endpoint with the selected collection (default collection when empty)."""
+    return f"/collections/{collection}{path}" if collection else path
 
 
 def post_json(path: str, payload: Dict) -> requests.Response:
@@ -20,43 +30,138 @@ def post_json(path: str, payload: Dict) -> requests.Response:
     return requests.post(url, json=payload, timeout=60)
 
 
-def upload_file(file) -> Dict:
-    url = f"{backend_url}/documents/upload"
-    files = {"file": (file.name, file.getvalue(), file.type or "application/octet-stream")}
-    response = requests.post(url, files=files, timeout=120)
+def stream_events(path: str, payload: Dict) -> Iterator[Tuple[str, Dict]]:
+    """POST a JSON payload and yield ``(event, data)`` pairs from a Server-Sent Events response."""
+    url = f"{backend_url}{path}"
+    with requests.post(url, json=payload, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:") :].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:") :])
+                event = "message"
+
+
+def render_sources(sources) -> None:
+    with st.expander("参照されたコンテキストとスコア"):
+        for idx, source in enumerate(sources, start=1):
+            metadata = source.get("metadata", {})
+            label = metadata.get("source", "unknown")
+            chunk_index = metadata.get("chunk_index", "?")
+            st.markdown(f"**{idx}. {label} (chunk {chunk_index})**")
+            st.write(source.get("content", ""))
+            score = source.get("score")
+            if score is not None:
+                st.caption(f"score: {score:.4f}")
+            rerank_score = source.get("rerank_score")
+            if rerank_score is not None:
+                st.caption(f"rerank score: {rerank_score:.4f}")
+
+
+def split_csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def build_filters(folders: str, extensions: List[str], tags: str) -> Dict:
+    filters: Dict = {}
+    if split_csv(folders):
+        filters["path_prefixes"] = split_csv(folders)
+    if extensions:
+        filters["extensions"] = extensions
+    if split_csv(tags):
+        filters["tags"] = split_csv(tags)
+    return filters
+
+
+def upload_files(files) -> Dict:
+    """Send every selected file in one request; the backend queues a single ingest job."""
+    url = f"{backend_url}{collection_path('/documents/upload')}"
+    parts = [("files", (file.name, file, file.type or "application/octet-stream")) for file in files]
+    response = requests.post(url, files=parts, timeout=120)
     response.raise_for_status()
     return response.json()
 
 
+def wait_for_job(job: Dict, label: str) -> Dict:
+    """Poll an ingest job until it finishes, rendering a progress bar."""
+    progress = st.progress(0.0, text=f"{label}: 待機中")
+    while job["status"] not in FINISHED_JOB_STATUSES:
+        time.sleep(JOB_POLL_INTERVAL_SECONDS)
+        response = requests.get(f"{backend_url}/ingest/jobs/{job['id']}", timeout=10)
+        response.raise_for_status()
+        job = response.json()
+        total = job["total_files"] or 1
+        done = job["processed_files"] + job["failed_files"]
+        progress.progress(
+            min(done / total, 1.0),
+            text=f"{label}: {done}/{job['total_files']} files, {job['ingested_chunks']} chunks "
+            f"({job['chunks_per_second']:.1f} chunks/s)",
+        )
+    progress.empty()
+    return job
+
+
+def show_job_result(job: Dict, label: str) -> None:
+    if job["status"] == "succeeded" and job.get("result"):
+        st.success(f"{label}: {job['result']['detail']}")
+    elif job["status"] == "cancelled":
+        st.warning(f"{label}: 取り込みがキャンセルされました。")
+    else:
+        st.error(f"{label}: 取り込みに失敗しました。")
+    for error in job.get("errors", []):
+        st.caption(error)
+
+
 tab_query, tab_ingest = st.tabs(["質問する", "ドキュメント取り込み"])
 
 with tab_query:
     st.subheader("質問入力")
     question = st.text_area("質問内容", placeholder="例）VPNの設定手順を教えて", height=120)
-    top_k = st.slider("参照ドキュメント数", min_value=1, max_value=8, value=5)
+    top_k = st.slider(
+        "参照ドキュメント数（上限）",
+        min_value=1,
+        max_value=8,
+        value=5,
+        help="サーバーで距離しきい値・スコア差の打ち切りを設定している場合、関連の薄い文書は除かれ、これより少なくなります。",
+    )
+    with st.expander("検索範囲の絞り込み"):
+        folder_input = st.text_input("フォルダ（カンマ区切り）", placeholder="例）hr/policies, it")
+        extension_input = st.multiselect("ファイル種別", ["pdf", "txt", "md", "markdown"])
+        tag_input = st.text_input("タグ（カンマ区切り、すべてを含む文書に限定）")
     ask = st.button("質問する", type="primary", use_container_width=True)
     if ask:
         if not question.strip():
             st.warning("質問を入力してください。")
         else:
             try:
-                response = post_json("/query", {"question": question, "top_k": top_k})
-                response.raise_for_status()
-                payload = response.json()
-                st.success("回答を取得しました。")
-                st.markdown(f"### 回答\n{payload['answer']}")
-                with st.expander("参照されたコンテキストとスコア"):
-                    for idx, source in enumerate(payload.get("sources", []), start=1):
-                        metadata = source.get("metadata", {})
-                        label = metadata.get("source", "unknown")
-                        chunk_index = metadata.get("chunk_index", "?")
-                        st.markdown(f"**{idx}. {label} (chunk {chunk_index})**")
-                        st.write(source.get("content", ""))
-                        score = source.get("score")
-                        if score is not None:
-                            st.caption(f"score: {score:.4f}")
-                with st.expander("送信したプロンプトを確認"):
-                    st.code(payload["prompt"])
+                st.markdown("### 回答")
+                answer_placeholder = st.empty()
+                answer = ""
+                sources = []
+                payload = {"question": question, "top_k": top_k}
+                filters = build_filters(folder_input, extension_input, tag_input)
+                if filters:
+                    payload["filters"] = filters
+                for event, data in stream_events(collection_path("/query/stream"), payload):
+                    if event == "sources":
+                        sources = data.get("sources", [])
+                    elif event == "token":
+                        answer += data["text"]
+                        answer_placeholder.markdown(answer + "▌")
+                    elif event == "error":
+                        st.error(f"回答生成中にエラーが発生しました: {data['detail']}")
+                    elif event == "done":
+                        answer_placeholder.markdown(answer)
+                        timings = data.get("timings", {})
+                        st.caption(
+                            f"検索 {timings.get('retrieval_ms')} ms / 最初の応答 {timings.get('first_token_ms')} ms / "
+                            f"合計 {timings.get('total_ms')} ms"
+                        )
+                        render_sources(sources)
+                        with st.expander("送信したプロンプトを確認"):
+                            st.code(data.get("prompt", ""))
             except requests.RequestException as exc:
                 st.error(f"問い合わせに失敗しました: {exc}")
 
@@ -71,19 +176,22 @@ with tab_ingest:
         if not files:
             st.info("ファイルを選択してください。")
         else:
-            for file in files:
-                try:
-                    result = upload_file(file)
-                    st.success(f"{file.name}: {result['detail']}")
-                except requests.RequestException as exc:
-                    st.error(f"{file.name} のアップロードに失敗しました: {exc}")
+            try:
+                upload = upload_files(files)
+                for item in upload["files"]:
+                    if item["status"] == "duplicate":
+                        st.info(f"{item['filename']}: 同じ内容のファイル（{item['duplicate_of']}）があるためスキップしました。")
+                if upload["job"]:
+                    show_job_result(wait_for_job(upload["job"], "アップロード"), "アップロード")
+            except requests.RequestException as exc:
+                st.error(f"アップロードに失敗しました: {exc}")
     st.divider()
     st.subheader("既存ドキュメントを再取り込み")
     if st.button("全ファイルを再取り込み", use_container_width=True):
         try:
-            response = post_json("/ingest", {"paths": None})
+            response = post_json(collection_path("/ingest"), {"paths": None})
             response.raise_for_status()
-            data = response.json()
-            st.success(data["detail"])
+            job = wait_for_job(response.json(), "再取り込み")
+            show_job_result(job, "再取り込み")
         except requests.RequestException as exc:
             st.error(f"再取り込みに失敗しました: {exc}")